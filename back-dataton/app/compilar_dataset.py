@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Compila dataset.json a un formato que la API carga sin parsear JSON:
+
+  - salida .bin:    binario mapeable en memoria (app/services/formato_binario.py)
+  - salida .sqlite: base SQLite en disco con índices y listas precalculadas
+                    (app/services/almacen_sqlite.py). Se construye desde el
+                    .bin, así que los registros no se cargan en memoria; si la
+                    entrada es JSON, se compila primero a un .bin temporal
+                    (ese paso sí lee el JSON completo).
+  - salida .seg:    índices y vistas ya construidos para varios workers, más
+                    el .bin de los registros (app/services/segmento.py)
+
+Uso (desde back-dataton/):
+    python -m app.compilar_dataset [entrada.json|.ndjson[.gz]] [salida.bin|salida.sqlite|salida.seg]
+
+La entrada puede ser también el índice .shards.json de una salida en varios
+archivos de enriquecer_dataset_ingresos.py (se leen todos, en orden).
+
+El orden del autocompletado de .sqlite y .seg sale de
+TIMELINE_SUGGEST_BY_VOLUME, igual que en la API; el .sqlite lo guarda en su
+tabla meta y no se puede cambiar al abrirlo.
+
+Después se apunta la API al archivo generado:
+    TIMELINE_DATA_PATH=app/dataset.bin uvicorn app.main:app
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+from app.services.almacen_sqlite import compile_sqlite, is_sqlite_dataset
+from app.services.dataset_store import DatasetStore, file_fingerprint, load_records
+from app.services.formato_binario import compile_dataset, is_binary_dataset
+from app.services.segmento import compile_segment
+
+
+def main():
+    base_dir = Path(__file__).resolve().parent
+    dataset_path = Path(sys.argv[1]) if len(sys.argv) > 1 else base_dir / "dataset.json"
+    output_path = (
+        Path(sys.argv[2]) if len(sys.argv) > 2
+        else dataset_path.with_name(dataset_path.name.split(".", 1)[0] + ".bin")
+    )
+
+    if not dataset_path.exists():
+        print(f"[ERROR] No se encontró el dataset en {dataset_path}")
+        return
+
+    print(f"Usando dataset: {dataset_path}")
+    start = time.perf_counter()
+    suggest_by_volume = os.getenv("TIMELINE_SUGGEST_BY_VOLUME", "1") in ("1", "true", "TRUE")
+
+    if is_sqlite_dataset(output_path):
+        # Desde el .bin: columnas e índices en memoria, registros desde el mmap
+        source = dataset_path
+        tmp_bin = output_path.with_name(output_path.name + ".bin.tmp")
+        if not is_binary_dataset(dataset_path):
+            dataset = load_records(dataset_path)
+            if not isinstance(dataset, list):
+                print(f"[ERROR] {dataset_path.name} no es una lista JSON.")
+                return
+            compile_dataset(dataset, tmp_bin, file_fingerprint(dataset_path))
+            del dataset
+            source = tmp_bin
+        try:
+            snap = DatasetStore(source, poll_interval=0, suggest_by_volume=suggest_by_volume).get()
+            print(f"Registros en dataset: {len(snap.records)}")
+            totals = compile_sqlite(snap, output_path)
+        finally:
+            tmp_bin.unlink(missing_ok=True)
+        print(f"Filas: {totals}")
+        print(f"Tamaño: {dataset_path.stat().st_size / 1e6:.1f} MB -> "
+              f"{output_path.stat().st_size / 1e6:.1f} MB")
+        print(f"Listo en {time.perf_counter() - start:.1f}s. Archivo generado: {output_path}")
+        return
+
+    if output_path.suffix == ".seg":
+        header = compile_segment(dataset_path, output_path, suggest_by_volume)
+        print(f"Registros en {header['records']}, arreglos compartidos: {header['buffers']}")
+        print(f"Listo en {time.perf_counter() - start:.1f}s. Archivo generado: {output_path}")
+        return
+
+    dataset = load_records(dataset_path)
+
+    if not isinstance(dataset, list):
+        print(f"[ERROR] {dataset_path.name} no es una lista JSON.")
+        return
+
+    print(f"Registros en dataset: {len(dataset)}")
+    header = compile_dataset(dataset, output_path, file_fingerprint(dataset_path))
+
+    size_in = dataset_path.stat().st_size / 1e6
+    size_out = output_path.stat().st_size / 1e6
+    print(f"Campos: {len(header['fields'])}, strings únicos: {header['strings']}")
+    print(f"Tamaño: {size_in:.1f} MB -> {size_out:.1f} MB")
+    print(f"Listo en {time.perf_counter() - start:.1f}s. Archivo generado: {output_path}")
+
+
+if __name__ == "__main__":
+    main()
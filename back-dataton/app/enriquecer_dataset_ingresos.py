@@ -1,28 +1,37 @@
 #!/usr/bin/env python3
+import argparse
+import gzip
+import hashlib
+import io
 import json
 import os
+import shutil
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from difflib import SequenceMatcher
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import (
+    Any, BinaryIO, Container, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Set,
+    TextIO, Tuple,
+)
+
+if __package__ in (None, ""):
+    # Ejecutado como script (python app/enriquecer_dataset_ingresos.py):
+    # la raíz de back-dataton al path para importar app.services
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.dataset_store import SHARDS_SUFFIX, file_fingerprint  # noqa: E402
+from app.services.texto import fold_accents, normalize_name, normalize_text  # noqa: E402
 
 # ---------------------------------------------------------------------
 # Helpers básicos
 # ---------------------------------------------------------------------
 
 
-def normalize_text(s: Optional[str]) -> str:
-    if not isinstance(s, str):
-        return ""
-    # Mayúsculas, sin espacios dobles, strip
-    return " ".join(s.strip().upper().split())
-
-
-def normalize_name(nombre: str, ap1: str, ap2: str) -> str:
-    parts = [normalize_text(nombre), normalize_text(ap1), normalize_text(ap2)]
-    # Filtra vacíos
-    parts = [p for p in parts if p]
-    return " ".join(parts)
-
-
 def get_nested(d: Dict[str, Any], path: List[str], default=None):
     cur: Any = d
     for key in path:
@@ -150,6 +159,55 @@ def extract_ingresos_from_declaracion(dec: Dict[str, Any]) -> Dict[str, Optional
     return out
 
 
+# Campos de extract_ingresos_from_declaracion, en el mismo orden (el
+# manifiesto guarda los ingresos como lista en este orden)
+INGRESOS_CAMPOS = (
+    "remuneracionMensualCargoPublico",
+    "remuneracionAnualCargoPublico",
+    "ingresoMensualNetoDeclarante",
+    "ingresoAnualNetoDeclarante",
+    "totalIngresosMensualesNetos",
+    "totalIngresosAnualesNetos",
+    "actividadEmpresarial",
+    "actividadFinanciera",
+    "serviciosProfesionales",
+    "otrosIngresos",
+    "enajenacionBienes",
+)
+
+
+# ---------------------------------------------------------------------
+# Historial de ingresos por declarante
+# ---------------------------------------------------------------------
+
+# Campos con los que se arma la serie, en orden de preferencia
+HISTORIAL_KEYS = ("ingresoAnualNetoDeclarante", "totalIngresosAnualesNetos")
+
+# (clave del dataset, fecha YYYY-MM-DD, ingreso anual)
+Punto = Tuple[Tuple[str, str], str, float]
+
+
+def historial_point(
+    fecha_act_str: str, ingresos_vals: Dict[str, Optional[float]]
+) -> Optional[Tuple[str, float]]:
+    """
+    Punto (fecha, ingreso anual) de una declaración para el historial, o
+    None si no trae ingreso anual o su metadata.actualizacion no empieza
+    con una fecha válida.
+    """
+    valor = next(
+        (ingresos_vals[k] for k in HISTORIAL_KEYS if ingresos_vals.get(k) is not None), None
+    )
+    if valor is None:
+        return None
+    fecha = fecha_act_str[:10]
+    try:
+        date.fromisoformat(fecha)
+    except ValueError:
+        return None
+    return fecha, valor
+
+
 # ---------------------------------------------------------------------
 # Carga dataset y creación de índice por (nombre, institución)
 # ---------------------------------------------------------------------
@@ -178,17 +236,789 @@ def build_dataset_index(
     return index, dataset
 
 
+# ---------------------------------------------------------------------
+# Coincidencia difusa (opcional): acentos, apellidos invertidos y variantes
+# ---------------------------------------------------------------------
+
+
+class FuzzyIndex:
+    """
+    Índice de bloqueo sobre las claves del dataset para resolver las
+    declaraciones que no coinciden de forma exacta.
+
+    - Nombres e instituciones se comparan sin acentos y con las palabras
+      del nombre ordenadas (apellidos invertidos dan el mismo texto).
+    - Bloqueo: cada clave se registra bajo cada par de palabras de su
+      nombre; sólo se comparan las claves que comparten al menos un par con
+      la declaración. Si un par es muy común (más de MAX_BLOCK claves) se
+      usa el sub-bloque (par, institución); si aun así es grande, se omite.
+    - Puntaje: similitud (difflib) del nombre y de la institución; ambas
+      deben superar el umbral (nombres iguales en otra dependencia no
+      cuentan). Gana el de mayor promedio si no empata con otra clave.
+    """
+
+    MAX_BLOCK = 500
+
+    def __init__(self, keys: Iterable[Tuple[str, str]], threshold: float = 0.9):
+        self.threshold = threshold
+        self.keys: List[Tuple[str, str]] = []
+        self._names: List[str] = []
+        self._insts: List[str] = []
+        self._folded: Dict[Tuple[str, str], List[int]] = {}
+        self._blocks: Dict[Tuple[str, str], List[int]] = {}
+        self._inst_blocks: Dict[Tuple[str, str, str], List[int]] = {}
+        for key in keys:
+            i = len(self.keys)
+            self.keys.append(key)
+            name, inst = self._fold(key)
+            self._names.append(name)
+            self._insts.append(inst)
+            self._folded.setdefault((name, inst), []).append(i)
+            for a, b in self._pairs(name):
+                self._blocks.setdefault((a, b), []).append(i)
+                self._inst_blocks.setdefault((a, b, inst), []).append(i)
+
+    @property
+    def block_count(self) -> int:
+        return len(self._blocks)
+
+    @staticmethod
+    def _fold(key: Tuple[str, str]) -> Tuple[str, str]:
+        """(palabras del nombre ordenadas, institución), sin acentos."""
+        return " ".join(sorted(fold_accents(key[0]).split())), fold_accents(key[1])
+
+    @staticmethod
+    def _pairs(name: str) -> Set[Tuple[str, str]]:
+        tokens = sorted(set(name.split()))
+        return {
+            (tokens[a], tokens[b])
+            for a in range(len(tokens))
+            for b in range(a + 1, len(tokens))
+        }
+
+    def _similarity(self, a: str, b: str) -> float:
+        if a == b:
+            return 1.0
+        sm = SequenceMatcher(None, a, b)
+        # Cotas superiores baratas antes de calcular ratio()
+        if sm.real_quick_ratio() < self.threshold or sm.quick_ratio() < self.threshold:
+            return 0.0
+        return sm.ratio()
+
+    def match(self, key: Tuple[str, str], stats: Counter) -> Optional[Tuple[str, str]]:
+        name, inst = self._fold(key)
+
+        # Sólo difieren acentos u orden de palabras
+        same = self._folded.get((name, inst))
+        if same is not None:
+            if len(same) == 1:
+                return self.keys[same[0]]
+            stats["ambiguas"] += 1
+            return None
+
+        candidates: Set[int] = set()
+        for a, b in self._pairs(name):
+            block = self._blocks.get((a, b))
+            if block is None:
+                continue
+            if len(block) > self.MAX_BLOCK:
+                block = self._inst_blocks.get((a, b, inst), [])
+                if len(block) > self.MAX_BLOCK:
+                    stats["bloques_omitidos"] += 1
+                    continue
+            candidates.update(block)
+        stats["pares_candidatos"] += len(candidates)
+
+        best_score, best, tie = 0.0, -1, False
+        for i in candidates:
+            name_sim = self._similarity(name, self._names[i])
+            if name_sim < self.threshold:
+                continue
+            inst_sim = self._similarity(inst, self._insts[i])
+            if inst_sim < self.threshold:
+                continue
+            score = (name_sim + inst_sim) / 2
+            if score > best_score:
+                best_score, best, tie = score, i, False
+            elif score == best_score:
+                tie = True
+
+        if best < 0:
+            return None
+        if tie:
+            stats["ambiguas"] += 1
+            return None
+        return self.keys[best]
+
+
+# ---------------------------------------------------------------------
+# Procesamiento de un archivo S1 (en el proceso principal o en un worker)
+# ---------------------------------------------------------------------
+
+# (clave del dataset, metadata.actualizacion, ingresos extraídos)
+Match = Tuple[Tuple[str, str], str, Dict[str, Optional[float]]]
+
+
+# Tamaño inicial de lectura; se duplica mientras un elemento no quepa
+_READ_CHUNK = 1 << 20
+_decoder = json.JSONDecoder()
+_NUMBER_START = frozenset("-0123456789")
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+
+def iter_json_elements(f: TextIO) -> Iterator[Any]:
+    """
+    Recorre un archivo JSON sin cargarlo completo: si es un arreglo emite
+    sus elementos uno por uno; si es un objeto lo emite tal cual; otros
+    valores no emiten nada. En memoria sólo vive el elemento en curso y el
+    bloque de lectura, así que un arreglo de varios GB no dispara la RAM.
+
+    Un archivo mal formado lanza json.JSONDecodeError (como json.load),
+    aunque los elementos anteriores al error ya se hayan emitido.
+    """
+    buf = ""
+    pos = 0
+    eof = False
+    chunk = _READ_CHUNK
+
+    def fill() -> None:
+        nonlocal buf, pos, eof
+        data = f.read(chunk)
+        if not data:
+            eof = True
+        buf = buf[pos:] + data
+        pos = 0
+
+    def next_char() -> str:
+        # Primer carácter no blanco ("" al final del archivo)
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                return ""
+            fill()
+
+    first = next_char()
+    if first != "[":
+        # Un solo valor: se lee completo (es una sola declaración)
+        value = json.loads(buf[pos:] + f.read())
+        if isinstance(value, dict):
+            yield value
+        return
+
+    pos += 1
+    expect_comma = False
+    while True:
+        ch = next_char()
+        if ch == "]":
+            pos += 1
+            if next_char():
+                raise json.JSONDecodeError("Extra data", buf, pos)
+            return
+        if expect_comma:
+            if ch != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+            pos += 1
+            next_char()
+
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Elemento incompleto: leer más (bloques cada vez mayores
+                # para no re-decodificar un elemento grande muchas veces)
+                fill()
+                chunk *= 2
+                continue
+            # Un número que llega al final del bloque puede seguir en el
+            # siguiente ("1e" + "-07")
+            if not eof and buf[pos] in _NUMBER_START:
+                tail = end
+                while tail < len(buf) and buf[tail] in _NUMBER_CHARS:
+                    tail += 1
+                if tail == len(buf):
+                    fill()
+                    continue
+            break
+
+        chunk = _READ_CHUNK
+        pos = end
+        expect_comma = True
+        yield value
+
+
+class _HashingReader(io.RawIOBase):
+    """Lectura binaria que acumula el sha1 de los bytes leídos."""
+
+    def __init__(self, raw: BinaryIO, sha1: "hashlib._Hash"):
+        self._raw = raw
+        self._sha1 = sha1
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._raw.readinto(b)
+        if n:
+            self._sha1.update(memoryview(b)[:n])
+        return n
+
+    def drain(self) -> None:
+        """Hashea lo que el parser no llegó a leer."""
+        for block in iter(lambda: self._raw.read(_READ_CHUNK), b""):
+            self._sha1.update(block)
+
+
+def iter_declaraciones(
+    filepath: Path, sha1: Optional["hashlib._Hash"] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Cada archivo puede ser lista o un solo objeto. Con `sha1`, el hash del
+    archivo completo se acumula en la misma lectura (al agotar el iterador).
+    """
+    if sha1 is None:
+        with filepath.open("r", encoding="utf-8") as f:
+            yield from iter_json_elements(f)
+        return
+    with filepath.open("rb") as raw:
+        reader = _HashingReader(raw, sha1)
+        f = io.TextIOWrapper(io.BufferedReader(reader, _READ_CHUNK), encoding="utf-8")
+        yield from iter_json_elements(f)
+        reader.drain()
+
+
+def match_declaraciones(
+    declaraciones: Iterable[Dict[str, Any]],
+    keys: Container[Tuple[str, str]],
+    fuzzy: Optional[FuzzyIndex] = None,
+    stats: Optional[Counter] = None,
+) -> List[Match]:
+    """
+    Declaraciones con ingresos útiles cuya clave (nombre, institución)
+    existe en el dataset, en el orden del archivo. Con `fuzzy`, las que no
+    coinciden exactamente se resuelven con el índice difuso. `stats`
+    acumula los conteos de la tasa de coincidencia.
+    """
+    if stats is None:
+        stats = Counter()
+    matches: List[Match] = []
+    for dec in declaraciones:
+        if not isinstance(dec, dict):
+            continue
+
+        # Extraer nombre + apellidos
+        nombre = get_nested(
+            dec,
+            [
+                "declaracion",
+                "situacionPatrimonial",
+                "datosGenerales",
+                "nombre",
+            ],
+        )
+        ap1 = get_nested(
+            dec,
+            [
+                "declaracion",
+                "situacionPatrimonial",
+                "datosGenerales",
+                "primerApellido",
+            ],
+        )
+        ap2 = get_nested(
+            dec,
+            [
+                "declaracion",
+                "situacionPatrimonial",
+                "datosGenerales",
+                "segundoApellido",
+            ],
+        )
+
+        full_name = normalize_name(nombre or "", ap1 or "", ap2 or "")
+        if not full_name:
+            continue
+
+        institucion_dec = normalize_text(
+            get_nested(dec, ["metadata", "institucion"], "")
+        )
+
+        key = (full_name, institucion_dec)
+        stats["declaraciones"] += 1
+
+        if key in keys:
+            stats["exactas"] += 1
+        else:
+            resolved = fuzzy.match(key, stats) if fuzzy is not None else None
+            if resolved is None:
+                # No hay coincidencia en dataset, lo ignoramos
+                stats["sin_coincidencia"] += 1
+                continue
+            stats["difusas"] += 1
+            key = resolved
+
+        ingresos_vals = extract_ingresos_from_declaracion(dec)
+        if not ingresos_vals:
+            continue  # sin datos útiles
+
+        fecha_act = get_nested(dec, ["metadata", "actualizacion"], "")
+        fecha_act_str = str(fecha_act) if fecha_act is not None else ""
+
+        matches.append((key, fecha_act_str, ingresos_vals))
+    return matches
+
+
+class FileResult(NamedTuple):
+    """
+    Aporte de un archivo S1. `matches` sólo conserva, por clave, las
+    declaraciones que pueden llegar a ganar (la primera y cada una con
+    actualización estrictamente mayor que las anteriores del archivo): el
+    resto nunca se aplica, sin importar lo que aporten otros archivos.
+    """
+
+    matches: List[Match]
+    counts: Dict[Tuple[str, str], int]  # declaraciones coincidentes por clave
+    stats: Dict[str, int]  # conteos de la tasa de coincidencia
+    history: List[Punto]  # puntos del historial, sin repetir
+    sha1: str
+    error: Optional[str]
+
+
+def winning_candidates(matches: List[Match]) -> List[Match]:
+    best: Dict[Tuple[str, str], str] = {}
+    out: List[Match] = []
+    for m in matches:
+        key, fecha_act_str, _ = m
+        prev = best.get(key)
+        if prev is None or (fecha_act_str and fecha_act_str > prev):
+            best[key] = fecha_act_str
+            out.append(m)
+    return out
+
+
+def process_file(
+    filepath: Path, keys: Container[Tuple[str, str]], fuzzy: Optional[FuzzyIndex] = None
+) -> FileResult:
+    """
+    Las declaraciones se parsean en streaming; si el archivo resulta mal
+    formado se descartan todas sus coincidencias, igual que cuando se
+    cargaba completo.
+    """
+    stats: Counter = Counter()
+    sha1 = hashlib.sha1()
+    try:
+        # El hash sale de la misma lectura: el archivo se lee una sola vez
+        matches = match_declaraciones(iter_declaraciones(filepath, sha1), keys, fuzzy, stats)
+    except Exception as e:
+        return FileResult([], {}, {}, [], "", f"Al leer {filepath}: {e}")
+    counts: Dict[Tuple[str, str], int] = {}
+    history: Dict[Punto, None] = {}
+    for key, fecha_act_str, ingresos_vals in matches:
+        counts[key] = counts.get(key, 0) + 1
+        punto = historial_point(fecha_act_str, ingresos_vals)
+        if punto is not None:
+            history[(key, *punto)] = None
+    return FileResult(
+        winning_candidates(matches), counts, dict(stats), list(history), sha1.hexdigest(), None
+    )
+
+
+# Claves del dataset e índice difuso en cada worker (se envían una sola
+# vez al arrancarlo)
+_worker_keys: FrozenSet[Tuple[str, str]] = frozenset()
+_worker_fuzzy: Optional[FuzzyIndex] = None
+
+
+def _init_worker(keys: FrozenSet[Tuple[str, str]], fuzzy: Optional[FuzzyIndex]) -> None:
+    global _worker_keys, _worker_fuzzy
+    _worker_keys = keys
+    _worker_fuzzy = fuzzy
+
+
+def _process_file_worker(filepath: Path) -> FileResult:
+    return process_file(filepath, _worker_keys, _worker_fuzzy)
+
+
+def iter_file_results(
+    files: List[Path],
+    keys: FrozenSet[Tuple[str, str]],
+    workers: int,
+    fuzzy: Optional[FuzzyIndex] = None,
+) -> Iterator[FileResult]:
+    """
+    Resultados por archivo, en el orden de `files`. Con workers > 1 los
+    archivos se parsean en un pool de procesos; cada worker sólo devuelve
+    las tuplas compactas.
+    """
+    if workers <= 1:
+        for filepath in files:
+            yield process_file(filepath, keys, fuzzy)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(keys, fuzzy)
+    ) as pool:
+        yield from pool.map(_process_file_worker, files, chunksize=4)
+
+
+def apply_matches(
+    dataset: List[Dict[str, Any]],
+    index: Dict[Tuple[str, str], List[int]],
+    mejores_fechas: Dict[int, str],
+    matches: Iterable[Match],
+) -> None:
+    """
+    Aplica las coincidencias de un archivo: la declaración con
+    metadata.actualizacion más reciente gana. El resultado depende del
+    orden, así que los archivos se aplican siempre en el mismo orden.
+    """
+    for key, fecha_act_str, ingresos_vals in matches:
+        for ds_idx in index[key]:
+            # Ver si ya teníamos una declaración para este registro
+            prev_fecha = mejores_fechas.get(ds_idx)
+            # Si no hay fecha previa, o ésta es más nueva, actualizamos
+            if prev_fecha is None or (fecha_act_str and fecha_act_str > prev_fecha):
+                # Mezclamos con lo que ya tuviera el dataset
+                current_ingresos = dataset[ds_idx].get("ingresos", {}) or {}
+                if not isinstance(current_ingresos, dict):
+                    current_ingresos = {}
+
+                new_ingresos = merge_ingresos(current_ingresos, ingresos_vals)
+                dataset[ds_idx]["ingresos"] = new_ingresos
+                mejores_fechas[ds_idx] = fecha_act_str
+
+
+def apply_history(
+    dataset: List[Dict[str, Any]],
+    index: Dict[Tuple[str, str], List[int]],
+    history: Dict[Tuple[str, str], Set[Tuple[str, float]]],
+) -> int:
+    """
+    Guarda en cada registro la serie de su declarante como
+    historialIngresos: [[fecha, ingreso anual], ...] ordenada por fecha
+    (compacta: ingresos ya trae el desglose de la declaración más
+    reciente). Devuelve cuántos registros la recibieron.
+    """
+    updated = 0
+    for key, puntos in history.items():
+        serie = [[fecha, valor] for fecha, valor in sorted(puntos)]
+        for ds_idx in index[key]:
+            dataset[ds_idx]["historialIngresos"] = serie
+            updated += 1
+    return updated
+
+
+# ---------------------------------------------------------------------
+# Manifiesto de archivos ya procesados (ejecuciones incrementales)
+# ---------------------------------------------------------------------
+
+# Por archivo se guardan su hash y sólo las declaraciones que pueden ganar
+# (winning_candidates) con sus ingresos: un archivo sin cambios nunca se
+# vuelve a leer.
+MANIFEST_VERSION = 5
+
+
+def load_manifest(
+    path: Path, dataset_sha1: str, matching: Dict[str, Any]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Entradas por ruta relativa. Se descarta todo si cambió dataset.json
+    (las claves buscadas dependen de él), la configuración de coincidencia
+    o el formato del manifiesto.
+    """
+    if not path.exists():
+        return {}
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"[ADVERTENCIA] Manifiesto ilegible ({e}); se procesa todo.")
+        return {}
+    if data.get("version") != MANIFEST_VERSION or data.get("dataset_sha1") != dataset_sha1:
+        print("[INFO] dataset.json cambió desde la última ejecución; se procesa todo.")
+        return {}
+    if data.get("matching") != matching:
+        print("[INFO] Cambió la configuración de coincidencia; se procesa todo.")
+        return {}
+    return data.get("files", {})
+
+
+def save_manifest(
+    path: Path,
+    dataset_sha1: str,
+    matching: Dict[str, Any],
+    files: Dict[str, Dict[str, Any]],
+) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": MANIFEST_VERSION,
+                "dataset_sha1": dataset_sha1,
+                "matching": matching,
+                "files": files,
+            },
+            f,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+    publish(tmp, path)
+
+
+def manifest_entry(st: os.stat_result, result: FileResult) -> Dict[str, Any]:
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha1": result.sha1,
+        "ganadoras": [
+            [k[0], k[1], fecha, [vals.get(c) for c in INGRESOS_CAMPOS]]
+            for k, fecha, vals in result.matches
+        ],
+        "counts": [[k[0], k[1], n] for k, n in result.counts.items()],
+        "stats": result.stats,
+        "history": [[k[0], k[1], fecha, valor] for k, fecha, valor in result.history],
+    }
+
+
+def entry_result(entry: Dict[str, Any]) -> FileResult:
+    """Aporte guardado de un archivo (el mismo que daría volver a leerlo)."""
+    return FileResult(
+        matches=[
+            ((n, i), fecha, dict(zip(INGRESOS_CAMPOS, valores)))
+            for n, i, fecha, valores in entry["ganadoras"]
+        ],
+        counts={(n, i): c for n, i, c in entry["counts"]},
+        stats=entry["stats"],
+        history=[((n, i), fecha, valor) for n, i, fecha, valor in entry["history"]],
+        sha1=entry["sha1"],
+        error=None,
+    )
+
+
+def is_unchanged(entry: Optional[Dict[str, Any]], path: Path, st: os.stat_result) -> bool:
+    """Tamaño y mtime iguales; si sólo cambió el mtime, se compara el hash."""
+    if entry is None or entry.get("size") != st.st_size:
+        return False
+    if entry.get("mtime_ns") == st.st_mtime_ns:
+        return True
+    if file_fingerprint(path) == entry.get("sha1"):
+        entry["mtime_ns"] = st.st_mtime_ns
+        return True
+    return False
+
+
+# ---------------------------------------------------------------------
+# Escritura del dataset enriquecido
+# ---------------------------------------------------------------------
+
+OUTPUT_FORMATS = ("json", "ndjson")
+
+# Versiones de una salida en varios archivos que se conservan en disco: la
+# vigente y la anterior (un lector puede estar recorriéndola todavía)
+KEEP_VERSIONS = 2
+
+
+def output_paths(base: Path, fmt: str, shards: int, compress: bool) -> List[Path]:
+    """
+    Nombres de salida a partir de `base` (sin extensión). Con shards > 1
+    (sólo ndjson): base-00000-of-00004.ndjson, ... (write_output los mueve
+    al directorio de la versión).
+    """
+    ext = f".{fmt}" + (".gz" if compress else "")
+    if shards <= 1:
+        return [base.with_name(base.name + ext)]
+    return [base.with_name(f"{base.name}-{i:05d}-of-{shards:05d}{ext}") for i in range(shards)]
+
+
+def publish(tmp: Path, path: Path) -> None:
+    """
+    Renombra `tmp` a `path` después de llevarlo a disco (y el directorio
+    después del rename): tras una caída, `path` es la versión anterior o la
+    nueva completa, nunca un archivo vacío o truncado.
+    """
+    fd = os.open(tmp, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp, path)
+    fd = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_records(records: Iterable[Dict[str, Any]], path: Path, fmt: str) -> None:
+    """
+    Escribe registro por registro en un archivo temporal y lo renombra al
+    final: quien lea `path` (p. ej. la API recargando el dataset) ve la
+    versión anterior completa o la nueva completa, nunca una a medias.
+    """
+    tmp = path.with_name(path.name + ".tmp")
+    opener = gzip.open if path.name.endswith(".gz") else open
+    with opener(tmp, "wt", encoding="utf-8") as f:
+        if fmt == "ndjson":
+            for rec in records:
+                f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+                f.write("\n")
+        else:
+            json.dump(list(records), f, ensure_ascii=False, indent=2)
+    publish(tmp, path)
+
+
+def write_output(
+    dataset: List[Dict[str, Any]], base: Path, fmt: str, shards: int, compress: bool
+) -> Path:
+    """
+    Reparte los registros en `shards` archivos contiguos (mismo orden).
+    Devuelve la ruta que se entrega a la API o a compilar_dataset.
+
+    Un solo archivo se publica al renombrarlo (write_records). Varios se
+    escriben en un directorio nuevo, base.d/<versión>/, y se publican juntos
+    al renombrar el índice base.shards.json que los enumera: quien lo lea ve
+    el conjunto anterior completo o el nuevo completo, nunca una mezcla.
+    """
+    paths = output_paths(base, fmt, shards, compress)
+    if len(paths) == 1:
+        write_records(dataset, paths[0], fmt)
+        return paths[0]
+
+    root = base.with_name(base.name + ".d")
+    now = time.time_ns()
+    version = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now // 10**9)) + f"-{now % 10**9:09d}"
+    target = root / version
+    target.mkdir(parents=True)
+    paths = [target / path.name for path in paths]
+    per_shard = -(-len(dataset) // len(paths)) if dataset else 0
+    try:
+        for i, path in enumerate(paths):
+            write_records(islice(dataset, i * per_shard, (i + 1) * per_shard), path, fmt)
+    except BaseException:
+        # Una versión a medias no se publica ni cuenta entre las que se conservan
+        shutil.rmtree(target, ignore_errors=True)
+        raise
+
+    index = base.with_name(base.name + SHARDS_SUFFIX)
+    tmp = index.with_name(index.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "format": fmt,
+                "records": len(dataset),
+                "shards": [path.relative_to(index.parent).as_posix() for path in paths],
+            },
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    publish(tmp, index)
+
+    # Los nombres de versión ordenan cronológicamente
+    for old in sorted(p for p in root.iterdir() if p.is_dir())[:-KEEP_VERSIONS]:
+        shutil.rmtree(old, ignore_errors=True)
+    return index
+
+
 # ---------------------------------------------------------------------
 # Recorre todos los JSON en s1-declaraciones y enriquece
 # ---------------------------------------------------------------------
 
 
-def main():
-    base_dir = Path(__file__).resolve().parent
-    dataset_path = base_dir / "dataset.json"
-    decls_root = base_dir / "s1-declaraciones"
-    output_path = base_dir / "dataset_enriquecido_ingresos.json"
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Enriquece dataset.json con los ingresos de las declaraciones S1."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Procesos para parsear archivos S1 en paralelo (1 = secuencial).",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Ignora el manifiesto y vuelve a procesar todos los archivos S1.",
+    )
+    parser.add_argument(
+        "--fuzzy",
+        action="store_true",
+        help="Resuelve con coincidencia difusa las declaraciones sin coincidencia exacta.",
+    )
+    parser.add_argument(
+        "--fuzzy-threshold",
+        type=float,
+        default=0.9,
+        help="Puntaje mínimo (0-1) para aceptar una coincidencia difusa.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="json",
+        help="json: un arreglo con sangría (como antes); ndjson: un registro compacto por línea.",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Divide la salida ndjson en N archivos, publicados juntos con un índice .shards.json.",
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Comprime la salida con gzip (.gz).",
+    )
+    args = parser.parse_args()
+    if args.shards > 1 and args.format != "ndjson":
+        parser.error("--shards requiere --format ndjson")
+    return args
+
+
+def print_progress(label: str, done: int, total: int) -> None:
+    # Barra de progreso sencilla
+    progress = done / total
+    bar_width = 40
+    filled = int(bar_width * progress)
+    bar = "#" * filled + "-" * (bar_width - filled)
+    print(
+        f"\r{label}: [{bar}] {done}/{total}",
+        end="",
+        flush=True,
+    )
+
+
+def print_match_report(stats: Counter) -> None:
+    total = stats["declaraciones"]
+    if not total:
+        return
+    found = stats["exactas"] + stats["difusas"]
+    print(
+        f"Declaraciones: {total}, con coincidencia: {found} ({100 * found / total:.1f}%)"
+        f" [exactas: {stats['exactas']}, difusas: {stats['difusas']}]"
+    )
+    if stats["difusas"] or stats["pares_candidatos"]:
+        print(
+            f"Coincidencia difusa: {stats['pares_candidatos']} pares candidatos, "
+            f"{stats['ambiguas']} ambiguas, {stats['bloques_omitidos']} bloques omitidos"
+        )
+
 
+def enriquecer(
+    args: argparse.Namespace,
+    dataset_path: Path,
+    decls_root: Path,
+    output_base: Path,
+    manifest_path: Path,
+) -> Optional[Path]:
+    """
+    Enriquece `dataset_path` con las declaraciones de `decls_root`.
+    Devuelve la ruta publicada (None si no hubo nada que escribir).
+    """
     if not dataset_path.exists():
         print(f"[ERROR] No se encontró dataset.json en {dataset_path}")
         return
@@ -230,114 +1060,89 @@ def main():
 
     print(f"Archivos de declaraciones encontrados: {total_files}")
 
-    # 3. Procesar uno por uno (baja RAM) con barra de progreso ligera
-    matched_count = 0
-    updated_records = 0
-
-    for idx_file, filepath in enumerate(all_files, start=1):
-        # Barra de progreso sencilla
-        progress = idx_file / total_files
-        bar_width = 40
-        filled = int(bar_width * progress)
-        bar = "#" * filled + "-" * (bar_width - filled)
-        print(
-            f"\rProcesando archivos S1: [{bar}] {idx_file}/{total_files}",
-            end="",
-            flush=True,
-        )
+    fuzzy: Optional[FuzzyIndex] = None
+    matching: Dict[str, Any] = {"fuzzy": args.fuzzy}
+    if args.fuzzy:
+        fuzzy = FuzzyIndex(index, threshold=args.fuzzy_threshold)
+        matching["threshold"] = args.fuzzy_threshold
+        print(f"Coincidencia difusa: {fuzzy.block_count} bloques, umbral {args.fuzzy_threshold}")
 
-        try:
-            with filepath.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-        except Exception as e:
-            print(f"\n[ERROR] Al leer {filepath}: {e}")
-            continue
-
-        # Cada archivo puede ser lista o un solo objeto
-        if isinstance(data, dict):
-            declaraciones = [data]
-        elif isinstance(data, list):
-            declaraciones = data
+    # 3. Manifiesto: sólo se parsean archivos nuevos o modificados
+    dataset_sha1 = file_fingerprint(dataset_path)
+    previous = {} if args.full else load_manifest(manifest_path, dataset_sha1, matching)
+    manifest: Dict[str, Dict[str, Any]] = {}
+    pending: List[Tuple[str, Path, os.stat_result]] = []
+    for filepath in all_files:
+        rel = filepath.relative_to(decls_root).as_posix()
+        st = filepath.stat()
+        entry = previous.get(rel)
+        if is_unchanged(entry, filepath, st):
+            manifest[rel] = entry
         else:
-            continue
-
-        for dec in declaraciones:
-            # Extraer nombre + apellidos
-            nombre = get_nested(
-                dec,
-                [
-                    "declaracion",
-                    "situacionPatrimonial",
-                    "datosGenerales",
-                    "nombre",
-                ],
-            )
-            ap1 = get_nested(
-                dec,
-                [
-                    "declaracion",
-                    "situacionPatrimonial",
-                    "datosGenerales",
-                    "primerApellido",
-                ],
-            )
-            ap2 = get_nested(
-                dec,
-                [
-                    "declaracion",
-                    "situacionPatrimonial",
-                    "datosGenerales",
-                    "segundoApellido",
-                ],
-            )
-
-            full_name = normalize_name(nombre or "", ap1 or "", ap2 or "")
-            if not full_name:
-                continue
-
-            institucion_dec = normalize_text(
-                get_nested(dec, ["metadata", "institucion"], "")
-            )
+            pending.append((rel, filepath, st))
 
-            key = (full_name, institucion_dec)
+    print(f"Archivos sin cambios (manifiesto): {total_files - len(pending)}")
+    print(f"Archivos nuevos o modificados: {len(pending)}")
+    workers = max(1, args.workers)
+    if workers > 1 and pending:
+        print(f"Procesando con {workers} workers")
 
-            if key not in index:
-                # No hay coincidencia en dataset, lo ignoramos
-                continue
-
-            ingresos_vals = extract_ingresos_from_declaracion(dec)
-            if not ingresos_vals:
-                continue  # sin datos útiles
-
-            fecha_act = get_nested(dec, ["metadata", "actualizacion"], "")
-            fecha_act_str = str(fecha_act) if fecha_act is not None else ""
-
-            for ds_idx in index[key]:
-                matched_count += 1
-
-                # Ver si ya teníamos una declaración para este registro
-                prev_fecha = mejores_fechas.get(ds_idx)
-                # Si no hay fecha previa, o ésta es más nueva, actualizamos
-                if prev_fecha is None or (fecha_act_str and fecha_act_str > prev_fecha):
-                    # Mezclamos con lo que ya tuviera el dataset
-                    current_ingresos = dataset[ds_idx].get("ingresos", {}) or {}
-                    if not isinstance(current_ingresos, dict):
-                        current_ingresos = {}
+    # 4. Procesar pendientes (baja RAM) con barra de progreso ligera
+    keys = frozenset(index)
+    fresh: Dict[str, FileResult] = {}
+    results = iter_file_results([p for _, p, _ in pending], keys, workers, fuzzy)
+    for idx_file, ((rel, _, st), result) in enumerate(zip(pending, results), start=1):
+        print_progress("Procesando archivos S1", idx_file, len(pending))
+        if result.error:
+            # No se registra: se reintenta en la siguiente ejecución
+            print(f"\n[ERROR] {result.error}")
+            continue
+        manifest[rel] = manifest_entry(st, result)
+        fresh[rel] = result
 
-                    new_ingresos = merge_ingresos(current_ingresos, ingresos_vals)
-                    dataset[ds_idx]["ingresos"] = new_ingresos
-                    mejores_fechas[ds_idx] = fecha_act_str
-                    updated_records += 1
+    # 5. Aplicar el aporte de cada archivo en el orden del recorrido (los
+    #    sin cambios, desde el manifiesto)
+    order = [filepath.relative_to(decls_root).as_posix() for filepath in all_files]
+    matched_count = 0
+    stats: Counter = Counter()
+    history: Dict[Tuple[str, str], Set[Tuple[str, float]]] = {}
+    for rel in order:
+        entry = manifest.get(rel)
+        if entry is None:
+            continue
+        result = fresh.get(rel) or entry_result(entry)
+        stats.update(result.stats)
+        matched_count += sum(n * len(index[k]) for k, n in result.counts.items())
+        apply_matches(dataset, index, mejores_fechas, result.matches)
+        for key, fecha, valor in result.history:
+            history.setdefault(key, set()).add((fecha, valor))
+    con_historial = apply_history(dataset, index, history)
 
     print("\n\nProcesamiento terminado.")
     print(f"Coincidencias (declaración ↔ dataset): {matched_count}")
     print(f"Registros del dataset actualizados con ingresos: {len(mejores_fechas)}")
+    print(f"Registros con historial de ingresos: {con_historial} ({len(history)} declarante(s))")
+    print_match_report(stats)
 
-    # 4. Guardar dataset enriquecido
-    with output_path.open("w", encoding="utf-8") as f:
-        json.dump(dataset, f, ensure_ascii=False, indent=2)
+    # 6. Guardar dataset enriquecido y manifiesto
+    output_path = write_output(dataset, output_base, args.format, args.shards, args.compress)
+    save_manifest(manifest_path, dataset_sha1, matching, manifest)
 
     print(f"\n✅ Dataset enriquecido guardado en: {output_path}")
+    print(f"Manifiesto: {manifest_path}")
+    return output_path
+
+
+def main():
+    args = parse_args()
+    base_dir = Path(__file__).resolve().parent
+    enriquecer(
+        args,
+        dataset_path=base_dir / "dataset.json",
+        decls_root=base_dir / "s1-declaraciones",
+        output_base=base_dir / "dataset_enriquecido_ingresos",
+        manifest_path=base_dir / "dataset_enriquecido_ingresos.manifest.json",
+    )
 
 
 if __name__ == "__main__":
@@ -1,9 +1,25 @@
 # app/main.py
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from app.routers import timeline
 from app.routers.timeline import router as timeline_router
+from app.services import metricas
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Carga/vigilancia del dataset al arrancar; se detiene al cerrar
+    timeline.start()
+    try:
+        yield
+    finally:
+        timeline.stop()
 
-app = FastAPI(title="Datatón API")
+
+app = FastAPI(title="Datatón API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -11,6 +27,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Metadatos de paginación en respuestas en streaming
+    # y ETag para revalidar (If-None-Match)
+    expose_headers=["X-Total-Count", "X-Next-Cursor", "ETag"],
 )
 
 app.include_router(timeline_router)
@@ -18,3 +37,9 @@ app.include_router(timeline_router)
 @app.get("/")
 def root():
     return {"mensaje": "Servidor Datatón activo 🚀"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    """Métricas de este proceso en formato de texto de Prometheus."""
+    return PlainTextResponse(metricas.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
 from fastapi.routing import APIRoute
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 import json
+import math
 from pathlib import Path
 import os
 import time
@@ -8,19 +13,194 @@ import logging
 from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
+from app.services.texto import normalize_text
+from app.services import metricas
+from app.services.almacen import DataView, OrderedView, open_store
+from app.services.concurrencia import HeavyExecutor, SingleFlight
+from app.services.crecimiento import MIN_BASE, sin_historial
+from app.services.etag import cache_control, compute_etag, matches
+from app.services.fechas import parse_datetime
+from app.services.filtros import Filtro
+from app.services.ingresos import normalize_ingresos_dict as _normalize_ingresos_dict
+from app.services.paginacion import CursorError, Page, StaleCursorError, plan_page
+from app.services.serializacion import FastJSONResponse, ResponseCache, SerializedBody
+from app.services.streaming import STREAM_FORMATS, stream_rows
+
 # ───────────────────────── Config ─────────────────────────
-DATA_PATH = Path(__file__).resolve().parent.parent / "dataset.json"
+# dataset.json, o su versión compilada (python -m app.compilar_dataset):
+# binaria (.bin, en memoria) o SQLite (.sqlite, en disco)
+DATA_PATH = Path(
+    os.getenv("TIMELINE_DATA_PATH", Path(__file__).resolve().parent.parent / "dataset.json")
+)
 DEBUG = os.getenv("TIMELINE_DEBUG", "0") in ("1", "true", "TRUE")
+# Segundos entre revisiones del archivo del dataset (0 = sin recarga en caliente)
+RELOAD_INTERVAL = float(os.getenv("TIMELINE_RELOAD_INTERVAL", "2"))
+# Autocompletado: desempatar por número de contratos (1) o sólo alfabético (0)
+SUGGEST_BY_VOLUME = os.getenv("TIMELINE_SUGGEST_BY_VOLUME", "1") in ("1", "true", "TRUE")
+# Conexiones por proceso cuando el dataset es SQLite
+SQLITE_POOL_SIZE = int(os.getenv("TIMELINE_SQLITE_POOL", "4"))
+# Segundos que el navegador puede reutilizar una respuesta sin revalidarla (0 = revalidar siempre)
+CACHE_MAX_AGE = int(os.getenv("TIMELINE_CACHE_MAX_AGE", "0"))
+# MB de respuestas ya serializadas que se guardan por proceso (0 = sin caché)
+RESPONSE_CACHE_MB = int(os.getenv("TIMELINE_RESPONSE_CACHE_MB", "64"))
+# Hilos para armar/serializar listas completas (aparte del pool de Starlette)
+HEAVY_THREADS = int(os.getenv("TIMELINE_HEAVY_THREADS", "2"))
 logger = logging.getLogger("uvicorn.error")
 if DEBUG:
     logger.setLevel(logging.DEBUG)
 
 BANNER = "🟣[TIMELINE]"
 
+# Tamaño máximo de página en los endpoints de listas
+MAX_PAGE_SIZE = 10000
+# Nombres por petición en /by-nombre/batch
+MAX_BATCH_NOMBRES = 1000
+# Declarantes con los mayores saltos de ingreso que se marcan como atípicos
+DEFAULT_TOP_K = 50
+# Valores de ?format= en las listas: la respuesta normal o uno de streaming
+_FORMAT_PATTERN = "^(" + "|".join(("json",) + STREAM_FORMATS) + ")$"
+
+# Almacén compartido por todo el proceso (en memoria o SQLite)
+_store = open_store(
+    DATA_PATH,
+    poll_interval=RELOAD_INTERVAL,
+    suggest_by_volume=SUGGEST_BY_VOLUME,
+    pool_size=SQLITE_POOL_SIZE,
+)
+
 
-def _load_data() -> List[Dict[str, Any]]:
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+# Listas y atípicos ya serializados (y comprimidos) de la versión vigente
+_responses = ResponseCache("respuestas_serializadas", RESPONSE_CACHE_MB * 1024 * 1024)
+# Trabajo pesado fuera del pool de Starlette, sin repetir cálculos en curso
+_heavy = HeavyExecutor(HEAVY_THREADS)
+_single_flight = SingleFlight("respuestas_serializadas")
+
+
+def _get_snapshot() -> DataView:
+    """
+    Versión publicada del dataset. Se llama desde el event loop: si aún no
+    hay ninguna (el archivo no existía al arrancar) se responde 503 en vez
+    de cargarlo dentro de la petición; el hilo vigilante lo publicará.
+    """
+    snap = _store.current()
+    if snap is None:
+        raise HTTPException(
+            status_code=503,
+            detail="El dataset aún no está cargado.",
+            headers={"Retry-After": str(max(1, math.ceil(RELOAD_INTERVAL)))},
+        )
+    return snap
+
+
+def _snapshot(request: Request) -> DataView:
+    """
+    Versión del dataset de la petición: LoggingRoute la fija al empezar y
+    calcula el ETag con ella, así que una recarga a mitad de la petición no
+    puede enviar un cuerpo nuevo con el ETag de la versión anterior.
+    """
+    snap = getattr(request.state, "snapshot", None)
+    return snap if snap is not None else _get_snapshot()
+
+
+async def _send(request: Request, body: SerializedBody) -> Response:
+    accept = request.headers.get("accept-encoding")
+    if body.ready(accept):
+        return body.response(accept)
+    # Primera petición con esta codificación: se comprime fuera del event loop
+    return await _heavy.run(body.response, accept)
+
+
+async def _build_response(request: Request, snap: DataView, key: Tuple, build) -> Response:
+    """
+    Calcula y guarda el cuerpo: build() corre en el pool pesado una sola
+    vez aunque lleguen varias peticiones iguales a la vez.
+    """
+    version = snap.version
+    body = await _single_flight.do(
+        (version, key), lambda: _heavy.run(_responses.store, version, key, build)
+    )
+    return await _send(request, body)
+
+
+async def _cached_response(request: Request, snap: DataView, key: Tuple, build) -> Response:
+    """Cuerpo serializado de la versión vigente; si no está en caché, se construye."""
+    body = _responses.lookup(snap.version, key)
+    if body is not None:
+        return await _send(request, body)
+    return await _build_response(request, snap, key, build)
+
+
+def _plan_page(
+    snap: DataView,
+    order: str,
+    total: int,
+    limit: Optional[int],
+    offset: int,
+    cursor: Optional[str],
+) -> Page:
+    """Traduce errores de cursor a respuestas HTTP (400 mal formado, 409 dataset cambió)."""
+    try:
+        return plan_page(total, snap.fingerprint[:16], order, limit, offset, cursor)
+    except StaleCursorError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _filtro_paneles(
+    nivel: Optional[List[str]] = Query(
+        None, description="nivelOrdenGobierno (repetible; sin distinguir mayúsculas)."
+    ),
+    sector: Optional[List[str]] = Query(None, description="sectorS1.valor (repetible)."),
+    ente: Optional[List[str]] = Query(None, description="nombreEntePublico (repetible)."),
+    institucion: Optional[List[str]] = Query(
+        None, description="contrato.institucionCompradora (repetible)."
+    ),
+    monto_min: Optional[float] = Query(None, description="montoTotal mínimo (inclusivo)."),
+    monto_max: Optional[float] = Query(None, description="montoTotal máximo (inclusivo)."),
+    toma_desde: Optional[str] = Query(
+        None, description="Fecha de toma de posesión desde (YYYY-MM-DD, inclusiva)."
+    ),
+    toma_hasta: Optional[str] = Query(
+        None, description="Fecha de toma de posesión hasta (YYYY-MM-DD, inclusiva)."
+    ),
+) -> Filtro:
+    """Filtros de los paneles de riesgo; varios valores de un campo se combinan con OR."""
+    try:
+        return Filtro.from_query(
+            nivel, sector, ente, institucion, monto_min, monto_max, toma_desde, toma_hasta
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _panel(
+    snap: DataView, name: str, filtro: Filtro, sort_by: str, sort_dir: str
+) -> Tuple[OrderedView, str]:
+    """
+    Vista (filtrada si hay filtros) y la clave de orden para el cursor. Los
+    handlers buscan antes la página en la caché de respuestas: una página
+    ya servida en esta versión no vuelve a filtrar.
+    """
+    vista = snap.vista(name)
+    order = f"{vista.name}:{sort_by}:{sort_dir}"
+    if filtro:
+        # Intersección de postings (en SQLite, una consulta): fuera del event
+        # loop. El cursor queda ligado a estos filtros
+        vista = await run_in_threadpool(vista.filtrar, filtro)
+        order += f":{filtro.huella()}"
+    return vista, order
+
+
+def start() -> None:
+    """Arranque del proceso (lifespan de la app): vigilancia del dataset."""
+    _store.start()
+
+
+def stop() -> None:
+    """Cierre del proceso: detiene la vigilancia y el pool de trabajo pesado."""
+    _store.stop()
+    _heavy.shutdown()
 
 
 # ───────────────────────── Utilidades ─────────────────────────
@@ -32,30 +212,10 @@ def _try_parse_date(s: Optional[str]) -> Tuple[bool, Optional[str], Optional[str
     if not s or not isinstance(s, str):
         return (False, None, None)
 
-    raw = s.strip()
-    formats = [
-        ("%Y-%m-%d", "YYYY-MM-DD"),
-        ("%Y/%m/%d", "YYYY/MM/DD"),
-        ("%d/%m/%Y", "DD/MM/YYYY"),
-        ("%d-%m-%Y", "DD-MM-YYYY"),
-        ("%Y-%m-%dT%H:%M:%SZ", "ISO-Z"),
-        ("%Y-%m-%dT%H:%M:%S", "ISO"),  # sin Z
-    ]
-    for fmt, label in formats:
-        try:
-            dt = datetime.strptime(raw, fmt)
-            iso = dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-            return (True, label, iso)
-        except Exception:
-            pass
-
-    # Fallback: fromisoformat
-    try:
-        dt = datetime.fromisoformat(raw.replace("Z", "+00:00"))
-        iso = dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-        return (True, "fromisoformat", iso)
-    except Exception:
+    label, dt = parse_datetime(s.strip())
+    if dt is None:
         return (False, None, None)
+    return (True, label, dt.strftime("%Y-%m-%dT%H:%M:%SZ"))
 
 
 def _sample(lst: List[Any], n: int = 10):
@@ -66,6 +226,9 @@ def _to_ts(s: Optional[str]) -> Optional[float]:
     """
     Convierte una fecha en texto a timestamp (segundos desde epoch).
     Usa _try_parse_date para aceptar distintos formatos.
+
+    Los endpoints usan las columnas precalculadas del snapshot
+    (snapshot.fechas); esta función queda para diagnóstico.
     """
     ok, _, iso = _try_parse_date(s)
     if not ok or not iso:
@@ -77,108 +240,66 @@ def _to_ts(s: Optional[str]) -> Optional[float]:
         return None
 
 
-# ───────────────────────── Ingresos ─────────────────────────
-_INGRESOS_KEYS = [
-    "remuneracionMensualCargoPublico",
-    "remuneracionAnualCargoPublico",
-    "ingresoMensualNetoDeclarante",
-    "ingresoAnualNetoDeclarante",
-    "totalIngresosMensualesNetos",
-    "totalIngresosAnualesNetos",
-    "actividadEmpresarial",
-    "actividadFinanciera",
-    "serviciosProfesionales",
-    "otrosIngresos",
-    "enajenacionBienes",
-]
-
-
-def _safe_number(value: Any) -> Optional[float]:
-    if value is None:
-        return None
-    if isinstance(value, (int, float)):
-        return float(value)
-    if isinstance(value, str):
-        v = value.strip()
-        if not v:
-            return None
-        try:
-            v = v.replace(",", "")
-            return float(v)
-        except Exception:
-            return None
-    return None
-
-
-def _normalize_ingresos_dict(raw: Any) -> Dict[str, Optional[float]]:
-    """
-    Normaliza el campo d['ingresos'] del dataset a:
-      {
-        clave: float | None
-      }
-
-    No rompe si el campo no existe o viene raro.
-    """
-    if not isinstance(raw, dict):
-        return {}
+# ───────────────────────── Route wrapper ─────────────────────────
+def _response_size(response: Response, route: str) -> Optional[int]:
+    """Bytes del cuerpo; en streaming se miden al terminar de enviarlo."""
+    if isinstance(response, StreamingResponse):
+        body = response.body_iterator
 
-    out: Dict[str, Optional[float]] = {}
-    has_any = False
-    for key in _INGRESOS_KEYS:
-        val = _safe_number(raw.get(key))
-        out[key] = val
-        if val is not None:
-            has_any = True
+        async def counted():
+            size = 0
+            try:
+                async for chunk in body:
+                    size += len(chunk)
+                    yield chunk
+            finally:
+                metricas.HTTP_SIZE.observe(size, route)
 
-    return out if has_any else {}
+        response.body_iterator = counted()
+        return None
+    length = response.headers.get("content-length")
+    return int(length) if length is not None else None
 
 
-def _merge_ingresos_acumulados(
-    current: Optional[Dict[str, Optional[float]]],
-    new_vals: Optional[Dict[str, Optional[float]]],
-) -> Optional[Dict[str, Optional[float]]]:
-    """
-    Para endpoints agregados por declarante:
-    - Si current es None, se queda new_vals.
-    - Si ambos tienen datos, se queda el que tenga mayor ingresoAnualNetoDeclarante,
-      y si no hay ese campo, simplemente el que tenga más campos no nulos.
-    """
-    if not new_vals:
-        return current
-    if not current:
-        return new_vals
-
-    # Comparar por ingresoAnualNetoDeclarante
-    a = current.get("ingresoAnualNetoDeclarante")
-    b = new_vals.get("ingresoAnualNetoDeclarante")
-    if a is None and b is not None:
-        return new_vals
-    if b is None and a is not None:
-        return current
-    if a is not None and b is not None:
-        if b > a:
-            return new_vals
-        else:
-            return current
-
-    # Fallback: quien tenga más campos no nulos
-    def non_null_count(d: Dict[str, Optional[float]]) -> int:
-        return sum(1 for v in d.values() if v is not None)
-
-    return new_vals if non_null_count(new_vals) > non_null_count(current) else current
+def _cache_headers(etag: str) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": cache_control(CACHE_MAX_AGE)}
 
 
-# ───────────────────────── Route wrapper ─────────────────────────
 class LoggingRoute(APIRoute):
     def get_route_handler(self):
         original_handler = super().get_route_handler()
+        # Plantilla de la ruta (p. ej. /timeline/by-nombre/batch, sin parámetros
+        # de consulta): etiqueta de baja cardinalidad
+        route = self.path
 
         async def custom_handler(request: Request):
             if request.url.path.startswith("/timeline"):
                 start = time.perf_counter()
+                status = 500
+                size: Optional[int] = None
                 try:
+                    etag = None
+                    # Una sola versión por petición (ETag y handler, ver _snapshot).
+                    # Sin versión publicada: 503 (no se carga en el event loop)
+                    snap = request.state.snapshot = _get_snapshot()
+                    if request.method in ("GET", "HEAD"):
+                        etag = compute_etag(
+                            snap.fingerprint,
+                            request.url.path,
+                            request.query_params.multi_items(),
+                        )
+                        if_none_match = request.headers.get("if-none-match")
+                        if if_none_match and matches(if_none_match, etag):
+                            # El cliente ya tiene esta respuesta: 304 sin ejecutar el handler
+                            metricas.cache_hit("http_etag", True)
+                            status = 304
+                            return Response(status_code=304, headers=_cache_headers(etag))
                     response = await original_handler(request)
-                    status = getattr(response, "status_code", "?")
+                    status = response.status_code
+                    if etag is not None and status == 200:
+                        metricas.cache_hit("http_etag", False)
+                        response.headers.update(_cache_headers(etag))
+                    size = _response_size(response, route)
                     elapsed_ms = (time.perf_counter() - start) * 1000
                     if DEBUG:
                         logger.info(
@@ -186,6 +307,19 @@ class LoggingRoute(APIRoute):
                             f"query={dict(request.query_params)} status={status} t={elapsed_ms:.1f}ms"
                         )
                     return response
+                except HTTPException as e:
+                    # Error del cliente (parámetros, cursor): sin traceback
+                    status = e.status_code
+                    if DEBUG:
+                        elapsed_ms = (time.perf_counter() - start) * 1000
+                        logger.info(
+                            f"{BANNER} {request.method} {request.url.path} "
+                            f"query={dict(request.query_params)} status={e.status_code} t={elapsed_ms:.1f}ms"
+                        )
+                    raise
+                except RequestValidationError:
+                    status = 422
+                    raise
                 except Exception as e:
                     elapsed_ms = (time.perf_counter() - start) * 1000
                     logger.exception(
@@ -193,6 +327,10 @@ class LoggingRoute(APIRoute):
                         f"query={dict(request.query_params)} t={elapsed_ms:.1f}ms"
                     )
                     raise
+                finally:
+                    metricas.observe_request(
+                        route, request.method, status, time.perf_counter() - start, size
+                    )
             else:
                 return await original_handler(request)
 
@@ -200,11 +338,20 @@ class LoggingRoute(APIRoute):
 
 
 # Router con route_class para logging
-router = APIRouter(prefix="/timeline", tags=["timeline"], route_class=LoggingRoute)
+router = APIRouter(
+    prefix="/timeline",
+    tags=["timeline"],
+    route_class=LoggingRoute,
+    # Sin jsonable_encoder: los handlers devuelven la respuesta ya armada
+    default_response_class=FastJSONResponse,
+)
 
 # ───────────────────────── Endpoints ─────────────────────────
 @router.get("/by-nombre")
-def timeline_by_nombre(nombre: str = Query(..., description="Nombre exacto del declarante")):
+async def timeline_by_nombre(
+    nombre: str = Query(..., description="Nombre del declarante (sin distinguir mayúsculas ni espacios extra)"),
+    snap: DataView = Depends(_snapshot),
+):
     """
     Devuelve todos los contratos y el encargo del declarante
     incluyendo datos del puesto, institución y fechas clave.
@@ -214,65 +361,70 @@ def timeline_by_nombre(nombre: str = Query(..., description="Nombre exacto del d
     Ahora también incluye, si existen en el dataset, los ingresos declarados:
     - ingresos: { ... campos numéricos ... }
     """
-    data = _load_data()
-    nombre_lower = nombre.lower()
-    resultados: List[Dict[str, Any]] = []
+    # Arma las filas del declarante en el pool de hilos
+    return await run_in_threadpool(_by_nombre, snap, nombre)
 
-    for d in data:
-        if (d.get("nombreDeclarante") or "").lower() == nombre_lower:
-            c = d.get("contrato") or {}
 
-            # ── Monto ─────────────────────────────
-            monto = c.get("montoContrato", 0)
-            try:
-                monto = float(monto)
-            except Exception:
-                monto = 0.0
+def _timeline_row(d: Dict[str, Any]) -> Dict[str, Any]:
+    """Fila de /by-nombre: contrato, encargo e ingresos de un registro."""
+    c = d.get("contrato") or {}
 
-            # ── Normalizar nombres de entes para comparación ──
-            ente_declarante = (d.get("nombreEntePublico") or "").strip()
-            institucion_compradora = (c.get("institucionCompradora") or "").strip()
+    # ── Monto ─────────────────────────────
+    monto = c.get("montoContrato", 0)
+    try:
+        monto = float(monto)
+    except Exception:
+        monto = 0.0
 
-            mismo_ente = (
-                ente_declarante.lower() != "" and
-                ente_declarante.lower() == institucion_compradora.lower()
-            )
+    # ── Normalizar nombres de entes para comparación ──
+    ente_declarante = (d.get("nombreEntePublico") or "").strip()
+    institucion_compradora = (c.get("institucionCompradora") or "").strip()
+
+    mismo_ente = (
+        ente_declarante.lower() != "" and
+        ente_declarante.lower() == institucion_compradora.lower()
+    )
+
+    ingresos_norm = _normalize_ingresos_dict(d.get("ingresos", {}))
+
+    return {
+        # Identidad del declarante
+        "nombreDeclarante": d.get("nombreDeclarante"),
+        "correoInstitucional": d.get("correoInstitucional"),
+        "institucionDeclarante": d.get("institucionDeclarante"),
+        "nombreEntePublico": ente_declarante,
+        "nivelOrdenGobierno": d.get("nivelOrdenGobierno"),
+        "puesto": d.get("puesto"),
+        "funcionPrincipal": d.get("funcionPrincipal"),
+
+        # Empresa o relación privada
+        "empresaRelacionada": d.get("empresaRelacionada"),
+        "tipoParticipacion": d.get("tipoParticipacion"),
+        "porcentajeParticipacion": d.get("porcentajeParticipacion"),
+        "remuneracion": d.get("remuneracion"),
+        "sector": (d.get("sectorS1") or {}).get("valor"),
+
+        # Fechas clave (crudas del dataset)
+        "fechaTomaPosesion": d.get("fechaTomaPosesion"),
+
+        # Contrato público vinculado
+        "fechaInicioContrato": c.get("fechaInicioContrato"),
+        "fechaFinContrato": c.get("fechaFinContrato"),
+        "montoContrato": monto,
+        "descripcionContrato": c.get("descripcionContrato"),
+        "institucionCompradora": institucion_compradora,
+
+        # Posible conflicto de interés
+        "mismoEnteDeclaranteComprador": mismo_ente,
+
+        # Ingresos declarados (si existen)
+        "ingresos": ingresos_norm,
+    }
 
-            ingresos_norm = _normalize_ingresos_dict(d.get("ingresos", {}))
-
-            resultados.append({
-                # Identidad del declarante
-                "nombreDeclarante": d.get("nombreDeclarante"),
-                "correoInstitucional": d.get("correoInstitucional"),
-                "institucionDeclarante": d.get("institucionDeclarante"),
-                "nombreEntePublico": ente_declarante,
-                "nivelOrdenGobierno": d.get("nivelOrdenGobierno"),
-                "puesto": d.get("puesto"),
-                "funcionPrincipal": d.get("funcionPrincipal"),
-
-                # Empresa o relación privada
-                "empresaRelacionada": d.get("empresaRelacionada"),
-                "tipoParticipacion": d.get("tipoParticipacion"),
-                "porcentajeParticipacion": d.get("porcentajeParticipacion"),
-                "remuneracion": d.get("remuneracion"),
-                "sector": (d.get("sectorS1") or {}).get("valor"),
-
-                # Fechas clave (crudas del dataset)
-                "fechaTomaPosesion": d.get("fechaTomaPosesion"),
-
-                # Contrato público vinculado
-                "fechaInicioContrato": c.get("fechaInicioContrato"),
-                "fechaFinContrato": c.get("fechaFinContrato"),
-                "montoContrato": monto,
-                "descripcionContrato": c.get("descripcionContrato"),
-                "institucionCompradora": institucion_compradora,
-
-                # Posible conflicto de interés
-                "mismoEnteDeclaranteComprador": mismo_ente,
-
-                # Ingresos declarados (si existen)
-                "ingresos": ingresos_norm,
-            })
+
+def _by_nombre(snap: DataView, nombre: str) -> Response:
+    # Índice por nombre normalizado: sólo se visitan los registros que coinciden
+    resultados = [_timeline_row(d) for d in snap.records_by_name(nombre)]
 
     # ───── Debug ruidoso (no altera la respuesta) ─────
     if DEBUG:
@@ -315,40 +467,100 @@ def timeline_by_nombre(nombre: str = Query(..., description="Nombre exacto del d
         preview = _sample(resultados, 5)
         logger.info(f"{BANNER} preview (top 5) → " + json.dumps(preview, ensure_ascii=False))
 
-    return {"count": len(resultados), "contratos": resultados}
+    return FastJSONResponse({"count": len(resultados), "contratos": resultados})
+
+
+# Columnas de cada fila de /by-nombre (para validar la proyección del batch)
+_TIMELINE_CAMPOS = tuple(_timeline_row({}))
+
+
+class BatchByNombre(BaseModel):
+    nombres: List[str] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_NOMBRES,
+        description="Nombres de los declarantes (sin distinguir mayúsculas ni espacios extra)",
+    )
+    campos: Optional[List[str]] = Field(
+        None, description="Columnas de cada contrato a devolver (por defecto todas)"
+    )
+
+
+@router.post("/by-nombre/batch")
+async def timeline_by_nombre_batch(body: BatchByNombre, snap: DataView = Depends(_snapshot)):
+    """
+    Timeline de varios declarantes en una sola petición (p. ej. todas las
+    filas de un panel de riesgo). Todos los nombres se resuelven juntos
+    contra el índice por nombre y vuelven agrupados en el orden pedido;
+    los nombres repetidos aparecen una sola vez.
+
+    `campos` limita las columnas de cada contrato para aligerar la respuesta.
+    """
+    if body.campos is not None:
+        desconocidos = sorted(set(body.campos) - set(_TIMELINE_CAMPOS))
+        if desconocidos:
+            raise HTTPException(
+                status_code=400,
+                detail=f"campos desconocidos: {desconocidos}; válidos: {list(_TIMELINE_CAMPOS)}",
+            )
+    return await _heavy.run(_by_nombre_batch, snap, body.nombres, body.campos)
+
+
+def _by_nombre_batch(
+    snap: DataView, nombres: List[str], campos: Optional[List[str]]
+) -> Response:
+    grupos = snap.records_by_names(nombres)
+
+    resultados: List[Dict[str, Any]] = []
+    vistos = set()
+    for nombre in nombres:
+        key = normalize_text(nombre)
+        if key in vistos:
+            continue
+        vistos.add(key)
+        filas = [_timeline_row(d) for d in grupos.get(key, ())]
+        if campos is not None:
+            filas = [{k: f[k] for k in campos} for f in filas]
+        resultados.append({"nombre": nombre, "count": len(filas), "contratos": filas})
+
+    if DEBUG:
+        total = sum(r["count"] for r in resultados)
+        logger.info(
+            f"{BANNER} /by-nombre/batch nombres={len(resultados)} → {total} resultado(s)"
+        )
+
+    return FastJSONResponse({"count": len(resultados), "resultados": resultados})
 
 
 @router.get("/suggest")
-def suggest(query: str = Query("", min_length=1, description="Texto parcial del nombre")):
+async def suggest(
+    query: str = Query("", min_length=1, description="Texto parcial del nombre"),
+    limit: int = Query(20, ge=1, le=100, description="Máximo de sugerencias"),
+    snap: DataView = Depends(_snapshot),
+):
     """
     Devuelve nombres de declarantes que:
-    - Contienen el texto buscado
+    - Contienen el texto buscado (sin distinguir mayúsculas ni acentos)
     - Tienen una fechaTomaPosesion no vacía
+
+    Orden: primero los que empiezan con el texto, luego los que tienen una
+    palabra que empieza con él y al final el resto; en empate, los de más
+    contratos y después alfabético.
     """
-    data = _load_data()
-    q = query.lower()
-    nombres = set()
-    for d in data:
-        n = d.get("nombreDeclarante") or ""
-        fecha = d.get("fechaTomaPosesion")
-        if not fecha:
-            continue
-        if q in n.lower():
-            nombres.add(n)
-        if len(nombres) >= 20:
-            break
+    return await run_in_threadpool(_suggest, snap, query, limit)
 
-    items = sorted(nombres)
+
+def _suggest(snap: DataView, query: str, limit: int) -> Response:
+    items = snap.suggest(query, limit)
 
     if DEBUG:
         logger.info(f"{BANNER} /suggest query='{query}' → {len(items)} item(s)")
         logger.info(f"{BANNER} /suggest top10 → " + json.dumps(_sample(items, 10), ensure_ascii=False))
 
-    return {"items": items}
+    return FastJSONResponse({"items": items})
 
 
 @router.get("/declarantes-cruce-toma")
-def declarantes_con_contratos_antes_y_despues(
+async def declarantes_con_contratos_antes_y_despues(
+    request: Request,
     sort_by: str = Query(
         "monto",
         pattern="^(monto|contratos|nombre)$",
@@ -359,6 +571,22 @@ def declarantes_con_contratos_antes_y_despues(
         pattern="^(asc|desc)$",
         description="Dirección de ordenamiento: 'asc' o 'desc'.",
     ),
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="Tamaño de página. Sin valor se devuelven todos los resultados.",
+    ),
+    offset: int = Query(0, ge=0, description="Posición inicial (se ignora si se envía cursor)."),
+    cursor: Optional[str] = Query(None, description="Valor de next_cursor de la página anterior."),
+    formato: str = Query(
+        "json",
+        alias="format",
+        pattern=_FORMAT_PATTERN,
+        description="'json' (normal), 'ndjson' (una fila por línea) o 'json-stream' (JSON por partes).",
+    ),
+    filtro: Filtro = Depends(_filtro_paneles),
+    snap: DataView = Depends(_snapshot),
 ):
     """
     Lista declarantes cuya fechaTomaPosesion está rodeada por contratos:
@@ -373,186 +601,98 @@ def declarantes_con_contratos_antes_y_despues(
       - contratosDespues
       - montoTotal (suma de montos de todos sus contratos)
       - ingresos (si hay alguno en el dataset para ese declarante)
-    """
-    data = _load_data()
-
-    agregados: Dict[str, Dict[str, Any]] = {}
 
-    for d in data:
-        nombre = (d.get("nombreDeclarante") or "").strip()
-        if not nombre:
-            continue
-
-        # Fecha de toma de posesión
-        toma_raw = d.get("fechaTomaPosesion")
-        toma_ts = _to_ts(toma_raw)
-        if toma_ts is None:
-            # Si no podemos parsear la fecha de toma, lo ignoramos
-            continue
-
-        # Ingresos normalizados de este registro (puede estar vacío)
-        ingresos_norm = _normalize_ingresos_dict(d.get("ingresos", {}))
-
-        # Inicializar registro agregado si no existe
-        if nombre not in agregados:
-            agregados[nombre] = {
-                "nombreDeclarante": nombre,
-                "fechaTomaPosesion": toma_raw,
-                "toma_ts": toma_ts,
-                "tiene_antes": False,
-                "tiene_despues": False,
-                "total_contratos": 0,
-                "contratos_antes": 0,
-                "contratos_despues": 0,
-                "monto_total": 0.0,
-                "ingresos": ingresos_norm if ingresos_norm else None,
-            }
-        else:
-            # Intentar mejorar el resumen de ingresos si este registro trae algo
-            if ingresos_norm:
-                agregados[nombre]["ingresos"] = _merge_ingresos_acumulados(
-                    agregados[nombre].get("ingresos"),
-                    ingresos_norm,
-                )
-
-        reg = agregados[nombre]
-
-        # Extraer contrato
-        c = d.get("contrato") or {}
-        ini_ts = _to_ts(c.get("fechaInicioContrato"))
-        fin_ts = _to_ts(c.get("fechaFinContrato"))
-
-        # Monto del contrato
-        monto_raw = c.get("montoContrato")
-        try:
-            monto = float(monto_raw) if monto_raw not in (None, "", " ", "null") else 0.0
-        except Exception:
-            monto = 0.0
-
-        # Si no hay fechas útiles, no sirve para lógica de antes/después,
-        # pero sí para sumar monto y contar contrato
-        tiene_fecha_util = (ini_ts is not None) or (fin_ts is not None)
-
-        reg["total_contratos"] += 1
-        reg["monto_total"] += monto
+    Filtros opcionales: nivel, sector, ente, institucion (un declarante
+    pasa si alguno de sus registros tiene el valor), monto_min/monto_max
+    sobre montoTotal y toma_desde/toma_hasta sobre fechaTomaPosesion.
+    """
+    # Vista materializada por versión del dataset, ya ordenada.
+    # Por parámetros de la petición: se busca antes de filtrar. Un cursor
+    # inválido o de otra versión nunca llega a la caché (responde 400/409)
+    key = ("cruce-toma", sort_by, sort_dir, filtro.key(), limit, offset, cursor)
+    if formato == "json":
+        body = _responses.lookup(snap.version, key)
+        if body is not None:
+            return await _send(request, body)
+    vista, order = await _panel(snap, "cruce-toma", filtro, sort_by, sort_dir)
+    page = _plan_page(snap, order, len(vista), limit, offset, cursor)
+    if formato != "json":
+        return stream_rows(
+            formato, page.meta(), vista.iter_ordered(sort_by, sort_dir, page.start, page.stop)
+        )
 
-        if not tiene_fecha_util:
-            continue
+    def build() -> Dict[str, Any]:
+        seleccionados = vista.ordered(sort_by, sort_dir, page.start, page.stop)
 
-        # Lógica "antes" y "después"
-        toma_ts = reg["toma_ts"]
-        antes = False
-        despues = False
-
-        if ini_ts is not None and fin_ts is not None:
-            # Contrato completamente antes de la toma
-            if fin_ts < toma_ts:
-                antes = True
-                reg["contratos_antes"] += 1
-            # Contrato completamente después de la toma
-            if ini_ts > toma_ts:
-                despues = True
-                reg["contratos_despues"] += 1
-        else:
-            # Solo inicio
-            if ini_ts is not None and ini_ts < toma_ts:
-                antes = True
-                reg["contratos_antes"] += 1
-            if ini_ts is not None and ini_ts > toma_ts:
-                despues = True
-                reg["contratos_despues"] += 1
-
-            # Solo fin
-            if fin_ts is not None and fin_ts < toma_ts:
-                antes = True
-                reg["contratos_antes"] += 1
-            if fin_ts is not None and fin_ts > toma_ts:
-                despues = True
-                reg["contratos_despues"] += 1
-
-        if antes:
-            reg["tiene_antes"] = True
-        if despues:
-            reg["tiene_despues"] = True
-
-    # Filtrar solo quienes tienen contratos antes y después
-    seleccionados = [
-        {
-            "nombreDeclarante": r["nombreDeclarante"],
-            "fechaTomaPosesion": r["fechaTomaPosesion"],
-            "totalContratos": r["total_contratos"],
-            "contratosAntes": r["contratos_antes"],
-            "contratosDespues": r["contratos_despues"],
-            "montoTotal": r["monto_total"],
-            "ingresos": r.get("ingresos") or {},
-        }
-        for r in agregados.values()
-        if r["tiene_antes"] and r["tiene_despues"]
-    ]
-
-    # ───── Ordenamiento configurable ─────
-    reverse = sort_dir == "desc"
-
-    if sort_by == "nombre":
-        seleccionados.sort(key=lambda r: r["nombreDeclarante"] or "", reverse=reverse)
-    elif sort_by == "contratos":
-        seleccionados.sort(key=lambda r: r["totalContratos"], reverse=reverse)
-    else:  # "monto"
-        seleccionados.sort(key=lambda r: r["montoTotal"], reverse=reverse)
+        if DEBUG:
+            logger.info(
+                f"{BANNER} /declarantes-cruce-toma sort_by={sort_by} sort_dir={sort_dir} "
+                f"offset={page.start} → {len(seleccionados)}/{page.total} declarante(s)"
+            )
+            logger.info(
+                f"{BANNER} /declarantes-cruce-toma top10 → "
+                + json.dumps(_sample(seleccionados, 10), ensure_ascii=False)
+            )
 
-    if DEBUG:
-        logger.info(
-            f"{BANNER} /declarantes-cruce-toma sort_by={sort_by} sort_dir={sort_dir} → {len(seleccionados)} declarante(s)"
-        )
-        logger.info(
-            f"{BANNER} /declarantes-cruce-toma top10 → "
-            + json.dumps(_sample(seleccionados, 10), ensure_ascii=False)
-        )
+        return {**page.meta(), "items": seleccionados}
 
-    return {"count": len(seleccionados), "items": seleccionados}
+    return await _build_response(request, snap, key, build)
 
 
 @router.get("/declarantes")
-def list_declarantes(
+async def list_declarantes(
+    request: Request,
     with_toma: bool = Query(
         False,
         description="Si es true, solo incluye declarantes con fechaTomaPosesion no vacía",
-    )
+    ),
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="Tamaño de página. Sin valor se devuelven todos los resultados.",
+    ),
+    offset: int = Query(0, ge=0, description="Posición inicial (se ignora si se envía cursor)."),
+    cursor: Optional[str] = Query(None, description="Valor de next_cursor de la página anterior."),
+    formato: str = Query(
+        "json",
+        alias="format",
+        pattern=_FORMAT_PATTERN,
+        description="'json' (normal), 'ndjson' (una fila por línea) o 'json-stream' (JSON por partes).",
+    ),
+    snap: DataView = Depends(_snapshot),
 ):
     """
-    Lista de TODOS los nombres de declarantes (únicos).
+    Lista de TODOS los nombres de declarantes (únicos), en orden alfabético.
 
     - Por defecto: incluye a todo declarante que tenga nombreDeclarante no vacío.
     - Si with_toma=true: solo incluye los que tienen fechaTomaPosesion.
+    - Con limit se pagina; next_cursor trae la siguiente página.
+    - format=ndjson|json-stream envía la lista en streaming.
     """
-    data = _load_data()
-    nombres = set()
-
-    for d in data:
-        n = (d.get("nombreDeclarante") or "").strip()
-        if not n:
-            continue
-
-        if with_toma:
-            fecha = d.get("fechaTomaPosesion")
-            if not fecha:
-                continue
-
-        nombres.add(n)
-
-    items = sorted(nombres)
+    padron = snap.padron(with_toma)
+    page = _plan_page(snap, padron.name, len(padron), limit, offset, cursor)
+    if formato != "json":
+        return stream_rows(formato, page.meta(), padron.iter_ordered(page.start, page.stop))
+
+    def build() -> Dict[str, Any]:
+        items = padron.ordered(page.start, page.stop)
+
+        if DEBUG:
+            logger.info(
+                f"{BANNER} /declarantes with_toma={with_toma} offset={page.start} "
+                f"→ {len(items)}/{page.total} nombre(s)"
+            )
 
-    if DEBUG:
-        logger.info(
-            f"{BANNER} /declarantes with_toma={with_toma} → {len(items)} nombre(s)"
-        )
+        # El front acepta tanto {"items": [...]} como una lista directa.
+        return {"items": items, **page.meta()}
 
-    # El front acepta tanto {"items": [...]} como una lista directa.
-    return {"items": items}
+    return await _cached_response(request, snap, (padron.name, page.start, page.stop), build)
 
 
 @router.get("/declarantes-conflicto")
-def declarantes_conflicto(
+async def declarantes_conflicto(
+    request: Request,
     sort_by: str = Query(
         "monto",
         pattern="^(monto|contratos|nombre)$",
@@ -563,6 +703,22 @@ def declarantes_conflicto(
         pattern="^(asc|desc)$",
         description="Dirección de ordenamiento: 'asc' o 'desc'.",
     ),
+    limit: Optional[int] = Query(
+        None,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="Tamaño de página. Sin valor se devuelven todos los resultados.",
+    ),
+    offset: int = Query(0, ge=0, description="Posición inicial (se ignora si se envía cursor)."),
+    cursor: Optional[str] = Query(None, description="Valor de next_cursor de la página anterior."),
+    formato: str = Query(
+        "json",
+        alias="format",
+        pattern=_FORMAT_PATTERN,
+        description="'json' (normal), 'ndjson' (una fila por línea) o 'json-stream' (JSON por partes).",
+    ),
+    filtro: Filtro = Depends(_filtro_paneles),
+    snap: DataView = Depends(_snapshot),
 ):
     """
     Lista declarantes donde al menos un contrato tiene:
@@ -575,87 +731,115 @@ def declarantes_conflicto(
       - montoTotal      (suma de montos de contratos EN CONFLICTO)
       - enteCoincidente (nombre del ente público / institución)
       - ingresos        (si existen en el dataset para ese declarante)
+
+    Admite los mismos filtros que /declarantes-cruce-toma, evaluados sobre
+    los contratos en conflicto de cada declarante.
     """
-    data = _load_data()
+    # Vista materializada por versión del dataset, ya ordenada.
+    # Por parámetros de la petición: se busca antes de filtrar. Un cursor
+    # inválido o de otra versión nunca llega a la caché (responde 400/409)
+    key = ("conflicto", sort_by, sort_dir, filtro.key(), limit, offset, cursor)
+    if formato == "json":
+        body = _responses.lookup(snap.version, key)
+        if body is not None:
+            return await _send(request, body)
+    vista, order = await _panel(snap, "conflicto", filtro, sort_by, sort_dir)
+    page = _plan_page(snap, order, len(vista), limit, offset, cursor)
+    if formato != "json":
+        return stream_rows(
+            formato, page.meta(), vista.iter_ordered(sort_by, sort_dir, page.start, page.stop)
+        )
 
-    agregados: Dict[str, Dict[str, Any]] = {}
+    def build() -> Dict[str, Any]:
+        seleccionados = vista.ordered(sort_by, sort_dir, page.start, page.stop)
 
-    for d in data:
-        nombre = (d.get("nombreDeclarante") or "").strip()
-        if not nombre:
-            continue
+        if DEBUG:
+            logger.info(
+                f"{BANNER} /declarantes-conflicto sort_by={sort_by} sort_dir={sort_dir} "
+                f"offset={page.start} → {len(seleccionados)}/{page.total} declarante(s)"
+            )
+            logger.info(
+                f"{BANNER} /declarantes-conflicto top10 → "
+                + json.dumps(_sample(seleccionados, 10), ensure_ascii=False)
+            )
 
-        ente_declarante_raw = (d.get("nombreEntePublico") or "").strip()
-        ente_declarante = ente_declarante_raw.lower()
+        return {**page.meta(), "items": seleccionados}
 
-        c = d.get("contrato") or {}
-        inst_compradora_raw = (c.get("institucionCompradora") or "").strip()
-        inst_compradora = inst_compradora_raw.lower()
+    return await _build_response(request, snap, key, build)
 
-        if not ente_declarante or not inst_compradora:
-            continue
 
-        # ¿Contrato en posible conflicto? (ente declarante == institución compradora)
-        if ente_declarante != inst_compradora:
-            continue
+@router.get("/ingresos-historial")
+async def ingresos_historial(
+    nombre: str = Query(..., description="Nombre del declarante (sin distinguir mayúsculas ni espacios extra)"),
+    institucion: Optional[str] = Query(
+        None,
+        description="institucionDeclarante, para distinguir homónimos (sin ella: el de mayor salto).",
+    ),
+    top_k: int = Query(
+        DEFAULT_TOP_K,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description="El declarante es atípico si su mayor salto está entre los top_k de todo el dataset.",
+    ),
+    snap: DataView = Depends(_snapshot),
+):
+    """
+    Serie anual de ingresos declarados (historialIngresos del dataset
+    enriquecido) con el crecimiento contra el año anterior con dato.
+
+    Devuelve:
+      - serie: [{anio, fecha, ingreso, crecimiento, aniosDesdeAnterior}]
+        (un punto por año: la declaración más reciente; el crecimiento
+        se anualiza si hay años sin declaración)
+      - maxCrecimiento / anioBase / ingresoBase / anio / ingreso: su mayor salto
+      - zScore: qué tan extremo es ese salto frente a todos los declarantes
+      - rank: posición del salto en el dataset (1 = el mayor)
+      - atipico: rank <= top_k
+
+    Las series se agrupan por (nombre, institucionDeclarante), como en el
+    enriquecimiento.
+    """
+    return await run_in_threadpool(_ingresos_historial, snap, nombre, institucion, top_k)
 
-        # Monto del contrato
-        monto_raw = c.get("montoContrato")
-        try:
-            monto = float(monto_raw) if monto_raw not in (None, "", " ", "null") else 0.0
-        except Exception:
-            monto = 0.0
-
-        ingresos_norm = _normalize_ingresos_dict(d.get("ingresos", {}))
-
-        if nombre not in agregados:
-            agregados[nombre] = {
-                "nombreDeclarante": nombre,
-                "fechaTomaPosesion": d.get("fechaTomaPosesion"),
-                "totalContratos": 0,
-                "montoTotal": 0.0,
-                "enteCoincidente": ente_declarante_raw or inst_compradora_raw,
-                "ingresos": ingresos_norm if ingresos_norm else None,
-            }
-        else:
-            if ingresos_norm:
-                agregados[nombre]["ingresos"] = _merge_ingresos_acumulados(
-                    agregados[nombre].get("ingresos"),
-                    ingresos_norm,
-                )
 
-        reg = agregados[nombre]
-        reg["totalContratos"] += 1
-        reg["montoTotal"] += monto
-
-    seleccionados = [
-        {
-            "nombreDeclarante": r["nombreDeclarante"],
-            "fechaTomaPosesion": r["fechaTomaPosesion"],
-            "totalContratos": r["totalContratos"],
-            "montoTotal": r["montoTotal"],
-            "enteCoincidente": r["enteCoincidente"],
-            "ingresos": r.get("ingresos") or {},
-        }
-        for r in agregados.values()
-    ]
-
-    # ───── Ordenamiento ─────
-    reverse = sort_dir == "desc"
-    if sort_by == "nombre":
-        seleccionados.sort(key=lambda r: r["nombreDeclarante"] or "", reverse=reverse)
-    elif sort_by == "contratos":
-        seleccionados.sort(key=lambda r: r["totalContratos"], reverse=reverse)
-    else:  # "monto"
-        seleccionados.sort(key=lambda r: r["montoTotal"], reverse=reverse)
+def _ingresos_historial(
+    snap: DataView, nombre: str, institucion: Optional[str], top_k: int
+) -> Response:
+    item = (
+        snap.ingresos_historial(nombre, institucion)
+        or sin_historial(nombre, institucion)
+    )
+    rank = item["rank"]
+    item["atipico"] = rank is not None and rank <= top_k
 
     if DEBUG:
         logger.info(
-            f"{BANNER} /declarantes-conflicto sort_by={sort_by} sort_dir={sort_dir} → {len(seleccionados)} declarante(s)"
-        )
-        logger.info(
-            f"{BANNER} /declarantes-conflicto top10 → "
-            + json.dumps(_sample(seleccionados, 10), ensure_ascii=False)
+            f"{BANNER} /ingresos-historial nombre='{nombre}' → {len(item['serie'])} año(s), "
+            f"rank={rank} atipico={item['atipico']}"
         )
 
-    return {"count": len(seleccionados), "items": seleccionados}
+    return FastJSONResponse(item)
+
+
+@router.get("/ingresos-atipicos")
+async def ingresos_atipicos(
+    request: Request,
+    top_k: int = Query(DEFAULT_TOP_K, ge=1, le=MAX_PAGE_SIZE, description="Número de declarantes."),
+    snap: DataView = Depends(_snapshot),
+):
+    """
+    Declarantes con los mayores saltos anuales de ingreso, de mayor a menor.
+    Sólo cuentan saltos cuyo año base declara al menos min_base.
+
+    Devuelve por declarante: rank, nombreDeclarante, maxCrecimiento,
+    zScore, anioBase, ingresoBase, anio, ingreso.
+    """
+    def build() -> Dict[str, Any]:
+        items = snap.ingresos_atipicos(top_k)
+
+        if DEBUG:
+            logger.info(f"{BANNER} /ingresos-atipicos top_k={top_k} → {len(items)} declarante(s)")
+
+        return {"top_k": top_k, "min_base": MIN_BASE, "items": items}
+
+    return await _cached_response(request, snap, ("ingresos-atipicos", top_k), build)
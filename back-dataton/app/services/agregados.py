@@ -0,0 +1,215 @@
+# app/services/agregados.py
+"""
+Vistas materializadas de los paneles de riesgo y del padrón.
+
+Los resultados de /declarantes-cruce-toma y /declarantes-conflicto sólo
+dependen del dataset, así que se calculan una vez por versión junto con
+las permutaciones de orden de cada combinación sort_by/sort_dir y los
+índices de filtrado (filtros.FilterIndex). Una petición sólo toma (una
+rebanada de) una permutación ya calculada, restringida a los items que
+pasan sus filtros.
+"""
+import logging
+import time
+from itertools import islice
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.columnar import ColumnStore, conflicto, cruce_toma
+from app.services.filtros import FilterIndex, Filtro
+
+logger = logging.getLogger("uvicorn.error")
+
+BANNER = "🟣[VISTAS]"
+
+SORT_FIELDS = {
+    "monto": "montoTotal",
+    "contratos": "totalContratos",
+    "nombre": "nombreDeclarante",
+}
+SORT_DIRS = ("asc", "desc")
+
+# Índices convertidos a int de Python por bloque al iterar una vista
+_ITER_BLOCK = 1024
+
+
+def stable_argsort(keys: np.ndarray, descending: bool) -> np.ndarray:
+    """
+    argsort estable con el mismo resultado que list.sort(reverse=...):
+    en orden descendente los empates también conservan el orden original.
+    """
+    if not descending:
+        return np.argsort(keys, kind="stable")
+    n = len(keys)
+    return (n - 1) - np.argsort(keys[::-1], kind="stable")[::-1]
+
+
+def _sort_keys(items: Sequence[Dict[str, Any]], field: str) -> np.ndarray:
+    if field == "nombreDeclarante":
+        return np.array([r[field] or "" for r in items], dtype=str)
+    return np.array([r[field] for r in items], dtype=np.float64)
+
+
+def _iter_perm(items: Sequence[Dict[str, Any]], perm: np.ndarray) -> Iterator[Dict[str, Any]]:
+    for pos in range(0, len(perm), _ITER_BLOCK):
+        for i in perm[pos:pos + _ITER_BLOCK].tolist():
+            yield items[i]
+
+
+@dataclass(frozen=True)
+class AggregateView:
+    """
+    Items por declarante (orden de primera aparición) + permutaciones de
+    orden + índices de filtrado.
+    """
+
+    name: str
+    items: List[Dict[str, Any]]
+    perms: Dict[Tuple[str, str], np.ndarray]
+    filtros: FilterIndex
+    build_ms: float
+
+    @classmethod
+    def build(
+        cls,
+        name: str,
+        compute: Callable[[], List[Dict[str, Any]]],
+        cols: ColumnStore,
+        rows_mask: np.ndarray,
+    ) -> "AggregateView":
+        """`rows_mask`: registros que aportan a la vista (para los filtros)."""
+        start = time.perf_counter()
+        items = compute()
+        perms: Dict[Tuple[str, str], np.ndarray] = {}
+        for sort_by, field in SORT_FIELDS.items():
+            keys = _sort_keys(items, field)
+            for sort_dir in SORT_DIRS:
+                perms[(sort_by, sort_dir)] = stable_argsort(keys, sort_dir == "desc")
+        filtros = FilterIndex.build(cols, rows_mask, items)
+        build_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            f"{BANNER} {name}: {len(items)} declarante(s), "
+            f"filtros={filtros.build_ms:.1f}ms, t={build_ms:.1f}ms"
+        )
+        return cls(name=name, items=items, perms=perms, filtros=filtros, build_ms=build_ms)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def ordered(
+        self, sort_by: str, sort_dir: str, start: int = 0, stop: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Items en el orden pedido; con start/stop sólo esa rebanada."""
+        items = self.items
+        return [items[i] for i in self.perms[(sort_by, sort_dir)][start:stop].tolist()]
+
+    def iter_ordered(
+        self, sort_by: str, sort_dir: str, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Como ordered(), pero sin materializar la lista (para streaming)."""
+        return _iter_perm(self.items, self.perms[(sort_by, sort_dir)][start:stop])
+
+    def filtrar(self, filtro: Filtro) -> "FilteredView":
+        return FilteredView(self, self.filtros.select(filtro))
+
+
+class FilteredView:
+    """
+    Items de una AggregateView que pasan un filtro, con los mismos órdenes:
+    cada permutación precalculada se restringe a la selección (se calcula
+    sólo para el orden que se pide).
+    """
+
+    def __init__(self, base: AggregateView, selected: np.ndarray):
+        self.name = base.name
+        self._base = base
+        self._selected = selected
+        self._perms: Dict[Tuple[str, str], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._selected)
+
+    def _perm(self, sort_by: str, sort_dir: str) -> np.ndarray:
+        perm = self._perms.get((sort_by, sort_dir))
+        if perm is None:
+            full = self._base.perms[(sort_by, sort_dir)]
+            keep = np.zeros(len(full), dtype=bool)
+            keep[self._selected] = True
+            perm = self._perms[(sort_by, sort_dir)] = full[keep[full]]
+        return perm
+
+    def ordered(
+        self, sort_by: str, sort_dir: str, start: int = 0, stop: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        items = self._base.items
+        return [items[i] for i in self._perm(sort_by, sort_dir)[start:stop].tolist()]
+
+    def iter_ordered(
+        self, sort_by: str, sort_dir: str, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        return _iter_perm(self._base.items, self._perm(sort_by, sort_dir)[start:stop])
+
+
+@dataclass(frozen=True)
+class NameList:
+    """Lista de nombres ya ordenada (padrón), con la misma interfaz de rebanadas."""
+
+    name: str
+    names: List[str]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def ordered(self, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        return self.names[start:stop]
+
+    def iter_ordered(self, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        return islice(self.names, start, stop)
+
+
+def build_padron(cols: ColumnStore) -> Tuple[NameList, NameList]:
+    """Nombres únicos ordenados: (todos, sólo con fechaTomaPosesion)."""
+    names = cols.decl_names
+    con_toma = np.unique(cols.decl_id[cols.has_toma & (cols.decl_id >= 0)])
+    return (
+        NameList("padron", sorted(names)),
+        NameList("padron:toma", sorted(names[i] for i in con_toma.tolist())),
+    )
+
+
+@dataclass(frozen=True)
+class MaterializedViews:
+    """Resultados de los endpoints de listas, calculados una vez por versión."""
+
+    cruce_toma: AggregateView
+    conflicto: AggregateView
+    padron: NameList
+    padron_con_toma: NameList
+
+    @classmethod
+    def build(cls, records: Sequence[Dict[str, Any]], cols: ColumnStore) -> "MaterializedViews":
+        start = time.perf_counter()
+        padron, padron_con_toma = build_padron(cols)
+        logger.info(
+            f"{BANNER} padrón: {len(padron)} nombre(s), {len(padron_con_toma)} con toma, "
+            f"t={(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return cls(
+            cruce_toma=AggregateView.build(
+                "cruce-toma", lambda: cruce_toma(records, cols), cols, ~np.isnan(cols.toma)
+            ),
+            conflicto=AggregateView.build(
+                "conflicto", lambda: conflicto(records, cols), cols, cols.conflicto
+            ),
+            padron=padron,
+            padron_con_toma=padron_con_toma,
+        )
+
+    def by_name(self, name: str) -> AggregateView:
+        """Vista por nombre ('cruce-toma' o 'conflicto')."""
+        for vista in (self.cruce_toma, self.conflicto):
+            if vista.name == name:
+                return vista
+        raise KeyError(name)
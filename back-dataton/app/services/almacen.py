@@ -0,0 +1,103 @@
+# app/services/almacen.py
+"""
+Interfaz común de acceso a datos del timeline.
+
+Los endpoints no dependen de dónde vive el dataset: piden al almacén un
+snapshot (una versión consistente de los datos) y sólo usan los métodos
+de DataView. Hay tres implementaciones:
+
+  - DatasetStore (dataset_store): todo en memoria, desde dataset.json o
+    el binario compilado.
+  - SqliteStore (almacen_sqlite): archivo SQLite en disco, para datasets
+    más grandes que la RAM o varios workers sobre el mismo archivo.
+  - SegmentStore (segmento): como DatasetStore, pero adjunto a índices y
+    vistas que un proceso cargador ya construyó en memoria compartida.
+"""
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Protocol, Sequence
+
+from app.services.almacen_sqlite import SqliteStore, is_sqlite_dataset
+from app.services.dataset_store import DatasetStore
+from app.services.filtros import Filtro
+from app.services.segmento import SegmentStore, is_segment
+
+
+class OrderedView(Protocol):
+    """Resultados de una lista de riesgo con sus órdenes y filtros precalculados."""
+
+    name: str
+
+    def __len__(self) -> int: ...
+
+    def ordered(
+        self, sort_by: str, sort_dir: str, start: int = 0, stop: Optional[int] = None
+    ) -> List[Dict[str, Any]]: ...
+
+    def iter_ordered(
+        self, sort_by: str, sort_dir: str, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]: ...
+
+    def filtrar(self, filtro: Filtro) -> "OrderedView": ...
+
+
+class NameView(Protocol):
+    """Padrón de nombres ya ordenado."""
+
+    name: str
+
+    def __len__(self) -> int: ...
+
+    def ordered(self, start: int = 0, stop: Optional[int] = None) -> List[str]: ...
+
+    def iter_ordered(self, start: int = 0, stop: Optional[int] = None) -> Iterator[str]: ...
+
+
+class DataView(Protocol):
+    """Versión del dataset tal como la ven los endpoints."""
+
+    version: int
+    fingerprint: str
+
+    def records_by_name(self, nombre: str) -> List[Dict[str, Any]]: ...
+
+    def records_by_names(self, nombres: Sequence[str]) -> Dict[str, List[Dict[str, Any]]]: ...
+
+    def suggest(self, query: str, limit: int) -> List[str]: ...
+
+    def padron(self, with_toma: bool) -> NameView: ...
+
+    def vista(self, name: str) -> OrderedView: ...
+
+    def ingresos_historial(
+        self, nombre: str, institucion: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]: ...
+
+    def ingresos_atipicos(self, top_k: int) -> List[Dict[str, Any]]: ...
+
+
+class DataStore(Protocol):
+    def get(self) -> DataView: ...
+
+    def current(self) -> Optional[DataView]: ...
+
+    def reload(self, force: bool = False) -> bool: ...
+
+    def start(self) -> None: ...
+
+    def stop(self) -> None: ...
+
+
+def open_store(
+    path: Path,
+    poll_interval: float = 2.0,
+    suggest_by_volume: bool = True,
+    pool_size: int = 4,
+) -> DataStore:
+    """Elige el backend según el archivo (SQLite por encabezado o extensión, segmento por encabezado)."""
+    if is_sqlite_dataset(path):
+        return SqliteStore(
+            path, poll_interval=poll_interval, pool_size=pool_size, suggest_by_volume=suggest_by_volume
+        )
+    if is_segment(path):
+        return SegmentStore(path, poll_interval=poll_interval, suggest_by_volume=suggest_by_volume)
+    return DatasetStore(path, poll_interval=poll_interval, suggest_by_volume=suggest_by_volume)
@@ -0,0 +1,660 @@
+# app/services/almacen_sqlite.py
+"""
+Backend SQLite del timeline.
+
+Alternativa a tener el dataset completo en memoria: un archivo SQLite de
+sólo lectura (generado con `python -m app.compilar_dataset entrada.json
+salida.sqlite`) con los registros indexados por nombre normalizado, ente
+público, institución compradora y fechas, más los resultados de las
+listas ya calculados y ordenados. Cada petición lee sólo las filas que
+necesita, así que el dataset puede ser más grande que la RAM, y varios
+workers de uvicorn comparten el mismo archivo (y la caché de páginas del
+sistema operativo) con un pool de conexiones por proceso.
+
+El archivo se reemplaza de forma atómica (rename) al regenerarlo; las
+conexiones abiertas siguen leyendo la versión anterior hasta que el hilo
+vigilante publica un pool nuevo.
+"""
+import json
+import logging
+import math
+import os
+import queue
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.services.texto import normalize_text
+from app.services.agregados import SORT_DIRS, SORT_FIELDS
+from app.services.dataset_store import DatasetSnapshot, DatasetStore
+from app.services.filtros import CAMPOS, Filtro
+from app.services.indices import SuggestIndex, suggest_key
+from app.services import metricas
+
+logger = logging.getLogger("uvicorn.error")
+
+BANNER = "🟣[SQLITE]"
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+SCHEMA_VERSION = 4
+
+# Filas por consulta al iterar una lista en streaming
+_ITER_BLOCK = 1024
+# Segundos máximos de espera por una conexión libre del pool
+_ACQUIRE_TIMEOUT = 30.0
+# Nombres por consulta IN (...) (SQLite antiguo admite 999 parámetros)
+_IN_CHUNK = 500
+_MMAP_SIZE = 1 << 30
+
+_SCHEMA = """
+CREATE TABLE meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+CREATE TABLE registros (
+    id INTEGER PRIMARY KEY,     -- posición en el dataset
+    nombre TEXT,                -- normalize_text(nombreDeclarante)
+    ente TEXT,                  -- nombreEntePublico en minúsculas
+    institucion TEXT,           -- contrato.institucionCompradora en minúsculas
+    toma REAL,                  -- epochs (NULL si no hay fecha válida)
+    inicio REAL,
+    fin REAL,
+    monto REAL NOT NULL,
+    doc TEXT NOT NULL           -- registro JSON original
+);
+CREATE TABLE sugerencias (
+    id INTEGER PRIMARY KEY,     -- orden global de relevancia
+    nombre TEXT NOT NULL,
+    clave TEXT NOT NULL
+);
+CREATE TABLE sugerencia_palabras (
+    palabra TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (palabra, id)
+) WITHOUT ROWID;
+CREATE TABLE padron (
+    lista TEXT NOT NULL,
+    pos INTEGER NOT NULL,
+    nombre TEXT NOT NULL,
+    PRIMARY KEY (lista, pos)
+) WITHOUT ROWID;
+CREATE TABLE vista_items (
+    vista TEXT NOT NULL,
+    pos INTEGER NOT NULL,       -- orden de primera aparición
+    item TEXT NOT NULL,
+    monto REAL NOT NULL,        -- montoTotal
+    toma REAL,                  -- epoch de la toma de referencia (NULL si no es válida)
+    PRIMARY KEY (vista, pos)
+) WITHOUT ROWID;
+CREATE TABLE vista_filtros (
+    vista TEXT NOT NULL,
+    campo TEXT NOT NULL,        -- filtros.CAMPOS
+    valor TEXT NOT NULL,        -- en minúsculas
+    pos INTEGER NOT NULL,
+    PRIMARY KEY (vista, campo, valor, pos)
+) WITHOUT ROWID;
+CREATE TABLE vista_orden (
+    vista TEXT NOT NULL,
+    orden TEXT NOT NULL,        -- sort_by:sort_dir
+    rank INTEGER NOT NULL,
+    pos INTEGER NOT NULL,
+    PRIMARY KEY (vista, orden, rank)
+) WITHOUT ROWID;
+CREATE TABLE crecimiento (
+    grupo INTEGER PRIMARY KEY,
+    clave TEXT NOT NULL,        -- normalize_text(nombreDeclarante)
+    institucion TEXT NOT NULL,  -- normalize_text(institucionDeclarante)
+    rank INTEGER,               -- posición por mayor salto (NULL si no hay)
+    resumen TEXT NOT NULL,      -- CrecimientoIngresos.summary()
+    serie TEXT NOT NULL
+);
+"""
+
+# Se crean después de la carga masiva
+_INDEXES = """
+CREATE INDEX ix_registros_nombre ON registros (nombre);
+CREATE INDEX ix_vista_items_monto ON vista_items (vista, monto);
+CREATE INDEX ix_vista_items_toma ON vista_items (vista, toma);
+CREATE INDEX ix_sugerencias_clave ON sugerencias (clave);
+CREATE INDEX ix_crecimiento_clave ON crecimiento (clave, institucion);
+CREATE INDEX ix_crecimiento_rank ON crecimiento (rank);
+"""
+
+
+def is_sqlite_dataset(path: Path) -> bool:
+    """Por encabezado si el archivo existe; si no, por extensión."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    except OSError:
+        return Path(path).suffix in (".sqlite", ".sqlite3", ".db")
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _real(v: float) -> Optional[float]:
+    return None if math.isnan(v) else v
+
+
+# ───────────────────────── Escritura ─────────────────────────
+def compile_sqlite(snap: DatasetSnapshot, out_path: Path) -> Dict[str, int]:
+    """
+    Vuelca un snapshot ya construido a `out_path` (archivo temporal +
+    rename). Devuelve el número de filas por tabla.
+
+    Los registros se escriben uno por uno desde snap.records: con un
+    snapshot abierto sobre el .bin (BinaryRecords, mmap) en memoria sólo
+    quedan las columnas y las estructuras derivadas, no los registros.
+    """
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    if tmp.exists():
+        tmp.unlink()
+
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript(_SCHEMA)
+
+        cols = snap.columnas
+        nombres = [normalize_text(n) for n in cols.decl_names]
+
+        def registros() -> Iterator[Tuple[Any, ...]]:
+            decl, ente, inst = cols.decl_id.tolist(), cols.ente_id.tolist(), cols.inst_id.tolist()
+            toma, ini, fin = cols.toma.tolist(), cols.inicio.tolist(), cols.fin.tolist()
+            monto, entidades = cols.monto.tolist(), cols.entidades
+            for i, d in enumerate(snap.records):
+                yield (
+                    i,
+                    nombres[decl[i]] if decl[i] >= 0 else None,
+                    entidades[ente[i]] if ente[i] >= 0 else None,
+                    entidades[inst[i]] if inst[i] >= 0 else None,
+                    _real(toma[i]),
+                    _real(ini[i]),
+                    _real(fin[i]),
+                    monto[i],
+                    _dumps(d),
+                )
+
+        conn.executemany("INSERT INTO registros VALUES (?,?,?,?,?,?,?,?,?)", registros())
+
+        sug = snap.suggest_index
+        conn.executemany(
+            "INSERT INTO sugerencias VALUES (?,?,?)",
+            ((i, n, k) for i, (n, k) in enumerate(zip(sug.names, sug.keys))),
+        )
+        conn.executemany(
+            "INSERT INTO sugerencia_palabras VALUES (?,?)",
+            ((tok, i) for i, k in enumerate(sug.keys) for tok in set(k.split())),
+        )
+
+        totals = {"registros": len(snap.records), "sugerencias": len(sug)}
+        for lista in (snap.vistas.padron, snap.vistas.padron_con_toma):
+            conn.executemany(
+                "INSERT INTO padron VALUES (?,?,?)",
+                ((lista.name, pos, n) for pos, n in enumerate(lista.names)),
+            )
+            totals[lista.name] = len(lista)
+
+        for vista in (snap.vistas.cruce_toma, snap.vistas.conflicto):
+            idx = vista.filtros
+            toma = np.full(len(vista), np.nan)
+            toma[idx.toma_orden] = idx.toma
+            conn.executemany(
+                "INSERT INTO vista_items VALUES (?,?,?,?,?)",
+                (
+                    (vista.name, pos, _dumps(it), it["montoTotal"], _real(t))
+                    for pos, (it, t) in enumerate(zip(vista.items, toma.tolist()))
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO vista_filtros VALUES (?,?,?,?)",
+                (
+                    (vista.name, campo, valor, pos)
+                    for campo, postings in idx.postings.items()
+                    for valor, items in postings.values()
+                    for pos in items.tolist()
+                ),
+            )
+            for (sort_by, sort_dir), perm in vista.perms.items():
+                orden = f"{sort_by}:{sort_dir}"
+                conn.executemany(
+                    "INSERT INTO vista_orden VALUES (?,?,?,?)",
+                    ((vista.name, orden, rank, pos) for rank, pos in enumerate(perm.tolist())),
+                )
+            totals[vista.name] = len(vista)
+
+        crec = snap.crecimiento
+
+        def crecimiento() -> Iterator[Tuple[Any, ...]]:
+            for (clave, institucion), g in crec.slots.items():
+                detail = crec.detail(g)
+                serie = detail.pop("serie")
+                yield g, clave, institucion, detail["rank"], _dumps(detail), _dumps(serie)
+
+        conn.executemany("INSERT INTO crecimiento VALUES (?,?,?,?,?,?)", crecimiento())
+        totals["crecimiento"] = len(crec)
+
+        meta = {
+            "schema": SCHEMA_VERSION,
+            "fingerprint": snap.fingerprint,
+            "totales": totals,
+            # El orden de sugerencias queda fijo al compilar
+            "sugerencias_por_volumen": sug.rank_by_volume,
+        }
+        conn.executemany(
+            "INSERT INTO meta VALUES (?,?)", ((k, _dumps(v)) for k, v in meta.items())
+        )
+        conn.executescript(_INDEXES)
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp, out_path)
+    return totals
+
+
+# ───────────────────────── Lectura ─────────────────────────
+class ConnectionPool:
+    """
+    Conexiones de sólo lectura abiertas al crear el pool, de modo que
+    todas apuntan al mismo archivo aunque después se reemplace. El pool
+    (y sus conexiones) se libera cuando ningún snapshot lo referencia.
+    """
+
+    def __init__(self, path: Path, size: int):
+        uri = f"{Path(path).resolve().as_uri()}?mode=ro"
+        self.size = size
+        self._free: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        try:
+            for _ in range(size):
+                conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+                self._free.put(conn)
+                conn.execute(f"PRAGMA mmap_size={_MMAP_SIZE}")
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        """Cierra las conexiones libres (para pools que no llegan a usarse)."""
+        while True:
+            try:
+                conn = self._free.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._free.get(timeout=_ACQUIRE_TIMEOUT)
+        except queue.Empty:
+            raise RuntimeError("pool de SQLite agotado") from None
+        try:
+            yield conn
+        finally:
+            self._free.put(conn)
+
+    def query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Tuple[Any, ...]]:
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+
+class SqliteAggregateView:
+    """Equivalente de agregados.AggregateView leyendo rebanadas de vista_orden."""
+
+    _SQL = (
+        "SELECT i.item FROM vista_orden o "
+        "JOIN vista_items i ON i.vista = o.vista AND i.pos = o.pos "
+        "WHERE o.vista = ? AND o.orden = ? AND o.rank >= ? AND o.rank < ? "
+        "ORDER BY o.rank"
+    )
+
+    def __init__(self, pool: ConnectionPool, name: str, total: int):
+        self._pool = pool
+        self.name = name
+        self._total = total
+
+    def __len__(self) -> int:
+        return self._total
+
+    def _bounds(self, start: int, stop: Optional[int]) -> Tuple[int, int]:
+        return start, self._total if stop is None else min(stop, self._total)
+
+    def ordered(
+        self, sort_by: str, sort_dir: str, start: int = 0, stop: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        if sort_by not in SORT_FIELDS or sort_dir not in SORT_DIRS:
+            raise KeyError((sort_by, sort_dir))
+        start, stop = self._bounds(start, stop)
+        rows = self._pool.query(self._SQL, (self.name, f"{sort_by}:{sort_dir}", start, stop))
+        return [json.loads(r[0]) for r in rows]
+
+    def iter_ordered(
+        self, sort_by: str, sort_dir: str, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        # Por bloques: la conexión se devuelve al pool entre bloques
+        start, stop = self._bounds(start, stop)
+        for pos in range(start, stop, _ITER_BLOCK):
+            yield from self.ordered(sort_by, sort_dir, pos, min(pos + _ITER_BLOCK, stop))
+
+    def filtrar(self, filtro: Filtro) -> "SqliteFilteredView":
+        return SqliteFilteredView(self._pool, self.name, filtro)
+
+
+def _filter_sql(vista: str, filtro: Filtro) -> Tuple[str, List[Any]]:
+    """Posiciones que cumplen el filtro: INTERSECT de una subconsulta por condición."""
+    parts: List[str] = []
+    params: List[Any] = []
+    for campo in CAMPOS:
+        valores = getattr(filtro, campo)
+        if valores:
+            parts.append(
+                "SELECT DISTINCT pos FROM vista_filtros WHERE vista = ? AND campo = ? "
+                f"AND valor IN ({','.join('?' * len(valores))})"
+            )
+            params += [vista, campo, *valores]
+    for col, lo, hi, hi_op in (
+        ("monto", filtro.monto_min, filtro.monto_max, "<="),
+        ("toma", filtro.toma_desde, filtro.toma_hasta, "<"),
+    ):
+        if lo is None and hi is None:
+            continue
+        conds = ["vista = ?"]
+        params.append(vista)
+        if lo is not None:
+            conds.append(f"{col} >= ?")
+            params.append(lo)
+        if hi is not None:
+            conds.append(f"{col} {hi_op} ?")
+            params.append(hi)
+        if col == "toma":
+            conds.append("toma IS NOT NULL")
+        parts.append(f"SELECT pos FROM vista_items WHERE {' AND '.join(conds)}")
+    if not parts:
+        return "SELECT pos FROM vista_items WHERE vista = ?", [vista]
+    return " INTERSECT ".join(parts), params
+
+
+class SqliteFilteredView:
+    """Equivalente de agregados.FilteredView: vista_orden restringida a las posiciones filtradas."""
+
+    _SQL = (
+        "SELECT i.item FROM vista_orden o "
+        "JOIN vista_items i ON i.vista = o.vista AND i.pos = o.pos "
+        "WHERE o.vista = ? AND o.orden = ? AND o.pos IN ({sel}) "
+        "ORDER BY o.rank LIMIT ? OFFSET ?"
+    )
+
+    def __init__(self, pool: ConnectionPool, name: str, filtro: Filtro):
+        self._pool = pool
+        self.name = name
+        self._sel, self._params = _filter_sql(name, filtro)
+        self._total = pool.query(f"SELECT COUNT(*) FROM ({self._sel})", tuple(self._params))[0][0]
+
+    def __len__(self) -> int:
+        return self._total
+
+    def _bounds(self, start: int, stop: Optional[int]) -> Tuple[int, int]:
+        return start, self._total if stop is None else min(stop, self._total)
+
+    def ordered(
+        self, sort_by: str, sort_dir: str, start: int = 0, stop: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        if sort_by not in SORT_FIELDS or sort_dir not in SORT_DIRS:
+            raise KeyError((sort_by, sort_dir))
+        start, stop = self._bounds(start, stop)
+        if stop <= start:
+            return []
+        rows = self._pool.query(
+            self._SQL.format(sel=self._sel),
+            (self.name, f"{sort_by}:{sort_dir}", *self._params, stop - start, start),
+        )
+        return [json.loads(r[0]) for r in rows]
+
+    def iter_ordered(
+        self, sort_by: str, sort_dir: str, start: int = 0, stop: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        start, stop = self._bounds(start, stop)
+        for pos in range(start, stop, _ITER_BLOCK):
+            yield from self.ordered(sort_by, sort_dir, pos, min(pos + _ITER_BLOCK, stop))
+
+
+class SqliteNameList:
+    """Equivalente de agregados.NameList sobre la tabla padron."""
+
+    _SQL = "SELECT nombre FROM padron WHERE lista = ? AND pos >= ? AND pos < ? ORDER BY pos"
+
+    def __init__(self, pool: ConnectionPool, name: str, total: int):
+        self._pool = pool
+        self.name = name
+        self._total = total
+
+    def __len__(self) -> int:
+        return self._total
+
+    def ordered(self, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        stop = self._total if stop is None else min(stop, self._total)
+        return [r[0] for r in self._pool.query(self._SQL, (self.name, start, stop))]
+
+    def iter_ordered(self, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        stop = self._total if stop is None else min(stop, self._total)
+        for pos in range(start, stop, _ITER_BLOCK):
+            yield from self.ordered(pos, min(pos + _ITER_BLOCK, stop))
+
+
+@dataclass(frozen=True)
+class SqliteSnapshot:
+    """Versión del archivo SQLite con la misma interfaz de lectura que DatasetSnapshot."""
+
+    version: int
+    fingerprint: str
+    path: Path
+    mtime_ns: int
+    size: int
+    loaded_at: float
+    load_ms: float
+    totals: Dict[str, int]
+    pool: ConnectionPool
+
+    def records_by_name(self, nombre: str) -> List[Dict[str, Any]]:
+        key = normalize_text(nombre)
+        if not key:
+            return []
+        rows = self.pool.query("SELECT doc FROM registros WHERE nombre = ? ORDER BY id", (key,))
+        return [json.loads(r[0]) for r in rows]
+
+    def records_by_names(self, nombres: Sequence[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """Una consulta IN (...) por bloque de nombres en lugar de una por nombre."""
+        out: Dict[str, List[Dict[str, Any]]] = {normalize_text(n): [] for n in nombres}
+        keys = [k for k in out if k]
+        with self.pool.connection() as conn:
+            for k in range(0, len(keys), _IN_CHUNK):
+                chunk = keys[k:k + _IN_CHUNK]
+                sql = (
+                    "SELECT nombre, doc FROM registros "
+                    f"WHERE nombre IN ({','.join('?' * len(chunk))}) ORDER BY id"
+                )
+                for nombre, doc in conn.execute(sql, chunk):
+                    out[nombre].append(json.loads(doc))
+        return out
+
+    def suggest(self, query: str, limit: int) -> List[str]:
+        """Mismos niveles y desempates que SuggestIndex.search."""
+        q = suggest_key(query)
+        limit = max(1, min(limit, SuggestIndex.MAX_LIMIT))
+        if not q:
+            return []
+
+        out: List[int] = []
+        seen: Set[int] = set()
+
+        with self.pool.connection() as conn:
+
+            def take(sql: str, params: Tuple[Any, ...]) -> bool:
+                # Se piden de más para compensar los ya tomados en niveles previos
+                for (i,) in conn.execute(sql, params + (limit + len(seen),)):
+                    if i in seen:
+                        continue
+                    seen.add(i)
+                    out.append(i)
+                    if len(out) >= limit:
+                        return True
+                return False
+
+            done = take(
+                "SELECT id FROM sugerencias WHERE clave >= ? AND clave < ? ORDER BY id LIMIT ?",
+                (q, q + "\uffff"),
+            )
+            if not done and " " in q:
+                done = take(
+                    "SELECT id FROM sugerencias WHERE instr(' ' || clave, ?) > 0 "
+                    "ORDER BY id LIMIT ?",
+                    (" " + q,),
+                )
+            elif not done:
+                done = take(
+                    "SELECT DISTINCT id FROM sugerencia_palabras "
+                    "WHERE palabra >= ? AND palabra < ? ORDER BY id LIMIT ?",
+                    (q, q + "\uffff"),
+                )
+            if not done:
+                take(
+                    "SELECT id FROM sugerencias WHERE instr(clave, ?) > 0 ORDER BY id LIMIT ?",
+                    (q,),
+                )
+            if not out:
+                return []
+            marks = ",".join("?" * len(out))
+            names = dict(
+                conn.execute(f"SELECT id, nombre FROM sugerencias WHERE id IN ({marks})", out)
+            )
+        return [names[i] for i in out]
+
+    def padron(self, with_toma: bool) -> SqliteNameList:
+        name = "padron:toma" if with_toma else "padron"
+        return SqliteNameList(self.pool, name, self.totals[name])
+
+    def vista(self, name: str) -> SqliteAggregateView:
+        if name not in ("cruce-toma", "conflicto"):
+            raise KeyError(name)
+        return SqliteAggregateView(self.pool, name, self.totals[name])
+
+    def ingresos_historial(
+        self, nombre: str, institucion: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        # Mismo criterio que CrecimientoIngresos.by_name entre homónimos
+        if institucion is not None:
+            rows = self.pool.query(
+                "SELECT resumen, serie FROM crecimiento WHERE clave = ? AND institucion = ?",
+                (normalize_text(nombre), normalize_text(institucion)),
+            )
+        else:
+            rows = self.pool.query(
+                "SELECT resumen, serie FROM crecimiento WHERE clave = ? "
+                "ORDER BY rank IS NULL, rank, grupo LIMIT 1",
+                (normalize_text(nombre),),
+            )
+        if not rows:
+            return None
+        return {**json.loads(rows[0][0]), "serie": json.loads(rows[0][1])}
+
+    def ingresos_atipicos(self, top_k: int) -> List[Dict[str, Any]]:
+        rows = self.pool.query(
+            "SELECT resumen FROM crecimiento WHERE rank <= ? ORDER BY rank", (top_k,)
+        )
+        return [json.loads(r[0]) for r in rows]
+
+
+class SqliteStore(DatasetStore):
+    """
+    Misma interfaz que DatasetStore (get/reload/start/stop y recarga en
+    caliente), pero el snapshot sólo guarda el pool de conexiones y los
+    totales; los datos se quedan en disco.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        poll_interval: float = 2.0,
+        pool_size: int = 4,
+        suggest_by_volume: bool = True,
+    ):
+        super().__init__(path, poll_interval=poll_interval)
+        self.pool_size = max(1, pool_size)
+        self.suggest_by_volume = suggest_by_volume
+
+    def _check_and_reload(self, force: bool) -> bool:
+        try:
+            st = self.path.stat()
+        except OSError as e:
+            logger.warning(f"{BANNER} no se puede leer {self.path}: {e}")
+            return False
+
+        # El inodo cambia cuando el archivo se reemplaza con rename
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if not force and signature == self._signature:
+            return False
+
+        start = time.perf_counter()
+        pool: Optional[ConnectionPool] = None
+        try:
+            pool = ConnectionPool(self.path, self.pool_size)
+            meta = {k: json.loads(v) for k, v in pool.query("SELECT clave, valor FROM meta")}
+            if meta.get("schema") != SCHEMA_VERSION:
+                raise ValueError(f"versión de esquema no soportada: {meta.get('schema')}")
+        except Exception as e:
+            logger.warning(f"{BANNER} error al abrir {self.path}: {e}")
+            if pool is not None:
+                pool.close()
+            metricas.dataset_unchanged("sqlite", error=True)
+            return False
+
+        current = self._snapshot
+        fingerprint = str(meta["fingerprint"])
+        if current is not None and fingerprint == current.fingerprint:
+            # Mismo contenido (sólo cambió mtime): se sigue usando el pool vigente
+            pool.close()
+            self._signature = signature
+            metricas.dataset_unchanged("sqlite")
+            return False
+
+        por_volumen = meta.get("sugerencias_por_volumen")
+        if por_volumen is not None and por_volumen != self.suggest_by_volume:
+            # A diferencia del segmento, las sugerencias no se reconstruyen al abrir
+            logger.warning(
+                f"{BANNER} {self.path.name} se compiló con "
+                f"TIMELINE_SUGGEST_BY_VOLUME={int(por_volumen)}; se usa ese orden "
+                f"(recompilar para cambiarlo)"
+            )
+
+        self._version += 1
+        load_ms = (time.perf_counter() - start) * 1000
+        snap = SqliteSnapshot(
+            version=self._version,
+            fingerprint=fingerprint,
+            path=self.path,
+            mtime_ns=st.st_mtime_ns,
+            size=st.st_size,
+            loaded_at=time.time(),
+            load_ms=load_ms,
+            totals=meta["totales"],
+            pool=pool,
+        )
+        self._snapshot = snap
+        self._signature = signature
+        logger.info(
+            f"{BANNER} v{snap.version} abierto: {snap.totals['registros']} registros "
+            f"sha1={fingerprint[:12]} pool={self.pool_size} t={load_ms:.1f}ms"
+        )
+        # Las estructuras derivadas se construyen al compilar, no al abrir
+        metricas.dataset_loaded("sqlite", load_ms / 1000, snap.totals["registros"], snap.version, {})
+        return True
@@ -0,0 +1,407 @@
+# app/services/columnar.py
+"""
+Almacén columnar del dataset y agregaciones vectorizadas.
+
+Cada versión del dataset se proyecta a arreglos NumPy (un elemento por
+registro, mismo orden que snapshot.records). Las agregaciones por
+declarante de los paneles de riesgo se resuelven como group-by sobre
+esos arreglos (np.bincount / lexsort) en lugar de recorrer dicts.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.fechas import DateColumns
+from app.services.ingresos import INGRESOS_KEYS, normalize_historial, safe_number
+from app.services.texto import normalize_text
+
+logger = logging.getLogger("uvicorn.error")
+
+BANNER = "🟣[COLUMNAS]"
+
+
+def parse_monto(raw: Any) -> float:
+    try:
+        return float(raw) if raw not in (None, "", " ", "null") else 0.0
+    except Exception:
+        return 0.0
+
+
+def _lower(v: Any) -> str:
+    """Texto categórico para comparar sin distinguir mayúsculas ("" si no es texto)."""
+    return v.strip().lower() if isinstance(v, str) else ""
+
+
+def _encode(values: Sequence[str], codes: Dict[str, int]) -> np.ndarray:
+    """Codifica strings a enteros (-1 = vacío), extendiendo `codes`."""
+
+    def code(v: str) -> int:
+        if not v:
+            return -1
+        c = codes.get(v)
+        if c is None:
+            c = codes[v] = len(codes)
+        return c
+
+    return np.fromiter((code(v) for v in values), dtype=np.int32, count=len(values))
+
+
+def hist_code(raw: Any, codes: Dict[Tuple[Tuple[int, float], ...], int]) -> int:
+    """Id de la serie normalizada de historialIngresos (-1 si no hay puntos)."""
+    if not raw:
+        return -1
+    serie = normalize_historial(raw)
+    return codes.setdefault(serie, len(codes)) if serie else -1
+
+
+def _encode_historial(
+    raws: Iterable[Any], codes: Dict[Tuple[Tuple[int, float], ...], int], n: int
+) -> np.ndarray:
+    """
+    hist_code por registro. Los registros de un declarante repiten la
+    misma serie: se normaliza una vez por serie cruda distinta.
+    """
+    seen: Dict[Any, int] = {}
+
+    def code(raw: Any) -> int:
+        if not raw:
+            return -1
+        try:
+            key = tuple(tuple(p) for p in raw)
+            c = seen.get(key)
+        except TypeError:
+            return hist_code(raw, codes)
+        if c is None:
+            c = seen[key] = hist_code(raw, codes)
+        return c
+
+    return np.fromiter((code(r) for r in raws), dtype=np.int32, count=n)
+
+
+@dataclass(frozen=True)
+class ColumnStore:
+    """
+    Columnas por registro:
+      - decl_id:   id del declarante (nombreDeclarante sin espacios extremos), -1 si vacío
+      - decl_inst_id: institucionDeclarante con normalize_text (la clave del
+        enriquecimiento junto con el nombre), codificada en `decl_insts`
+      - has_toma:  fechaTomaPosesion no vacía (aunque no sea una fecha válida)
+      - monto:     montoContrato como float (0.0 si no es numérico)
+      - toma/inicio/fin: epoch (NaN si no hay fecha válida)
+      - ente_id / inst_id: nombreEntePublico / institucionCompradora
+        en minúsculas, codificados con el mismo diccionario (-1 si vacío)
+      - nivel_id / sector_id: nivelOrdenGobierno / sectorS1.valor en
+        minúsculas, codificados en `niveles` / `sectores` (-1 si vacío)
+      - ing_vals:  matriz registros x INGRESOS_KEYS (NaN = sin valor)
+      - ing_rank_*: clave con la que best_ingresos_row elige ingresos:
+        (tiene ingresoAnualNetoDeclarante, valor anual o campos no nulos)
+      - hist_id:   id de historialIngresos en `historiales` (-1 si no trae);
+        registros con la misma serie comparten id
+    """
+
+    decl_id: np.ndarray
+    decl_names: List[str]
+    decl_inst_id: np.ndarray
+    decl_insts: List[str]
+    has_toma: np.ndarray
+    monto: np.ndarray
+    toma: np.ndarray
+    inicio: np.ndarray
+    fin: np.ndarray
+    ente_id: np.ndarray
+    inst_id: np.ndarray
+    entidades: List[str]
+    nivel_id: np.ndarray
+    niveles: List[str]
+    sector_id: np.ndarray
+    sectores: List[str]
+    ing_vals: np.ndarray
+    ing_has: np.ndarray
+    ing_rank_has: np.ndarray
+    ing_rank_val: np.ndarray
+    hist_id: np.ndarray
+    historiales: List[Tuple[Tuple[int, float], ...]]
+    build_ms: float
+
+    def __len__(self) -> int:
+        return len(self.decl_id)
+
+    @property
+    def conflicto(self) -> np.ndarray:
+        """Registros donde el ente del declarante es la institución compradora."""
+        return (self.ente_id >= 0) & (self.ente_id == self.inst_id)
+
+    def ingresos_of(self, row: int) -> Dict[str, Optional[float]]:
+        """Ingresos normalizados del registro ({} si no trae ninguno)."""
+        if row < 0 or not self.ing_has[row]:
+            return {}
+        return {
+            k: (None if v != v else v)
+            for k, v in zip(INGRESOS_KEYS, self.ing_vals[row].tolist())
+        }
+
+    @classmethod
+    def assemble(
+        cls,
+        start: float,
+        decl_id: np.ndarray,
+        decl_names: List[str],
+        decl_inst_id: np.ndarray,
+        decl_insts: List[str],
+        has_toma: np.ndarray,
+        monto: np.ndarray,
+        fechas: DateColumns,
+        ente_id: np.ndarray,
+        inst_id: np.ndarray,
+        entidades: List[str],
+        nivel_id: np.ndarray,
+        niveles: List[str],
+        sector_id: np.ndarray,
+        sectores: List[str],
+        ing_vals: np.ndarray,
+        hist_id: np.ndarray,
+        historiales: List[Tuple[Tuple[int, float], ...]],
+    ) -> "ColumnStore":
+        valid = ~np.isnan(ing_vals)
+        anual = ing_vals[:, INGRESOS_KEYS.index("ingresoAnualNetoDeclarante")]
+        ing_rank_has = ~np.isnan(anual)
+        ing_rank_val = np.where(ing_rank_has, anual, valid.sum(axis=1).astype(np.float64))
+
+        build_ms = (time.perf_counter() - start) * 1000
+        store = cls(
+            decl_id=decl_id,
+            decl_names=decl_names,
+            decl_inst_id=decl_inst_id,
+            decl_insts=decl_insts,
+            has_toma=has_toma,
+            monto=monto,
+            toma=np.frombuffer(fechas.toma, dtype=np.float64),
+            inicio=np.frombuffer(fechas.inicio, dtype=np.float64),
+            fin=np.frombuffer(fechas.fin, dtype=np.float64),
+            ente_id=ente_id,
+            inst_id=inst_id,
+            entidades=entidades,
+            nivel_id=nivel_id,
+            niveles=niveles,
+            sector_id=sector_id,
+            sectores=sectores,
+            ing_vals=ing_vals,
+            ing_has=valid.any(axis=1),
+            ing_rank_has=ing_rank_has,
+            ing_rank_val=ing_rank_val,
+            hist_id=hist_id,
+            historiales=historiales,
+            build_ms=build_ms,
+        )
+        logger.info(
+            f"{BANNER} columnas: {len(decl_id)} registros, {len(decl_names)} declarantes, "
+            f"{len(entidades)} entes/instituciones, t={build_ms:.1f}ms"
+        )
+        return store
+
+    @classmethod
+    def build(cls, records: Sequence[Dict[str, Any]], fechas: DateColumns) -> "ColumnStore":
+        """Construye las columnas recorriendo registros (dataset JSON)."""
+        start = time.perf_counter()
+        n = len(records)
+        contratos = [d.get("contrato") or {} for d in records]
+
+        decl_codes: Dict[str, int] = {}
+        decl_id = _encode([(d.get("nombreDeclarante") or "").strip() for d in records], decl_codes)
+        decl_inst_codes: Dict[str, int] = {}
+        decl_inst_id = _encode(
+            [normalize_text(d.get("institucionDeclarante")) for d in records], decl_inst_codes
+        )
+        has_toma = np.fromiter(
+            (bool(d.get("fechaTomaPosesion")) for d in records), dtype=bool, count=n
+        )
+
+        ent_codes: Dict[str, int] = {}
+        ente_id = _encode(
+            [(d.get("nombreEntePublico") or "").strip().lower() for d in records], ent_codes
+        )
+        inst_id = _encode(
+            [(c.get("institucionCompradora") or "").strip().lower() for c in contratos], ent_codes
+        )
+
+        nivel_codes: Dict[str, int] = {}
+        nivel_id = _encode(
+            [_lower(d.get("nivelOrdenGobierno")) for d in records], nivel_codes
+        )
+        sector_codes: Dict[str, int] = {}
+        sector_id = _encode(
+            [_lower((d.get("sectorS1") or {}).get("valor")) for d in records], sector_codes
+        )
+
+        monto = np.fromiter(
+            (parse_monto(c.get("montoContrato")) for c in contratos), dtype=np.float64, count=n
+        )
+
+        ing_raw = [d.get("ingresos", {}) for d in records]
+        ing_vals = np.empty((n, len(INGRESOS_KEYS)), dtype=np.float64)
+        for j, key in enumerate(INGRESOS_KEYS):
+            # None -> NaN al convertir a float64
+            ing_vals[:, j] = np.array(
+                [safe_number(r.get(key)) if isinstance(r, dict) else None for r in ing_raw],
+                dtype=np.float64,
+            )
+
+        hist_codes: Dict[Tuple[Tuple[int, float], ...], int] = {}
+        hist_id = _encode_historial((d.get("historialIngresos") for d in records), hist_codes, n)
+
+        return cls.assemble(
+            start, decl_id, list(decl_codes), decl_inst_id, list(decl_inst_codes),
+            has_toma, monto, fechas,
+            ente_id, inst_id, list(ent_codes), nivel_id, list(nivel_codes),
+            sector_id, list(sector_codes), ing_vals, hist_id, list(hist_codes),
+        )
+
+
+# ───────────────────────── Group-by ─────────────────────────
+@dataclass(frozen=True)
+class Groups:
+    """
+    Registros seleccionados agrupados por declarante.
+
+    Los grupos están en orden de primera aparición (el mismo orden en que
+    el recorrido por registros original insertaba en su dict).
+    """
+
+    rows: np.ndarray        # índices de registro seleccionados
+    g: np.ndarray           # grupo de cada fila de `rows`
+    decl: np.ndarray        # decl_id de cada grupo
+    first_row: np.ndarray   # primer registro de cada grupo
+
+    def __len__(self) -> int:
+        return len(self.decl)
+
+    def count(self, weights: Optional[np.ndarray] = None) -> np.ndarray:
+        return np.bincount(self.g, weights=weights, minlength=len(self))
+
+
+def group_by_declarante(cols: ColumnStore, mask: np.ndarray) -> Groups:
+    rows = np.flatnonzero(mask & (cols.decl_id >= 0))
+    raw = cols.decl_id[rows]
+    uniq, first_pos = np.unique(raw, return_index=True)
+    order = np.argsort(first_pos, kind="stable")
+    decl = uniq[order]
+
+    remap = np.full(len(cols.decl_names), -1, dtype=np.int64)
+    remap[decl] = np.arange(len(decl))
+    return Groups(rows=rows, g=remap[raw], decl=decl, first_row=rows[first_pos[order]])
+
+
+def best_ingresos_row(cols: ColumnStore, groups: Groups) -> np.ndarray:
+    """
+    Por grupo, el registro con mayor ingresoAnualNetoDeclarante o, si
+    ninguno lo trae, con más campos de ingresos no nulos; en empate, el
+    primero (-1 si ningún registro del grupo trae ingresos). Un valor NaN
+    en los datos crudos cuenta como ausente.
+    """
+    out = np.full(len(groups), -1, dtype=np.int64)
+    m = cols.ing_has[groups.rows]
+    r = groups.rows[m]
+    if r.size == 0:
+        return out
+    gg = groups.g[m]
+    # Orden: grupo asc, tiene anual desc, valor desc, registro asc
+    o = np.lexsort((r, -cols.ing_rank_val[r], ~cols.ing_rank_has[r], gg))
+    gs = gg[o]
+    first = np.flatnonzero(np.r_[True, gs[1:] != gs[:-1]])
+    out[gs[first]] = r[o][first]
+    return out
+
+
+# ───────────────────────── Agregaciones ─────────────────────────
+def cruce_toma(records: Sequence[Dict[str, Any]], cols: ColumnStore) -> List[Dict[str, Any]]:
+    """
+    Declarantes con al menos un contrato antes y uno después de su toma de
+    posesión (la toma de referencia es la del primer registro del declarante).
+    Devuelve los items en orden de primera aparición, sin ordenar.
+    """
+    groups = group_by_declarante(cols, ~np.isnan(cols.toma))
+    k = len(groups)
+    if k == 0:
+        return []
+
+    rows, g = groups.rows, groups.g
+    toma = cols.toma[groups.first_row][g]
+    ini = cols.inicio[rows]
+    fin = cols.fin[rows]
+    both = ~np.isnan(ini) & ~np.isnan(fin)
+
+    # Con ambas fechas: antes si fin < toma, después si inicio > toma.
+    # Con una sola: cada fecha cuenta por su lado (NaN nunca compara).
+    ini_lt, ini_gt = (ini < toma).astype(np.int64), (ini > toma).astype(np.int64)
+    fin_lt, fin_gt = (fin < toma).astype(np.int64), (fin > toma).astype(np.int64)
+    antes = np.where(both, fin_lt, ini_lt + fin_lt)
+    despues = np.where(both, ini_gt, ini_gt + fin_gt)
+
+    total = groups.count()
+    monto = groups.count(cols.monto[rows])
+    c_antes = groups.count(antes).astype(np.int64)
+    c_despues = groups.count(despues).astype(np.int64)
+    ing_row = best_ingresos_row(cols, groups)
+
+    sel = np.flatnonzero((c_antes > 0) & (c_despues > 0))
+    names = cols.decl_names
+    return [
+        {
+            "nombreDeclarante": names[decl],
+            "fechaTomaPosesion": records[first].get("fechaTomaPosesion"),
+            "totalContratos": tot,
+            "contratosAntes": a,
+            "contratosDespues": dsp,
+            "montoTotal": m,
+            "ingresos": cols.ingresos_of(ir),
+        }
+        for decl, first, tot, a, dsp, m, ir in zip(
+            groups.decl[sel].tolist(),
+            groups.first_row[sel].tolist(),
+            total[sel].tolist(),
+            c_antes[sel].tolist(),
+            c_despues[sel].tolist(),
+            monto[sel].tolist(),
+            ing_row[sel].tolist(),
+        )
+    ]
+
+
+def conflicto(records: Sequence[Dict[str, Any]], cols: ColumnStore) -> List[Dict[str, Any]]:
+    """
+    Declarantes con contratos cuyo comprador es su propio ente público.
+    totalContratos/montoTotal cuentan sólo esos contratos. Orden de primera
+    aparición, sin ordenar.
+    """
+    groups = group_by_declarante(cols, cols.conflicto)
+    if len(groups) == 0:
+        return []
+
+    total = groups.count()
+    monto = groups.count(cols.monto[groups.rows])
+    ing_row = best_ingresos_row(cols, groups)
+
+    names = cols.decl_names
+    items: List[Dict[str, Any]] = []
+    for decl, first, tot, m, ir in zip(
+        groups.decl.tolist(),
+        groups.first_row.tolist(),
+        total.tolist(),
+        monto.tolist(),
+        ing_row.tolist(),
+    ):
+        d = records[first]
+        ente = (d.get("nombreEntePublico") or "").strip()
+        inst = ((d.get("contrato") or {}).get("institucionCompradora") or "").strip()
+        items.append({
+            "nombreDeclarante": names[decl],
+            "fechaTomaPosesion": d.get("fechaTomaPosesion"),
+            "totalContratos": tot,
+            "montoTotal": m,
+            "enteCoincidente": ente or inst,
+            "ingresos": cols.ingresos_of(ir),
+        })
+    return items
@@ -0,0 +1,79 @@
+# app/services/concurrencia.py
+"""
+Ejecución de los endpoints del timeline sin bloquear el event loop.
+
+  - Trabajo ligero (autocompletado, by-nombre, historial): en el pool de
+    hilos de Starlette, como cuando los handlers eran síncronos.
+  - Trabajo pesado (armar y serializar listas completas, comprimirlas):
+    en un pool propio de pocos hilos, para que una ráfaga de paneles de
+    riesgo no ocupe los hilos que atienden las teclas del autocompletado.
+  - SingleFlight: peticiones idénticas en curso comparten un solo
+    cálculo (p. ej. muchos clientes pidiendo la misma lista justo después
+    de una recarga, antes de que quede en caché).
+
+La recarga del dataset ya corre fuera de las peticiones, en el hilo
+vigilante del almacén.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from app.services import metricas
+
+T = TypeVar("T")
+
+
+class HeavyExecutor:
+    """Pool de hilos dedicado al trabajo pesado (se crea en el primer uso)."""
+
+    def __init__(self, threads: int):
+        self.threads = max(1, threads)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.threads, thread_name_prefix="timeline-heavy"
+                    )
+        return self._pool
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), fn, *args)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+class SingleFlight:
+    """
+    Coalescencia por clave dentro de un event loop: mientras un cálculo
+    está en curso, las peticiones con la misma clave esperan su resultado
+    en lugar de repetirlo. El cálculo corre en su propia tarea, así que
+    si el cliente que lo inició se desconecta, los demás no lo pierden.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+    def _done(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            metricas.SINGLE_FLIGHT.inc(self.name, "ejecutada")
+        else:
+            metricas.SINGLE_FLIGHT.inc(self.name, "compartida")
+        return await asyncio.shield(task)
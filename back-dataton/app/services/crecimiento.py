@@ -0,0 +1,262 @@
+# app/services/crecimiento.py
+"""
+Crecimiento anual de ingresos por declarante y saltos atípicos.
+
+El enriquecimiento guarda en cada registro la serie historialIngresos
+del declarante ([fecha, ingreso anual] por declaración S1). Por versión
+del dataset se juntan las series por (nombre, institucionDeclarante)
+normalizados, la misma clave con la que el enriquecimiento las armó (dos
+homónimos en instituciones distintas no se mezclan), se reducen a un
+punto por año (la declaración más reciente de ese año) y se calculan,
+sobre todos los declarantes a la vez:
+
+  - crecimiento interanual: ingreso / ingreso del año anterior con dato
+    - 1, anualizado si entre ambos hay años sin declaración;
+  - el mayor salto de cada declarante (sólo con base >= MIN_BASE, para
+    que ingresos casi nulos no dominen el ranking, y con ingreso final
+    positivo: una caída a 0 no es un salto y su log1p sería -inf);
+  - un z-score robusto (mediana/MAD de log(1 + crecimiento)) del salto;
+  - el ranking de declarantes por mayor salto (los top-K son atípicos).
+"""
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import date
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.texto import normalize_text
+from app.services.agregados import stable_argsort
+from app.services.columnar import ColumnStore
+
+logger = logging.getLogger("uvicorn.error")
+
+BANNER = "🟣[CRECIMIENTO]"
+
+# Ingreso anual mínimo del año base para que un salto entre al ranking
+MIN_BASE = 10_000.0
+
+# Constante que hace a la MAD comparable con la desviación estándar
+_MAD_SCALE = 1.4826
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def _opt(v: float) -> Optional[float]:
+    return None if math.isnan(v) else v
+
+
+def sin_historial(nombre: str, institucion: Optional[str] = None) -> Dict[str, Any]:
+    """Respuesta de un declarante sin historial (mismas claves que detail())."""
+    return {
+        "rank": None,
+        "nombreDeclarante": nombre,
+        "institucionDeclarante": institucion,
+        "maxCrecimiento": None,
+        "zScore": None,
+        "anioBase": None,
+        "ingresoBase": None,
+        "anio": None,
+        "ingreso": None,
+        "serie": [],
+    }
+
+
+@dataclass(frozen=True)
+class CrecimientoIngresos:
+    """
+    Series anuales agrupadas por declarante: (nombre, institución) con
+    normalize_text.
+
+    Los puntos anuales de todos los declarantes viven en arreglos
+    paralelos agrupados por declarante; `starts[g]:starts[g + 1]` son los
+    del declarante g, en orden cronológico.
+    """
+
+    names: List[str]
+    instituciones: List[str]
+    slots: Dict[Tuple[str, str], int]
+    por_nombre: Dict[str, List[int]]  # nombre normalizado -> declarantes
+    starts: np.ndarray
+    anio: np.ndarray
+    fecha: np.ndarray        # ordinal de la declaración elegida en el año
+    ingreso: np.ndarray
+    crecimiento: np.ndarray  # NaN en el primer año o sin base positiva
+    gap: np.ndarray          # años desde el punto anterior (0 en el primero)
+    best: np.ndarray         # por declarante: punto con el mayor salto (-1 si no hay)
+    score: np.ndarray        # por declarante: mayor crecimiento (NaN si no hay)
+    z: np.ndarray            # por declarante: z-score robusto del mayor salto
+    ranking: np.ndarray      # declarantes con salto, de mayor a menor
+    rank: np.ndarray         # por declarante: posición 1..N en ranking (0 = sin salto)
+    build_ms: float
+
+    def __len__(self) -> int:
+        return len(self.ranking)
+
+    @classmethod
+    def build(cls, cols: ColumnStore) -> "CrecimientoIngresos":
+        start = time.perf_counter()
+
+        # Declarante = (nombre, institución); ids de institución +1 para
+        # que "sin institución" (-1) también sea una clave
+        rows = np.flatnonzero((cols.hist_id >= 0) & (cols.decl_id >= 0))
+        n_inst = len(cols.decl_insts) + 1
+        claves, row_clave = np.unique(
+            cols.decl_id[rows].astype(np.int64) * n_inst + cols.decl_inst_id[rows] + 1,
+            return_inverse=True,
+        )
+        slots: Dict[Tuple[str, str], int] = {}
+        names: List[str] = []
+        instituciones: List[str] = []
+        clave_to_slot = np.empty(len(claves), dtype=np.int64)
+        for k, (d, i) in enumerate(zip(*(a.tolist() for a in np.divmod(claves, n_inst)))):
+            name = cols.decl_names[d]
+            inst = cols.decl_insts[i - 1] if i else ""
+            slot = slots.setdefault((normalize_text(name), inst), len(slots))
+            if slot == len(names):
+                names.append(name)
+                instituciones.append(inst)
+            clave_to_slot[k] = slot
+        por_nombre: Dict[str, List[int]] = {}
+        for (nombre, _), slot in slots.items():
+            por_nombre.setdefault(nombre, []).append(slot)
+
+        # Pares (declarante, serie) distintos: los registros de un mismo
+        # declarante suelen compartir serie
+        n_hist = max(len(cols.historiales), 1)
+        pairs = np.unique(clave_to_slot[row_clave] * n_hist + cols.hist_id[rows])
+        pair_slot, pair_hist = np.divmod(pairs, n_hist)
+
+        # Todos los puntos, con su declarante
+        series = [cols.historiales[h] for h in pair_hist.tolist()]
+        lengths = np.fromiter((len(s) for s in series), dtype=np.int64, count=len(series))
+        pts = np.array(list(chain.from_iterable(series)), dtype=np.float64).reshape(-1, 2)
+        g = np.repeat(pair_slot, lengths)
+        ordinal = pts[:, 0].astype(np.int64)
+        valor = pts[:, 1]
+        dias = (ordinal - _EPOCH_ORDINAL).astype("datetime64[D]")
+        anio = dias.astype("datetime64[Y]").astype(np.int64) + 1970
+
+        # Un punto por (declarante, año): la declaración más reciente y,
+        # en la misma fecha, el mayor ingreso
+        o = np.lexsort((valor, ordinal, anio, g))
+        g, anio, ordinal, valor = g[o], anio[o], ordinal[o], valor[o]
+        last = np.ones(len(g), dtype=bool)
+        last[:-1] = (g[1:] != g[:-1]) | (anio[1:] != anio[:-1])
+        g, anio, ordinal, valor = g[last], anio[last], ordinal[last], valor[last]
+        starts = np.searchsorted(g, np.arange(len(slots) + 1))
+
+        # Crecimiento contra el punto anterior del mismo declarante
+        n = len(g)
+        same = np.zeros(n, dtype=bool)
+        same[1:] = g[1:] == g[:-1]
+        prev = np.full(n, np.nan)
+        prev[1:] = valor[:-1]
+        gap = np.zeros(n, dtype=np.int64)
+        gap[1:] = anio[1:] - anio[:-1]
+        gap[~same] = 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(same & (prev > 0), valor / prev, np.nan)
+            crecimiento = np.power(ratio, 1.0 / np.maximum(gap, 1)) - 1
+
+        # Mayor salto por declarante, sólo con base suficiente y sin caídas a 0
+        step = np.flatnonzero(
+            same & (prev >= MIN_BASE) & (valor > 0) & np.isfinite(crecimiento)
+        )
+        k = len(slots)
+        score = np.full(k, np.nan)
+        best = np.full(k, -1, dtype=np.int64)
+        z = np.full(k, np.nan)
+        if len(step):
+            so = step[np.lexsort((crecimiento[step], g[step]))]
+            top = so[np.r_[g[so][1:] != g[so][:-1], True]]
+            best[g[top]] = top
+            score[g[top]] = crecimiento[top]
+
+            logs = np.log1p(crecimiento[step])
+            med = np.median(logs)
+            mad = np.median(np.abs(logs - med)) * _MAD_SCALE
+            if mad > 0:
+                z[g[top]] = (np.log1p(crecimiento[top]) - med) / mad
+
+        con_salto = np.flatnonzero(~np.isnan(score))
+        ranking = con_salto[stable_argsort(score[con_salto], descending=True)]
+        rank = np.zeros(k, dtype=np.int64)
+        rank[ranking] = np.arange(1, len(ranking) + 1)
+
+        build_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            f"{BANNER} {k} declarante(s) con historial, {n} punto(s) anuales, "
+            f"{len(ranking)} con salto, t={build_ms:.1f}ms"
+        )
+        return cls(
+            names=names,
+            instituciones=instituciones,
+            slots=slots,
+            por_nombre=por_nombre,
+            starts=starts,
+            anio=anio,
+            fecha=ordinal,
+            ingreso=valor,
+            crecimiento=crecimiento,
+            gap=gap,
+            best=best,
+            score=score,
+            z=z,
+            ranking=ranking,
+            rank=rank,
+            build_ms=build_ms,
+        )
+
+    # ───── Consultas ─────
+    def _point(self, i: int) -> Dict[str, Any]:
+        gap = int(self.gap[i])
+        return {
+            "anio": int(self.anio[i]),
+            "fecha": date.fromordinal(int(self.fecha[i])).isoformat(),
+            "ingreso": float(self.ingreso[i]),
+            "crecimiento": _opt(float(self.crecimiento[i])),
+            "aniosDesdeAnterior": gap or None,
+        }
+
+    def summary(self, g: int) -> Dict[str, Any]:
+        """Mayor salto del declarante (fila de la lista de atípicos)."""
+        b = int(self.best[g])
+        return {
+            "rank": int(self.rank[g]) or None,
+            "nombreDeclarante": self.names[g],
+            "institucionDeclarante": self.instituciones[g] or None,
+            "maxCrecimiento": _opt(float(self.score[g])),
+            "zScore": _opt(float(self.z[g])),
+            "anioBase": int(self.anio[b - 1]) if b > 0 else None,
+            "ingresoBase": float(self.ingreso[b - 1]) if b > 0 else None,
+            "anio": int(self.anio[b]) if b >= 0 else None,
+            "ingreso": float(self.ingreso[b]) if b >= 0 else None,
+        }
+
+    def detail(self, g: int) -> Dict[str, Any]:
+        """Serie anual completa del declarante con su mayor salto."""
+        return {
+            **self.summary(g),
+            "serie": [self._point(i) for i in range(int(self.starts[g]), int(self.starts[g + 1]))],
+        }
+
+    def by_name(self, nombre: str, institucion: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Sin `institucion`, de los homónimos se devuelve el de mayor salto
+        (mejor rank; si ninguno tiene salto, el primero).
+        """
+        nombre = normalize_text(nombre)
+        if institucion is not None:
+            g = self.slots.get((nombre, normalize_text(institucion)))
+            return None if g is None else self.detail(g)
+        grupos = self.por_nombre.get(nombre)
+        if not grupos:
+            return None
+        return self.detail(min(grupos, key=lambda g: (self.rank[g] == 0, self.rank[g], g)))
+
+    def top(self, k: int) -> List[Dict[str, Any]]:
+        return [self.summary(g) for g in self.ranking[:k].tolist()]
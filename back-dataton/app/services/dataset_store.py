@@ -0,0 +1,338 @@
+# app/services/dataset_store.py
+"""
+Snapshot en memoria del dataset con recarga en caliente.
+
+El dataset (JSON o binario compilado, ver formato_binario) se carga una
+sola vez por proceso y se publica como un
+snapshot inmutable y versionado. Un hilo en segundo plano vigila el
+archivo (mtime/tamaño y, si cambian, hash del contenido) y, cuando hay
+una versión nueva, construye el snapshot completo fuera del camino de
+las peticiones y lo intercambia de forma atómica.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.services.agregados import AggregateView, MaterializedViews, NameList
+from app.services.columnar import ColumnStore
+from app.services.crecimiento import CrecimientoIngresos
+from app.services.fechas import DateColumns
+from app.services.formato_binario import BinaryDataset, BinaryRecords, is_binary_dataset
+from app.services.indices import NameIndex, SuggestIndex
+from app.services import metricas
+
+logger = logging.getLogger("uvicorn.error")
+
+BANNER = "🟣[DATASET]"
+
+_HASH_CHUNK = 1 << 20
+
+# Índice de una salida en varios archivos (enriquecer_dataset_ingresos.py
+# --shards): enumera los archivos de una versión, que no cambian después de
+# publicarse; cada versión nueva reemplaza el índice de un solo rename.
+SHARDS_SUFFIX = ".shards.json"
+
+
+def is_shards_index(path: Path) -> bool:
+    return path.name.endswith(SHARDS_SUFFIX)
+
+
+def load_records(path: Path) -> Any:
+    """
+    JSON (arreglo) o NDJSON (un registro por línea), opcionalmente .gz. Un
+    índice .shards.json se lee como la concatenación de sus archivos.
+    """
+    if is_shards_index(path):
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        records: List[Any] = []
+        for rel in index["shards"]:
+            part = load_records(path.parent / rel)
+            if not isinstance(part, list):
+                raise ValueError(f"{rel} no es una lista JSON")
+            records.extend(part)
+        return records
+    name = path.name[:-3] if path.name.endswith(".gz") else path.name
+    opener = gzip.open if name != path.name else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        if name.endswith(".ndjson"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def file_fingerprint(path: Path) -> str:
+    """
+    Hash del contenido del archivo (lectura por bloques). En un índice
+    .shards.json basta el del índice: nombra el directorio de su versión.
+    """
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclass(frozen=True)
+class Derivados:
+    """Estructuras que se construyen a partir de los registros de una versión."""
+
+    columnas: ColumnStore
+    name_index: NameIndex
+    suggest_index: SuggestIndex
+    vistas: MaterializedViews
+    crecimiento: CrecimientoIngresos
+
+    @classmethod
+    def build(
+        cls, records: Sequence[Dict[str, Any]], columnas: ColumnStore, suggest_by_volume: bool
+    ) -> "Derivados":
+        return cls(
+            columnas=columnas,
+            name_index=NameIndex.build(columnas),
+            suggest_index=SuggestIndex.build(columnas, rank_by_volume=suggest_by_volume),
+            vistas=MaterializedViews.build(records, columnas),
+            crecimiento=CrecimientoIngresos.build(columnas),
+        )
+
+
+@dataclass(frozen=True)
+class DatasetSnapshot:
+    """
+    Versión inmutable del dataset.
+
+    Las peticiones sólo leen de aquí; nunca se modifica después de
+    publicarse (los registros se tratan como de sólo lectura).
+    """
+
+    version: int
+    fingerprint: str
+    path: Path
+    mtime_ns: int
+    size: int
+    loaded_at: float
+    load_ms: float
+    records: Sequence[Dict[str, Any]]
+    name_index: NameIndex
+    suggest_index: SuggestIndex
+    fechas: DateColumns
+    columnas: ColumnStore
+    vistas: MaterializedViews
+    crecimiento: CrecimientoIngresos
+
+    # ───── Interfaz de lectura común (ver almacen.DataView) ─────
+    def records_by_name(self, nombre: str) -> List[Dict[str, Any]]:
+        data = self.records
+        return [data[i] for i in self.name_index.lookup(nombre)]
+
+    def records_by_names(self, nombres: Sequence[str]) -> Dict[str, List[Dict[str, Any]]]:
+        data = self.records
+        return {
+            key: [data[i] for i in ids]
+            for key, ids in self.name_index.lookup_many(nombres).items()
+        }
+
+    def suggest(self, query: str, limit: int) -> List[str]:
+        return self.suggest_index.search(query, limit)
+
+    def padron(self, with_toma: bool) -> NameList:
+        return self.vistas.padron_con_toma if with_toma else self.vistas.padron
+
+    def vista(self, name: str) -> AggregateView:
+        return self.vistas.by_name(name)
+
+    def ingresos_historial(
+        self, nombre: str, institucion: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        return self.crecimiento.by_name(nombre, institucion)
+
+    def ingresos_atipicos(self, top_k: int) -> List[Dict[str, Any]]:
+        return self.crecimiento.top(top_k)
+
+
+class DatasetStore:
+    """
+    Mantiene el snapshot vigente del dataset y lo recarga cuando el
+    archivo cambia.
+
+    - get(): devuelve el snapshot actual (lo carga la primera vez).
+    - current(): el snapshot publicado o None, sin cargar nada.
+    - start()/stop(): arrancan/detienen el hilo vigilante.
+    - reload(): fuerza la verificación del archivo.
+    """
+
+    # Etiqueta del backend en /metrics
+    BACKEND = "memoria"
+
+    def __init__(
+        self,
+        path: Path,
+        poll_interval: float = 2.0,
+        suggest_by_volume: bool = True,
+    ):
+        self.path = Path(path)
+        self.poll_interval = poll_interval
+        self.suggest_by_volume = suggest_by_volume
+        self._snapshot: Optional[DatasetSnapshot] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ───── Lectura ─────
+    def get(self) -> DatasetSnapshot:
+        snap = self._snapshot
+        if snap is not None:
+            return snap
+        # Primera carga (p. ej. si no se ejecutó el evento de startup)
+        with self._lock:
+            if self._snapshot is None:
+                self._check_and_reload(force=True)
+            if self._snapshot is None:
+                raise RuntimeError(f"No se pudo cargar el dataset desde {self.path}")
+            return self._snapshot
+
+    def current(self) -> Optional[DatasetSnapshot]:
+        return self._snapshot
+
+    # ───── Recarga ─────
+    def reload(self, force: bool = False) -> bool:
+        """Devuelve True si se publicó una versión nueva."""
+        with self._lock:
+            return self._check_and_reload(force=force)
+
+    def _check_and_reload(self, force: bool) -> bool:
+        try:
+            st = self.path.stat()
+        except OSError as e:
+            logger.warning(f"{BANNER} no se puede leer {self.path}: {e}")
+            return False
+
+        signature = (st.st_mtime_ns, st.st_size)
+        if not force and signature == self._signature:
+            return False
+
+        start = time.perf_counter()
+        try:
+            loaded = self._load_source()
+        except Exception as e:
+            # Archivo a medio escribir o corrupto: se conserva el snapshot
+            # anterior y se reintenta en el siguiente ciclo.
+            logger.warning(f"{BANNER} error al cargar {self.path}: {e}")
+            metricas.dataset_unchanged(self.BACKEND, error=True)
+            return False
+        if loaded is None:
+            # Cambió el mtime pero no el contenido
+            self._signature = signature
+            metricas.dataset_unchanged(self.BACKEND)
+            return False
+
+        # Las estructuras derivadas ya están listas antes de publicar la versión
+        fingerprint, records, fechas, derivados = loaded
+        self._version += 1
+        load_ms = (time.perf_counter() - start) * 1000
+        snap = DatasetSnapshot(
+            version=self._version,
+            fingerprint=fingerprint,
+            path=self.path,
+            mtime_ns=st.st_mtime_ns,
+            size=st.st_size,
+            loaded_at=time.time(),
+            load_ms=load_ms,
+            records=records,
+            name_index=derivados.name_index,
+            suggest_index=derivados.suggest_index,
+            fechas=fechas,
+            columnas=derivados.columnas,
+            vistas=derivados.vistas,
+            crecimiento=derivados.crecimiento,
+        )
+        # Intercambio atómico de la referencia
+        self._snapshot = snap
+        self._signature = signature
+        logger.info(
+            f"{BANNER} v{snap.version} cargado: {len(snap.records)} registros "
+            f"sha1={fingerprint[:12]} t={load_ms:.1f}ms"
+        )
+        metricas.dataset_loaded(
+            self.BACKEND,
+            load_ms / 1000,
+            len(records),
+            snap.version,
+            {
+                "fechas": fechas.build_ms,
+                "columnas": snap.columnas.build_ms,
+                "indice_nombres": snap.name_index.build_ms,
+                "indice_sugerencias": snap.suggest_index.build_ms,
+                "vista_cruce_toma": snap.vistas.cruce_toma.build_ms,
+                "vista_conflicto": snap.vistas.conflicto.build_ms,
+                "crecimiento": snap.crecimiento.build_ms,
+            },
+        )
+        return True
+
+    def _load_source(
+        self,
+    ) -> Optional[Tuple[str, Sequence[Dict[str, Any]], DateColumns, Derivados]]:
+        """
+        Lee el archivo (JSON o binario compilado) y construye las
+        estructuras derivadas. Devuelve None si el contenido es el mismo
+        que el del snapshot vigente.
+        """
+        current = self._snapshot
+
+        if is_binary_dataset(self.path):
+            # La huella viene en el encabezado: no hace falta leer el archivo
+            ds = BinaryDataset(self.path)
+            if current is not None and ds.fingerprint == current.fingerprint:
+                return None
+            fechas = ds.date_columns()
+            records = BinaryRecords(ds)
+            derivados = Derivados.build(records, ds.column_store(fechas), self.suggest_by_volume)
+            return ds.fingerprint, records, fechas, derivados
+
+        fingerprint = file_fingerprint(self.path)
+        if current is not None and fingerprint == current.fingerprint:
+            return None
+        raw = load_records(self.path)
+        if not isinstance(raw, list):
+            raise ValueError("no es una lista JSON")
+        records = tuple(raw)
+        fechas = DateColumns.build(records)
+        derivados = Derivados.build(
+            records, ColumnStore.build(records, fechas), self.suggest_by_volume
+        )
+        return fingerprint, records, fechas, derivados
+
+    # ───── Hilo vigilante ─────
+    def start(self) -> None:
+        # Si el archivo aún no existe no se impide el arranque: el hilo
+        # vigilante lo cargará en cuanto aparezca.
+        if self._snapshot is None:
+            self.reload(force=True)
+        if self.poll_interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name="dataset-watcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1)
+            self._thread = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception:
+                logger.exception(f"{BANNER} fallo inesperado en recarga")
@@ -0,0 +1,43 @@
+# app/services/etag.py
+"""
+ETag y GET condicional para los endpoints del timeline.
+
+Las respuestas son deterministas para un mismo dataset, así que el ETag
+se deriva de la huella del dataset (igual en todos los workers, a
+diferencia del número de versión del proceso), la ruta y los parámetros
+de la consulta normalizados. Si el cliente manda un If-None-Match que
+coincide, se responde 304 sin ejecutar el handler.
+"""
+import hashlib
+from typing import Iterable, Tuple
+
+# Súbelo si cambia la forma de las respuestas sin cambiar el dataset
+FORMATO = "1"
+
+
+def normalize_query(items: Iterable[Tuple[str, str]]) -> str:
+    """Parámetros ordenados por nombre (se conserva el orden de los repetidos)."""
+    pares = sorted(((k, v.strip()) for k, v in items), key=lambda kv: kv[0])
+    return "&".join(f"{k}={v}" for k, v in pares)
+
+
+def compute_etag(fingerprint: str, path: str, items: Iterable[Tuple[str, str]]) -> str:
+    h = hashlib.sha1(f"{FORMATO}\0{path}\0{normalize_query(items)}".encode("utf-8"))
+    return f'W/"{fingerprint[:16]}-{h.hexdigest()[:16]}"'
+
+
+def matches(if_none_match: str, etag: str) -> bool:
+    """Comparación débil contra la lista de If-None-Match (RFC 9110 §13.1.2)."""
+    if if_none_match.strip() == "*":
+        return True
+    actual = etag.removeprefix("W/")
+    return any(
+        tag.strip().removeprefix("W/") == actual for tag in if_none_match.split(",")
+    )
+
+
+def cache_control(max_age: int) -> str:
+    """Con max-age 0 el navegador guarda la respuesta pero revalida siempre."""
+    if max_age <= 0:
+        return "public, no-cache"
+    return f"public, max-age={max_age}, must-revalidate"
@@ -0,0 +1,240 @@
+# app/services/fechas.py
+"""
+Normalización de fechas del dataset a columnas de timestamps.
+
+Las fechas llegan en varios formatos de texto. Se parsean una sola vez
+por versión del dataset y se guardan como columnas de epoch (float,
+NaN = sin fecha válida), de modo que los endpoints no parsean texto.
+"""
+import logging
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("uvicorn.error")
+
+BANNER = "🟣[FECHAS]"
+
+NAN = float("nan")
+
+# (formato strptime, etiqueta). Los formatos son mutuamente excluyentes,
+# así que el orden en que se prueban no cambia el resultado.
+DATE_FORMATS: List[Tuple[str, str]] = [
+    ("%Y-%m-%d", "YYYY-MM-DD"),
+    ("%Y/%m/%d", "YYYY/MM/DD"),
+    ("%d/%m/%Y", "DD/MM/YYYY"),
+    ("%d-%m-%Y", "DD-MM-YYYY"),
+    ("%Y-%m-%dT%H:%M:%SZ", "ISO-Z"),
+    ("%Y-%m-%dT%H:%M:%S", "ISO"),  # sin Z
+]
+
+# Cuántos valores distintos se usan para detectar el formato dominante
+_SAMPLE = 1000
+
+
+def _fast_ymd(sep: str) -> Callable[[str], Optional[datetime]]:
+    def parse(raw: str) -> Optional[datetime]:
+        if len(raw) != 10 or raw[4] != sep or raw[7] != sep or not raw.isascii():
+            return None
+        y, m, d = raw[0:4], raw[5:7], raw[8:10]
+        if not (y.isdigit() and m.isdigit() and d.isdigit()):
+            return None
+        try:
+            return datetime(int(y), int(m), int(d))
+        except ValueError:
+            return None
+
+    return parse
+
+
+def _fast_dmy(sep: str) -> Callable[[str], Optional[datetime]]:
+    def parse(raw: str) -> Optional[datetime]:
+        if len(raw) != 10 or raw[2] != sep or raw[5] != sep or not raw.isascii():
+            return None
+        d, m, y = raw[0:2], raw[3:5], raw[6:10]
+        if not (y.isdigit() and m.isdigit() and d.isdigit()):
+            return None
+        try:
+            return datetime(int(y), int(m), int(d))
+        except ValueError:
+            return None
+
+    return parse
+
+
+# Atajos sin strptime para los formatos de ancho fijo. Si el atajo no
+# aplica (p. ej. "2020-1-5") se cae al strptime del mismo formato.
+_FAST_PATHS: Dict[str, Callable[[str], Optional[datetime]]] = {
+    "YYYY-MM-DD": _fast_ymd("-"),
+    "YYYY/MM/DD": _fast_ymd("/"),
+    "DD/MM/YYYY": _fast_dmy("/"),
+    "DD-MM-YYYY": _fast_dmy("-"),
+}
+
+
+def parse_datetime(
+    raw: str, formats: Sequence[Tuple[str, str]] = DATE_FORMATS
+) -> Tuple[Optional[str], Optional[datetime]]:
+    """
+    Intenta los formatos en el orden dado y, al final, fromisoformat.
+    Return: (etiqueta_formato, datetime) o (None, None).
+    """
+    for fmt, label in formats:
+        fast = _FAST_PATHS.get(label)
+        if fast is not None:
+            dt = fast(raw)
+            if dt is not None:
+                return label, dt
+        try:
+            return label, datetime.strptime(raw, fmt)
+        except ValueError:
+            pass
+
+    try:
+        return "fromisoformat", datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        return None, None
+
+
+def to_epoch(dt: datetime) -> float:
+    """
+    Mismo criterio que el parseo original: se conserva la hora de pared
+    con precisión de segundos y se interpreta como hora local.
+    """
+    return dt.replace(microsecond=0, tzinfo=None).timestamp()
+
+
+@dataclass
+class DateColumnReport:
+    column: str
+    total: int = 0
+    empty: int = 0
+    parsed: int = 0
+    formats: Counter = field(default_factory=Counter)
+    invalid: Counter = field(default_factory=Counter)
+
+    @property
+    def unparseable(self) -> int:
+        return sum(self.invalid.values())
+
+    def summary(self, top: int = 10) -> Dict[str, Any]:
+        return {
+            "column": self.column,
+            "total": self.total,
+            "empty": self.empty,
+            "parsed": self.parsed,
+            "unparseable": self.unparseable,
+            "formats": dict(self.formats.most_common()),
+            "invalidTop": [{"raw": r, "count": c} for r, c in self.invalid.most_common(top)],
+        }
+
+
+def _detect_order(values: Iterable[Any]) -> List[Tuple[str, str]]:
+    """Reordena DATE_FORMATS según la frecuencia en una muestra de valores."""
+    counts: Counter = Counter()
+    seen = set()
+    for v in values:
+        if not isinstance(v, str):
+            continue
+        raw = v.strip()
+        if not raw or raw in seen:
+            continue
+        seen.add(raw)
+        label, _ = parse_datetime(raw)
+        if label:
+            counts[label] += 1
+        if len(seen) >= _SAMPLE:
+            break
+    rank = {label: i for i, (label, _) in enumerate(counts.most_common())}
+    return sorted(DATE_FORMATS, key=lambda f: rank.get(f[1], len(rank)))
+
+
+def parse_date_column(column: str, values: Sequence[Any]) -> Tuple[array, DateColumnReport]:
+    """
+    Convierte una columna de fechas en texto a un array('d') de epoch.
+
+    - Detecta el formato dominante con una muestra y lo prueba primero.
+    - Cachea por valor crudo (las fechas se repiten mucho).
+    """
+    order = _detect_order(values)
+    report = DateColumnReport(column=column)
+    cache: Dict[str, Tuple[Optional[str], float]] = {}
+    out = array("d", bytes(8 * len(values)))
+
+    for i, v in enumerate(values):
+        report.total += 1
+        if not v or not isinstance(v, str):
+            out[i] = NAN
+            report.empty += 1
+            continue
+
+        hit = cache.get(v)
+        if hit is None:
+            raw = v.strip()
+            label, dt = parse_datetime(raw, order) if raw else (None, None)
+            ts = NAN
+            if dt is not None and dt.year < 1000:
+                # El parseo original descartaba años de menos de 4 dígitos
+                label = None
+            elif dt is not None:
+                try:
+                    ts = to_epoch(dt)
+                except (ValueError, OverflowError, OSError):
+                    label = None
+            hit = cache[v] = (label, ts)
+
+        label, ts = hit
+        out[i] = ts
+        if label is None:
+            report.invalid[v] += 1
+        else:
+            report.parsed += 1
+            report.formats[label] += 1
+
+    return out, report
+
+
+@dataclass(frozen=True)
+class DateColumns:
+    """
+    Timestamps por registro (mismo orden que snapshot.records).
+    Cada columna es un array('d') o, desde el formato binario, un np.ndarray.
+    """
+
+    toma: Sequence[float]
+    inicio: Sequence[float]
+    fin: Sequence[float]
+    reports: Tuple[DateColumnReport, ...]
+    build_ms: float
+
+    @classmethod
+    def build(cls, records: Sequence[Dict[str, Any]]) -> "DateColumns":
+        start = time.perf_counter()
+        contratos = [d.get("contrato") or {} for d in records]
+        toma, r_toma = parse_date_column(
+            "fechaTomaPosesion", [d.get("fechaTomaPosesion") for d in records]
+        )
+        inicio, r_ini = parse_date_column(
+            "fechaInicioContrato", [c.get("fechaInicioContrato") for c in contratos]
+        )
+        fin, r_fin = parse_date_column(
+            "fechaFinContrato", [c.get("fechaFinContrato") for c in contratos]
+        )
+        build_ms = (time.perf_counter() - start) * 1000
+        cols = cls(toma, inicio, fin, (r_toma, r_ini, r_fin), build_ms)
+        cols.log_report()
+        return cols
+
+    def log_report(self) -> None:
+        logger.info(f"{BANNER} columnas de fechas construidas t={self.build_ms:.1f}ms")
+        for r in self.reports:
+            s = r.summary()
+            logger.info(
+                f"{BANNER} {r.column}: total={r.total} ok={r.parsed} "
+                f"vacías={r.empty} inválidas={r.unparseable} formatos={s['formats']}"
+            )
+            if r.invalid:
+                logger.warning(f"{BANNER} {r.column} inválidas (top 10) → {s['invalidTop']}")
@@ -0,0 +1,233 @@
+# app/services/filtros.py
+"""
+Filtros de los paneles de riesgo (/declarantes-cruce-toma y
+/declarantes-conflicto) resueltos con índices precalculados por vista.
+
+  - Campos categóricos (nivelOrdenGobierno, sectorS1.valor,
+    nombreEntePublico, contrato.institucionCompradora): lista de postings
+    valor -> posiciones (ordenadas) de los items de la vista con al menos
+    un registro con ese valor. Se compara sin distinguir mayúsculas ni
+    espacios extremos, igual que ente_id / inst_id.
+  - Rangos de montoTotal y de fecha de toma: los valores de los items ya
+    ordenados, de modo que un rango es una búsqueda binaria.
+
+Varios valores de un mismo campo se unen; campos distintos se
+intersectan, empezando por el conjunto más chico. Ningún filtro recorre
+registros ni items completos.
+"""
+import hashlib
+import json
+import time
+from dataclasses import astuple, dataclass, fields
+from datetime import timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.columnar import ColumnStore
+from app.services.fechas import parse_datetime, to_epoch
+
+# Campos categóricos en el orden en que se aplican
+CAMPOS = ("nivel", "sector", "ente", "institucion")
+
+# Formatos de DATE_FORMATS sin hora
+_SOLO_FECHA = {"YYYY-MM-DD", "YYYY/MM/DD", "DD/MM/YYYY", "DD-MM-YYYY"}
+
+
+def _valores(raw: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    return tuple(sorted({v.strip().lower() for v in raw or () if v and v.strip()}))
+
+
+def _fecha(raw: str) -> Tuple[float, float]:
+    """[inicio, fin) en epoch; una fecha sin hora cubre el día completo."""
+    label, dt = parse_datetime(raw.strip())
+    if dt is None:
+        raise ValueError(f"fecha inválida: '{raw}'")
+    if label in _SOLO_FECHA:
+        return to_epoch(dt), to_epoch(dt + timedelta(days=1))
+    # Con hora: el segundo indicado (las columnas tienen precisión de segundos)
+    return to_epoch(dt), to_epoch(dt) + 1
+
+
+@dataclass(frozen=True)
+class Filtro:
+    """Filtros de una petición, ya normalizados (vacío = sin filtrar)."""
+
+    nivel: Tuple[str, ...] = ()
+    sector: Tuple[str, ...] = ()
+    ente: Tuple[str, ...] = ()
+    institucion: Tuple[str, ...] = ()
+    monto_min: Optional[float] = None
+    monto_max: Optional[float] = None
+    toma_desde: Optional[float] = None   # epoch, inclusivo
+    toma_hasta: Optional[float] = None   # epoch, exclusivo
+
+    @classmethod
+    def from_query(
+        cls,
+        nivel: Optional[Sequence[str]] = None,
+        sector: Optional[Sequence[str]] = None,
+        ente: Optional[Sequence[str]] = None,
+        institucion: Optional[Sequence[str]] = None,
+        monto_min: Optional[float] = None,
+        monto_max: Optional[float] = None,
+        toma_desde: Optional[str] = None,
+        toma_hasta: Optional[str] = None,
+    ) -> "Filtro":
+        """Lanza ValueError si una fecha no se puede interpretar."""
+        return cls(
+            nivel=_valores(nivel),
+            sector=_valores(sector),
+            ente=_valores(ente),
+            institucion=_valores(institucion),
+            monto_min=monto_min,
+            monto_max=monto_max,
+            toma_desde=_fecha(toma_desde)[0] if toma_desde else None,
+            toma_hasta=_fecha(toma_hasta)[1] if toma_hasta else None,
+        )
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, f.name) not in ((), None) for f in fields(self))
+
+    def key(self) -> Tuple[Any, ...]:
+        return astuple(self)
+
+    def huella(self) -> str:
+        """Identificador corto para cursores (distingue páginas de filtros distintos)."""
+        raw = json.dumps(self.key(), ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class Postings:
+    """
+    valor -> posiciones de items. Como NameIndex: todas las posiciones en
+    un solo arreglo agrupado por valor, y el dict sólo guarda el grupo.
+    """
+
+    slots: Dict[str, int]
+    starts: np.ndarray
+    items: np.ndarray
+
+    @classmethod
+    def build(
+        cls, item_of_row: np.ndarray, value_id: np.ndarray, vocab: List[str], n_items: int
+    ) -> "Postings":
+        ok = value_id >= 0
+        # Pares (valor, item) únicos y ordenados en una sola pasada
+        pairs = np.unique(value_id[ok].astype(np.int64) * max(n_items, 1) + item_of_row[ok])
+        vals, items = np.divmod(pairs, max(n_items, 1))
+        present, starts = np.unique(vals, return_index=True)
+        return cls(
+            slots={vocab[v]: k for k, v in enumerate(present.tolist())},
+            starts=np.append(starts, len(items)),
+            items=items.astype(np.int32),
+        )
+
+    def lookup(self, valores: Sequence[str]) -> np.ndarray:
+        """Unión ordenada de las posiciones de `valores`."""
+        parts = [
+            self.items[self.starts[s]:self.starts[s + 1]]
+            for s in (self.slots.get(v) for v in valores)
+            if s is not None
+        ]
+        if not parts:
+            return np.empty(0, dtype=np.int32)
+        return parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+    def values(self) -> Iterator[Tuple[str, np.ndarray]]:
+        for v, s in self.slots.items():
+            yield v, self.items[self.starts[s]:self.starts[s + 1]]
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+
+@dataclass(frozen=True)
+class FilterIndex:
+    """Índices de filtrado de una vista (posiciones = orden de primera aparición)."""
+
+    postings: Dict[str, Postings]
+    monto_orden: np.ndarray   # posiciones por montoTotal ascendente
+    monto: np.ndarray         # montoTotal en ese orden
+    toma_orden: np.ndarray    # posiciones con toma válida, por fecha ascendente
+    toma: np.ndarray          # epoch en ese orden
+    build_ms: float
+
+    @classmethod
+    def build(
+        cls, cols: ColumnStore, rows_mask: np.ndarray, items: Sequence[Dict[str, Any]]
+    ) -> "FilterIndex":
+        """
+        `rows_mask` marca los registros que aportan a la vista; cada uno se
+        asigna al item de su declarante (los declarantes fuera de la vista
+        se descartan).
+        """
+        start = time.perf_counter()
+        n = len(items)
+        decl_of_name = {name: k for k, name in enumerate(cols.decl_names)}
+        item_of_decl = np.full(len(cols.decl_names), -1, dtype=np.int64)
+        item_of_decl[[decl_of_name[it["nombreDeclarante"]] for it in items]] = np.arange(n)
+
+        rows = np.flatnonzero(rows_mask & (cols.decl_id >= 0))
+        item_of_row = item_of_decl[cols.decl_id[rows]]
+        keep = item_of_row >= 0
+        rows, item_of_row = rows[keep], item_of_row[keep]
+
+        postings = {
+            "nivel": Postings.build(item_of_row, cols.nivel_id[rows], cols.niveles, n),
+            "sector": Postings.build(item_of_row, cols.sector_id[rows], cols.sectores, n),
+            "ente": Postings.build(item_of_row, cols.ente_id[rows], cols.entidades, n),
+            "institucion": Postings.build(item_of_row, cols.inst_id[rows], cols.entidades, n),
+        }
+
+        monto = np.array([it["montoTotal"] for it in items], dtype=np.float64)
+        monto_orden = np.argsort(monto, kind="stable")
+
+        # Toma de referencia: la del primer registro del declarante en la vista
+        toma = np.full(n, np.nan)
+        found, first = np.unique(item_of_row, return_index=True)
+        toma[found] = cols.toma[rows[first]]
+        con_toma = np.flatnonzero(~np.isnan(toma))
+        toma_orden = con_toma[np.argsort(toma[con_toma], kind="stable")]
+
+        return cls(
+            postings=postings,
+            monto_orden=monto_orden,
+            monto=monto[monto_orden],
+            toma_orden=toma_orden,
+            toma=toma[toma_orden],
+            build_ms=(time.perf_counter() - start) * 1000,
+        )
+
+    def select(self, filtro: Filtro) -> np.ndarray:
+        """Posiciones (ordenadas) de los items que cumplen todos los filtros."""
+        sets: List[np.ndarray] = [
+            self.postings[campo].lookup(getattr(filtro, campo))
+            for campo in CAMPOS
+            if getattr(filtro, campo)
+        ]
+        if filtro.monto_min is not None or filtro.monto_max is not None:
+            lo = 0 if filtro.monto_min is None else np.searchsorted(self.monto, filtro.monto_min, "left")
+            hi = (
+                len(self.monto) if filtro.monto_max is None
+                else np.searchsorted(self.monto, filtro.monto_max, "right")
+            )
+            sets.append(np.sort(self.monto_orden[lo:hi]))
+        if filtro.toma_desde is not None or filtro.toma_hasta is not None:
+            lo = 0 if filtro.toma_desde is None else np.searchsorted(self.toma, filtro.toma_desde, "left")
+            hi = (
+                len(self.toma) if filtro.toma_hasta is None
+                else np.searchsorted(self.toma, filtro.toma_hasta, "left")
+            )
+            sets.append(np.sort(self.toma_orden[lo:hi]))
+
+        if not sets:
+            return np.arange(len(self.monto))
+        sets.sort(key=len)
+        out = sets[0]
+        for s in sets[1:]:
+            if out.size == 0:
+                break
+            out = np.intersect1d(out, s, assume_unique=True)
+        return out
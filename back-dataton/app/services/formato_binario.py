@@ -0,0 +1,337 @@
+# app/services/formato_binario.py
+"""
+Formato binario compacto del dataset (mapeable en memoria).
+
+Estructura del archivo:
+
+    [0:8]    MAGIC
+    [8:16]   longitud del encabezado (uint64 little-endian)
+    [16:..]  encabezado JSON (directorio de secciones)
+    ...      secciones alineadas a 64 bytes
+
+Secciones:
+  - tabla de strings deduplicada: offsets (uint64) + blob UTF-8. Cada
+    entrada es el JSON de un valor hoja, así que tipos y nulos se
+    conservan tal cual.
+  - una columna int32 por cada ruta hoja de los registros
+    (p. ej. contrato/montoContrato) con el id en la tabla de strings
+    (-1 = la clave no existe en ese registro).
+  - columnas numéricas ya calculadas: epochs de toma/inicio/fin y monto.
+
+Al abrirlo con mmap, las columnas son vistas NumPy sobre el archivo: no
+hay parseo de JSON al arrancar y varios workers comparten la caché de
+páginas del sistema operativo. Los registros se reconstruyen como dict
+sólo cuando se piden.
+"""
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.columnar import ColumnStore, hist_code, parse_monto
+from app.services.fechas import DateColumnReport, DateColumns
+from app.services.ingresos import INGRESOS_KEYS, safe_number
+from app.services.texto import normalize_text
+
+MAGIC = b"MAMUTSB1"
+FORMAT_VERSION = 1
+_ALIGN = 64
+_HEAD = struct.Struct("<8sQ")
+
+Path_ = Tuple[str, ...]
+
+_MISSING = object()
+
+
+def is_binary_dataset(path: Path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _leaf_paths(obj: Dict[str, Any], prefix: Path_ = ()) -> Iterator[Tuple[Path_, Any]]:
+    """Rutas hoja de un registro. Los dicts vacíos y las listas son hojas."""
+    for k, v in obj.items():
+        path = prefix + (k,)
+        if isinstance(v, dict) and v:
+            yield from _leaf_paths(v, path)
+        else:
+            yield path, v
+
+
+def _dumps(v: Any) -> str:
+    return json.dumps(v, ensure_ascii=False, separators=(",", ":"))
+
+
+# ───────────────────────── Escritura ─────────────────────────
+def compile_dataset(
+    records: Sequence[Dict[str, Any]], out_path: Path, fingerprint: str
+) -> Dict[str, Any]:
+    """
+    Escribe `records` en formato binario (escritura atómica: archivo
+    temporal + rename). `fingerprint` es el hash del dataset de origen y
+    se conserva como versión del dataset. Devuelve el encabezado.
+    """
+    n = len(records)
+    strings: Dict[str, int] = {}
+    columns: Dict[Path_, array] = {}
+
+    for i, d in enumerate(records):
+        for path, value in _leaf_paths(d):
+            col = columns.get(path)
+            if col is None:
+                col = columns[path] = array("i", [-1]) * n
+            text = _dumps(value)
+            sid = strings.get(text)
+            if sid is None:
+                sid = strings[text] = len(strings)
+            col[i] = sid
+
+    blob = bytearray()
+    offsets = array("Q", [0])
+    for text in strings:
+        blob += text.encode("utf-8")
+        offsets.append(len(blob))
+
+    fechas = DateColumns.build(records)
+    monto = array(
+        "d", (parse_monto((d.get("contrato") or {}).get("montoContrato")) for d in records)
+    )
+
+    sections: List[Tuple[str, bytes]] = [
+        ("strings.offsets", offsets.tobytes()),
+        ("strings.blob", bytes(blob)),
+        ("num.toma", fechas.toma.tobytes()),
+        ("num.inicio", fechas.inicio.tobytes()),
+        ("num.fin", fechas.fin.tobytes()),
+        ("num.monto", monto.tobytes()),
+    ]
+    fields = []
+    for k, (path, col) in enumerate(columns.items()):
+        name = f"field.{k}"
+        fields.append({"path": list(path), "section": name})
+        sections.append((name, col.tobytes()))
+
+    header: Dict[str, Any] = {
+        "format": FORMAT_VERSION,
+        "fingerprint": fingerprint,
+        "records": n,
+        "strings": len(strings),
+        "fields": fields,
+        "fechas": [r.summary(top=100) for r in fechas.reports],
+    }
+    write_sections(out_path, MAGIC, header, sections)
+    return header
+
+
+def write_sections(
+    out_path: Path, magic: bytes, header: Dict[str, Any], sections: Sequence[Tuple[str, Any]]
+) -> None:
+    """
+    Escribe MAGIC + encabezado JSON + secciones alineadas (archivo
+    temporal + rename). Agrega a `header` el directorio de secciones.
+    """
+    # El directorio de secciones depende del tamaño del encabezado: se
+    # reserva espacio y se reintenta hasta que quepa.
+    reserve = 4096
+    while True:
+        pos = _HEAD.size + reserve
+        directory = {}
+        for name, data in sections:
+            pos = (pos + _ALIGN - 1) // _ALIGN * _ALIGN
+            directory[name] = [pos, memoryview(data).nbytes]
+            pos += directory[name][1]
+        header["sections"] = directory
+        raw_header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        if len(raw_header) <= reserve:
+            break
+        reserve = len(raw_header) + 4096
+
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEAD.pack(magic, len(raw_header)))
+        f.write(raw_header)
+        for name, data in sections:
+            f.seek(directory[name][0])
+            f.write(data)
+        f.truncate(pos)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, out_path)
+
+
+def read_header(mm: mmap.mmap, magic: bytes, path: Path) -> Dict[str, Any]:
+    """Encabezado JSON de un archivo escrito con write_sections."""
+    found, header_len = _HEAD.unpack_from(mm, 0)
+    if found != magic:
+        raise ValueError(f"{path} no tiene el formato esperado")
+    return json.loads(mm[_HEAD.size:_HEAD.size + header_len])
+
+
+# ───────────────────────── Lectura ─────────────────────────
+class BinaryDataset:
+    """Archivo binario abierto con mmap (sólo lectura)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.header = read_header(self._mm, MAGIC, self.path)
+        if self.header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"versión de formato no soportada: {self.header.get('format')}")
+
+        self.n = int(self.header["records"])
+        self.fingerprint = str(self.header["fingerprint"])
+        self._offsets = self._section("strings.offsets", np.uint64)
+        blob_off, blob_len = self.header["sections"]["strings.blob"]
+        self._blob = memoryview(self._mm)[blob_off:blob_off + blob_len]
+        self.fields: Dict[Path_, np.ndarray] = {
+            tuple(f["path"]): self._section(f["section"], np.int32) for f in self.header["fields"]
+        }
+        self._values: Dict[int, Any] = {}
+
+    def _section(self, name: str, dtype: Any) -> np.ndarray:
+        off, length = self.header["sections"][name]
+        count = length // np.dtype(dtype).itemsize
+        return np.frombuffer(self._mm, dtype=dtype, count=count, offset=off)
+
+    def numeric(self, name: str) -> np.ndarray:
+        return self._section(f"num.{name}", np.float64)
+
+    # ───── Tabla de strings ─────
+    def value(self, sid: int) -> Any:
+        v = self._values.get(sid, _MISSING)
+        if v is _MISSING:
+            a, b = int(self._offsets[sid]), int(self._offsets[sid + 1])
+            v = self._values[sid] = json.loads(bytes(self._blob[a:b]).decode("utf-8"))
+        return v
+
+    def column(self, *path: str) -> np.ndarray:
+        """Ids de la ruta (todo -1 si la ruta no existe en el dataset)."""
+        col = self.fields.get(path)
+        if col is None:
+            return np.full(self.n, -1, dtype=np.int32)
+        return col
+
+    def decode_column(self, ids: np.ndarray, fn: Any, dtype: Any, missing: Any) -> np.ndarray:
+        """
+        Aplica `fn` una vez por valor distinto de la columna y expande el
+        resultado a todos los registros (ausente -> `missing`).
+        """
+        # Los ids son densos: una tabla indexada por id+1 evita ordenar
+        present = np.zeros(len(self._offsets), dtype=bool)
+        present[ids + 1] = True
+        table = np.empty(len(self._offsets), dtype=dtype)
+        table[0] = missing
+        for k in np.flatnonzero(present[1:]).tolist():
+            table[k + 1] = fn(self.value(k))
+        return table[ids + 1]
+
+    # ───── Registros ─────
+    def record(self, i: int) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for path, col in self.fields.items():
+            sid = int(col[i])
+            if sid < 0:
+                continue
+            cur = out
+            for key in path[:-1]:
+                cur = cur.setdefault(key, {})
+            cur[path[-1]] = self.value(sid)
+        return out
+
+    # ───── Columnas del snapshot ─────
+    def date_columns(self) -> DateColumns:
+        start = time.perf_counter()
+        reports = []
+        for s in self.header["fechas"]:
+            r = DateColumnReport(
+                column=s["column"], total=s["total"], empty=s["empty"], parsed=s["parsed"]
+            )
+            r.formats = Counter(s["formats"])
+            r.invalid = Counter({x["raw"]: x["count"] for x in s["invalidTop"]})
+            reports.append(r)
+        cols = DateColumns(
+            toma=self.numeric("toma"),
+            inicio=self.numeric("inicio"),
+            fin=self.numeric("fin"),
+            reports=tuple(reports),
+            build_ms=(time.perf_counter() - start) * 1000,
+        )
+        cols.log_report()
+        return cols
+
+    def column_store(self, fechas: DateColumns) -> ColumnStore:
+        """Mismas columnas que ColumnStore.build, calculadas por valor distinto."""
+        start = time.perf_counter()
+
+        def codes(ids: np.ndarray, norm: Any, table: Dict[str, int]) -> np.ndarray:
+            def code(v: Any) -> int:
+                s = norm(v) if isinstance(v, str) else ""
+                return table.setdefault(s, len(table)) if s else -1
+
+            return self.decode_column(ids, code, np.int32, -1)
+
+        decl_codes: Dict[str, int] = {}
+        decl_id = codes(self.column("nombreDeclarante"), str.strip, decl_codes)
+        decl_inst_codes: Dict[str, int] = {}
+        decl_inst_id = codes(self.column("institucionDeclarante"), normalize_text, decl_inst_codes)
+        has_toma = self.decode_column(self.column("fechaTomaPosesion"), bool, bool, False)
+
+        ent_codes: Dict[str, int] = {}
+        lower = lambda s: s.strip().lower()  # noqa: E731
+        ente_id = codes(self.column("nombreEntePublico"), lower, ent_codes)
+        inst_id = codes(self.column("contrato", "institucionCompradora"), lower, ent_codes)
+        nivel_codes: Dict[str, int] = {}
+        nivel_id = codes(self.column("nivelOrdenGobierno"), lower, nivel_codes)
+        sector_codes: Dict[str, int] = {}
+        sector_id = codes(self.column("sectorS1", "valor"), lower, sector_codes)
+
+        ing_vals = np.empty((self.n, len(INGRESOS_KEYS)), dtype=np.float64)
+        for j, key in enumerate(INGRESOS_KEYS):
+            ing_vals[:, j] = self.decode_column(
+                self.column("ingresos", key),
+                lambda v: np.nan if safe_number(v) is None else safe_number(v),
+                np.float64,
+                np.nan,
+            )
+
+        hist_codes: Dict[Any, int] = {}
+        hist_id = self.decode_column(
+            self.column("historialIngresos"), lambda v: hist_code(v, hist_codes), np.int32, -1
+        )
+
+        return ColumnStore.assemble(
+            start, decl_id, list(decl_codes), decl_inst_id, list(decl_inst_codes),
+            has_toma, self.numeric("monto"), fechas,
+            ente_id, inst_id, list(ent_codes), nivel_id, list(nivel_codes),
+            sector_id, list(sector_codes), ing_vals, hist_id, list(hist_codes),
+        )
+
+
+class BinaryRecords(Sequence):
+    """Secuencia de registros que decodifica cada dict al accederlo."""
+
+    def __init__(self, ds: BinaryDataset):
+        self._ds = ds
+
+    def __len__(self) -> int:
+        return self._ds.n
+
+    def __getitem__(self, i: Any) -> Any:
+        if isinstance(i, slice):
+            return [self._ds.record(k) for k in range(*i.indices(self._ds.n))]
+        if i < 0:
+            i += self._ds.n
+        if not 0 <= i < self._ds.n:
+            raise IndexError(i)
+        return self._ds.record(i)
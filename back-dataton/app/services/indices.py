@@ -0,0 +1,268 @@
+# app/services/indices.py
+"""
+Índices en memoria construidos una vez por versión del dataset.
+"""
+import heapq
+import logging
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+import numpy as np
+
+from app.services.texto import fold_accents, normalize_text
+from app.services.columnar import ColumnStore
+
+logger = logging.getLogger("uvicorn.error")
+
+BANNER = "🟣[INDICES]"
+
+
+class NameIndex:
+    """
+    Índice hash: nombre normalizado (normalize_text) -> offsets de registros.
+
+    Los offsets de todos los nombres viven en un solo arreglo agrupado por
+    nombre; el dict sólo guarda dónde empieza cada grupo. La búsqueda por
+    nombre cuesta O(coincidencias) en lugar de O(dataset).
+    """
+
+    def __init__(self, slots: Dict[str, int], starts: np.ndarray, rows: np.ndarray, build_ms: float):
+        self._slots = slots
+        self._starts = starts
+        self._rows = rows
+        self.build_ms = build_ms
+        self.total_postings = len(rows)
+
+    @classmethod
+    def build(cls, cols: ColumnStore) -> "NameIndex":
+        start = time.perf_counter()
+        # Se normaliza una vez por nombre distinto, no por registro
+        slots: Dict[str, int] = {}
+        decl_to_slot = np.fromiter(
+            (slots.setdefault(normalize_text(n), len(slots)) for n in cols.decl_names),
+            dtype=np.int64,
+            count=len(cols.decl_names),
+        )
+        rows = np.flatnonzero(cols.decl_id >= 0)
+        keys = decl_to_slot[cols.decl_id[rows]]
+        order = np.argsort(keys, kind="stable")
+        starts = np.searchsorted(keys[order], np.arange(len(slots) + 1))
+
+        build_ms = (time.perf_counter() - start) * 1000
+        idx = cls(slots, starts, rows[order], build_ms)
+        logger.info(
+            f"{BANNER} índice de nombres: {len(idx)} nombres, "
+            f"{idx.total_postings} registros, t={build_ms:.1f}ms"
+        )
+        return idx
+
+    def lookup(self, nombre: str) -> List[int]:
+        slot = self._slots.get(normalize_text(nombre))
+        if slot is None:
+            return []
+        return self._rows[self._starts[slot]:self._starts[slot + 1]].tolist()
+
+    def lookup_many(self, nombres: Iterable[str]) -> Dict[str, List[int]]:
+        """
+        Offsets de varios nombres en una pasada, agrupados por nombre
+        normalizado (las variantes de un mismo nombre comparten grupo).
+        """
+        out: Dict[str, List[int]] = {}
+        for nombre in nombres:
+            key = normalize_text(nombre)
+            if key in out:
+                continue
+            slot = self._slots.get(key)
+            out[key] = (
+                [] if slot is None
+                else self._rows[self._starts[slot]:self._starts[slot + 1]].tolist()
+            )
+        return out
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+# ───────────────────────── Autocompletado ─────────────────────────
+def suggest_key(s: Any) -> str:
+    """Clave de búsqueda: normalize_text + sin acentos."""
+    return fold_accents(normalize_text(s))
+
+
+def _trigrams(s: str) -> Set[str]:
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class SuggestIndex:
+    """
+    Índice de autocompletado sobre declarantes únicos con fechaTomaPosesion.
+
+    Los declarantes se numeran por orden global (más contratos primero y,
+    en empate, alfabético), de modo que toda lista de postings ordenada por
+    id ya está ordenada por relevancia secundaria. Una búsqueda devuelve
+    los mejores K en tres niveles:
+
+      0. el nombre completo empieza con el texto
+      1. alguna palabra del nombre empieza con el texto
+      2. el texto aparece en cualquier otra posición
+
+    Los prefijos cortos (los más frecuentes al teclear) tienen su top-K
+    precalculado, igual que las subcadenas de 1-2 caracteres; el resto se
+    resuelve con búsqueda binaria sobre claves y palabras ordenadas y con
+    postings de trigramas.
+    """
+
+    MAX_LIMIT = 100
+    SHORT_PREFIX = 3
+
+    def __init__(self, names: List[str], keys: List[str], rank_by_volume: bool = True):
+        self.names = names
+        self.keys = keys
+        self.rank_by_volume = rank_by_volume
+        self.build_ms = 0.0
+
+        # Nivel 0: claves completas ordenadas
+        self._sorted_keys: List[Tuple[str, int]] = sorted((k, i) for i, k in enumerate(keys))
+        self._sorted_key_strs = [k for k, _ in self._sorted_keys]
+
+        # Nivel 1: palabra -> ids (ascendentes)
+        tokens: Dict[str, List[int]] = {}
+        for i, k in enumerate(keys):
+            for tok in set(k.split()):
+                tokens.setdefault(tok, []).append(i)
+        self._tokens = sorted(tokens)
+        self._token_postings = [array("i", tokens[t]) for t in self._tokens]
+
+        # Top-K precalculado para prefijos cortos
+        self._short_prefix: Dict[str, array] = {}
+        self._short_token_prefix: Dict[str, array] = {}
+        for i, k in enumerate(keys):
+            for n in range(1, min(self.SHORT_PREFIX, len(k)) + 1):
+                self._append_capped(self._short_prefix, k[:n], i)
+            seen_p: Set[str] = set()
+            for tok in k.split():
+                for n in range(1, min(self.SHORT_PREFIX, len(tok)) + 1):
+                    p = tok[:n]
+                    if p not in seen_p:
+                        seen_p.add(p)
+                        self._append_capped(self._short_token_prefix, p, i)
+
+        # Nivel 2: trigramas -> ids (ascendentes)
+        grams: Dict[str, List[int]] = {}
+        for i, k in enumerate(keys):
+            for g in _trigrams(k):
+                grams.setdefault(g, []).append(i)
+        self._trigram_postings = {g: array("i", v) for g, v in grams.items()}
+
+        # Nivel 2 para textos de 1-2 caracteres: primeros ids de cada subcadena.
+        # Los niveles 0 y 1 aportan menos de `limit` ids antes de llegar aquí,
+        # así que 2 * MAX_LIMIT candidatos completan cualquier respuesta.
+        self._short_substring: Dict[str, array] = {}
+        for i, k in enumerate(keys):
+            for sub in {k[j:j + n] for n in (1, 2) for j in range(len(k) - n + 1)}:
+                self._append_capped(self._short_substring, sub, i, 2 * self.MAX_LIMIT)
+
+    def _append_capped(
+        self, table: Dict[str, array], prefix: str, i: int, cap: int = MAX_LIMIT
+    ) -> None:
+        lst = table.get(prefix)
+        if lst is None:
+            table[prefix] = array("i", [i])
+        elif len(lst) < cap:
+            lst.append(i)
+
+    @classmethod
+    def build(cls, cols: ColumnStore, rank_by_volume: bool = True) -> "SuggestIndex":
+        start = time.perf_counter()
+        # Registros con toma, por declarante (nombre sin espacios extremos)
+        rows = np.flatnonzero(cols.has_toma & (cols.decl_id >= 0))
+        ids = cols.decl_id[rows]
+        counts = np.bincount(ids, minlength=len(cols.decl_names))
+        decls, first = np.unique(ids, return_index=True)
+        decls = decls[np.argsort(first, kind="stable")]  # orden de primera aparición
+
+        variants: Dict[str, Counter] = {}
+        volume: Counter = Counter()
+        for decl, n in zip(decls.tolist(), counts[decls].tolist()):
+            raw = cols.decl_names[decl]
+            key = suggest_key(raw)
+            if not key:
+                continue
+            variants.setdefault(key, Counter())[" ".join(raw.split())] += n
+            volume[key] += n
+
+        if rank_by_volume:
+            order = sorted(variants, key=lambda k: (-volume[k], k))
+        else:
+            order = sorted(variants)
+        # Se muestra la variante de escritura más frecuente
+        names = [variants[k].most_common(1)[0][0] for k in order]
+
+        idx = cls(names, order, rank_by_volume)
+        idx.build_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            f"{BANNER} índice de autocompletado: {len(idx)} declarantes, "
+            f"{len(idx._tokens)} palabras, {len(idx._trigram_postings)} trigramas, "
+            f"t={idx.build_ms:.1f}ms"
+        )
+        return idx
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    # ───── Búsqueda ─────
+    def search(self, query: str, limit: int = 20) -> List[str]:
+        q = suggest_key(query)
+        limit = max(1, min(limit, self.MAX_LIMIT))
+        if not q:
+            return []
+
+        out: List[int] = []
+        seen: Set[int] = set()
+
+        def take(ids: Iterable[int]) -> bool:
+            for i in ids:
+                if i in seen:
+                    continue
+                seen.add(i)
+                out.append(i)
+                if len(out) >= limit:
+                    return True
+            return False
+
+        if not take(self._prefix_ids(q, limit)):
+            if not take(self._word_prefix_ids(q)):
+                take(self._substring_ids(q))
+
+        return [self.names[i] for i in out]
+
+    def _prefix_ids(self, q: str, limit: int) -> Iterable[int]:
+        if len(q) <= self.SHORT_PREFIX:
+            return self._short_prefix.get(q, ())
+        lo = bisect_left(self._sorted_key_strs, q)
+        hi = bisect_left(self._sorted_key_strs, q + "\uffff", lo)
+        return heapq.nsmallest(limit, (i for _, i in self._sorted_keys[lo:hi]))
+
+    def _word_prefix_ids(self, q: str) -> Iterator[int]:
+        if " " in q:
+            # Varias palabras: basta con que el texto empiece en un límite de palabra
+            needle = " " + q
+            return (i for i in self._substring_ids(q) if needle in " " + self.keys[i])
+        if len(q) <= self.SHORT_PREFIX:
+            return iter(self._short_token_prefix.get(q, ()))
+        lo = bisect_left(self._tokens, q)
+        hi = bisect_left(self._tokens, q + "\uffff", lo)
+        return heapq.merge(*self._token_postings[lo:hi])
+
+    def _substring_ids(self, q: str) -> Iterator[int]:
+        keys = self.keys
+        if len(q) < 3:
+            return iter(self._short_substring.get(q, ()))
+        postings = [self._trigram_postings.get(g) for g in _trigrams(q)]
+        if any(p is None for p in postings):
+            return iter(())
+        smallest = min(postings, key=len)
+        return (i for i in smallest if q in keys[i])
@@ -0,0 +1,82 @@
+# app/services/ingresos.py
+"""
+Normalización de los ingresos declarados que trae cada registro del dataset.
+"""
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+INGRESOS_KEYS = [
+    "remuneracionMensualCargoPublico",
+    "remuneracionAnualCargoPublico",
+    "ingresoMensualNetoDeclarante",
+    "ingresoAnualNetoDeclarante",
+    "totalIngresosMensualesNetos",
+    "totalIngresosAnualesNetos",
+    "actividadEmpresarial",
+    "actividadFinanciera",
+    "serviciosProfesionales",
+    "otrosIngresos",
+    "enajenacionBienes",
+]
+
+
+def safe_number(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        v = value.strip()
+        if not v:
+            return None
+        try:
+            v = v.replace(",", "")
+            return float(v)
+        except Exception:
+            return None
+    return None
+
+
+def normalize_ingresos_dict(raw: Any) -> Dict[str, Optional[float]]:
+    """
+    Normaliza el campo d['ingresos'] del dataset a:
+      {
+        clave: float | None
+      }
+
+    No rompe si el campo no existe o viene raro.
+    """
+    if not isinstance(raw, dict):
+        return {}
+
+    out: Dict[str, Optional[float]] = {}
+    has_any = False
+    for key in INGRESOS_KEYS:
+        val = safe_number(raw.get(key))
+        out[key] = val
+        if val is not None:
+            has_any = True
+
+    return out if has_any else {}
+
+
+def normalize_historial(raw: Any) -> Tuple[Tuple[int, float], ...]:
+    """
+    Normaliza d['historialIngresos'] ([[fecha, ingreso anual], ...], ver
+    enriquecer_dataset_ingresos.apply_history) a puntos
+    (ordinal de la fecha, ingreso). Descarta los puntos mal formados.
+    """
+    if not isinstance(raw, list):
+        return ()
+    out = []
+    for p in raw:
+        if not isinstance(p, list) or len(p) != 2 or not isinstance(p[0], str):
+            continue
+        valor = safe_number(p[1])
+        if valor is None:
+            continue
+        try:
+            out.append((date.fromisoformat(p[0][:10]).toordinal(), valor))
+        except ValueError:
+            continue
+    return tuple(out)
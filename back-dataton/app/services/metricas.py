@@ -0,0 +1,272 @@
+# app/services/metricas.py
+"""
+Métricas del proceso en formato de texto de Prometheus (/metrics).
+
+Implementación mínima sin dependencias: contadores, gauges e histogramas
+de cubetas fijas guardados en dicts por combinación de etiquetas. Un
+registro cuesta una búsqueda binaria y unas sumas bajo un lock, así que
+se puede llamar en cada petición.
+
+Cada worker de uvicorn tiene sus propias métricas: Prometheus debe
+consultar cada proceso (o agregarlas con la etiqueta de instancia).
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+# Cubetas de latencia (segundos) y de tamaño de respuesta (bytes)
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+LOAD_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def items(self) -> List[Tuple[Labels, float]]:
+        """Copia de (etiquetas, valor) tomada bajo el lock."""
+        with self._lock:
+            return list(self._values.items())
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in self.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in items]
+
+
+class GaugeFunc(_Metric):
+    """Gauge calculado al momento de exponer las métricas."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        fn: Callable[[], Iterable[Tuple[Labels, float]]],
+        labels: Sequence[str] = (),
+    ):
+        super().__init__(name, help, labels)
+        self._fn = fn
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, k)} {_num(v)}" for k, v in self._fn()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str] = ()
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # Por etiquetas: [conteo por cubeta..., +Inf], suma
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(labels)
+            if counts is None:
+                counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+                self._sums[labels] = 0.0
+            counts[i] += 1
+            self._sums[labels] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(c), self._sums[k]) for k, c in self._counts.items()]
+        out = []
+        for k, counts, total in items:
+            acc = 0
+            for le, n in zip(self.buckets + (float("inf"),), counts):
+                acc += n
+                le_label = 'le="' + _num(le) + '"'
+                out.append(f"{self.name}_bucket{_labels(self.label_names, k, le_label)} {acc}")
+            out.append(f"{self.name}_sum{_labels(self.label_names, k)} {_num(total)}")
+            out.append(f"{self.name}_count{_labels(self.label_names, k)} {acc}")
+        return out
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render() -> str:
+    lines: List[str] = []
+    for m in REGISTRY:
+        samples = m.samples()
+        if samples:
+            lines.extend(m._header())
+            lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+# ───────────────────────── Métricas del timeline ─────────────────────────
+HTTP_REQUESTS = Counter(
+    "timeline_http_requests_total",
+    "Peticiones atendidas por ruta, método y código de estado.",
+    ("route", "method", "status"),
+)
+HTTP_LATENCY = Histogram(
+    "timeline_http_request_duration_seconds",
+    "Tiempo de atención por ruta (hasta que el handler devuelve la respuesta).",
+    LATENCY_BUCKETS,
+    ("route",),
+)
+HTTP_SIZE = Histogram(
+    "timeline_http_response_size_bytes",
+    "Tamaño del cuerpo de la respuesta por ruta.",
+    SIZE_BUCKETS,
+    ("route",),
+)
+
+DATASET_LOADS = Counter(
+    "timeline_dataset_loads_total",
+    "Revisiones del dataset con archivo modificado, por resultado (ok, sin_cambios, error).",
+    ("backend", "result"),
+)
+DATASET_LOAD_SECONDS = Histogram(
+    "timeline_dataset_load_duration_seconds",
+    "Duración de cada carga o recarga publicada del dataset.",
+    LOAD_BUCKETS,
+    ("backend",),
+)
+DATASET_RECORDS = Gauge("timeline_dataset_records", "Registros en el snapshot vigente.")
+DATASET_VERSION = Gauge("timeline_dataset_version", "Versión del snapshot vigente.")
+DATASET_LOADED_AT = Gauge(
+    "timeline_dataset_loaded_timestamp_seconds", "Momento en que se publicó el snapshot vigente."
+)
+DATASET_BUILD_SECONDS = Gauge(
+    "timeline_dataset_build_seconds",
+    "Tiempo de construcción de cada estructura derivada del snapshot vigente.",
+    ("structure",),
+)
+
+CACHE_REQUESTS = Counter(
+    "timeline_cache_requests_total",
+    "Consultas a cachés internas por resultado (hit/miss).",
+    ("cache", "result"),
+)
+SINGLE_FLIGHT = Counter(
+    "timeline_singleflight_total",
+    "Cálculos pesados por resultado: ejecutada (corrió) o compartida (esperó a uno en curso).",
+    ("name", "result"),
+)
+RESPONSE_CACHE_BYTES = Gauge(
+    "timeline_response_cache_bytes",
+    "Bytes de respuestas serializadas en caché (sin comprimir).",
+    ("cache",),
+)
+
+
+def _hit_ratios() -> Iterable[Tuple[Labels, float]]:
+    # Una sola copia: hits y misses de cada caché son del mismo instante
+    conteos = dict(CACHE_REQUESTS.items())
+    for cache in sorted({k[0] for k in conteos}):
+        hits = conteos.get((cache, "hit"), 0.0)
+        total = hits + conteos.get((cache, "miss"), 0.0)
+        if total:
+            yield (cache,), hits / total
+
+
+CACHE_HIT_RATIO = GaugeFunc(
+    "timeline_cache_hit_ratio", "Proporción de hits por caché desde el arranque.", _hit_ratios, ("cache",)
+)
+
+
+# ───────────────────────── Registro ─────────────────────────
+def observe_request(
+    route: str, method: str, status: int, seconds: float, size: Optional[int]
+) -> None:
+    HTTP_REQUESTS.inc(route, method, str(status))
+    HTTP_LATENCY.observe(seconds, route)
+    if size is not None:
+        HTTP_SIZE.observe(size, route)
+
+
+def cache_hit(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def dataset_unchanged(backend: str, error: bool = False) -> None:
+    """Revisión con archivo modificado que no publicó versión."""
+    DATASET_LOADS.inc(backend, "error" if error else "sin_cambios")
+
+
+def dataset_loaded(
+    backend: str, seconds: float, records: int, version: int, build_ms: Dict[str, float]
+) -> None:
+    DATASET_LOADS.inc(backend, "ok")
+    DATASET_LOAD_SECONDS.observe(seconds, backend)
+    DATASET_RECORDS.set(records)
+    DATASET_VERSION.set(version)
+    DATASET_LOADED_AT.set(time.time())
+    for structure, ms in build_ms.items():
+        DATASET_BUILD_SECONDS.set(ms / 1000, structure)
@@ -0,0 +1,82 @@
+# app/services/paginacion.py
+"""
+Paginación por cursor / offset para los endpoints de listas.
+
+El cursor es opaco para el cliente: codifica la posición, el orden
+solicitado y la versión del dataset sobre la que se calculó, de modo que
+una página nunca mezcla resultados de dos versiones distintas.
+"""
+import base64
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+class CursorError(ValueError):
+    """Cursor mal formado o que no corresponde a la consulta."""
+
+
+class StaleCursorError(CursorError):
+    """El dataset cambió desde que se emitió el cursor."""
+
+
+def encode_cursor(offset: int, version: str, order: str) -> str:
+    raw = json.dumps({"o": offset, "v": version, "s": order}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, version: str, order: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        offset = int(data["o"])
+        cur_version = str(data["v"])
+        cur_order = str(data["s"])
+    except Exception as e:
+        raise CursorError(f"cursor inválido: {e}") from None
+
+    if offset < 0:
+        raise CursorError("cursor inválido: offset negativo")
+    if cur_order != order:
+        raise CursorError(
+            f"el cursor corresponde a otro orden ('{cur_order}'), no a '{order}'"
+        )
+    if cur_version != version:
+        raise StaleCursorError("el dataset cambió; reinicie la paginación")
+    return offset
+
+
+@dataclass(frozen=True)
+class Page:
+    start: int
+    stop: int
+    total: int
+    next_cursor: Optional[str]
+
+    def meta(self) -> Dict[str, Any]:
+        return {
+            "count": self.stop - self.start,
+            "total": self.total,
+            "offset": self.start,
+            "next_cursor": self.next_cursor,
+        }
+
+
+def plan_page(
+    total: int,
+    version: str,
+    order: str,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+) -> Page:
+    """
+    Calcula la rebanada [start, stop) a devolver.
+
+    Sin limit se devuelve todo desde el offset (comportamiento histórico).
+    """
+    start = decode_cursor(cursor, version, order) if cursor else offset
+    start = min(start, total)
+    stop = total if limit is None else min(total, start + limit)
+    next_cursor = encode_cursor(stop, version, order) if stop < total else None
+    return Page(start=start, stop=stop, total=total, next_cursor=next_cursor)
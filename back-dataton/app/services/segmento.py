@@ -0,0 +1,207 @@
+# app/services/segmento.py
+"""
+Segmento compartido del dataset para despliegues con varios workers.
+
+Un proceso cargador construye una sola vez todo lo que hoy cada worker
+calcula por su cuenta (columnas, índices, vistas materializadas,
+crecimiento de ingresos) y lo escribe en dos archivos, normalmente en
+/dev/shm (memoria compartida):
+
+  - <nombre>-<huella>.bin: los registros en el formato binario
+    (formato_binario), o el .bin de origen si ya venía compilado;
+  - <nombre>.seg: las estructuras derivadas serializadas con pickle
+    (protocolo 5). Los arreglos NumPy van fuera de banda, en secciones
+    alineadas del mismo archivo.
+
+Los workers abren ambos con mmap de sólo lectura: los arreglos quedan
+como vistas sobre las páginas compartidas (una sola copia en RAM para
+todos los procesos) y no se construye ningún índice al arrancar. Lo que
+no es NumPy (dicts de búsqueda por nombre, filas de las vistas) se
+deserializa en cada worker, sin recalcularlo: cada worker tiene su propia
+copia de esa parte (con 100k registros, 6.5 MB de pickle y ~0.1 s; en
+memoria, unos 15-20 MB privados por worker además de los ~60 MB del
+intérprete y las librerías, contra ~320 MB de un worker que carga el JSON).
+
+pickle.loads puede ejecutar código: un worker sólo abre un segmento que
+pertenece a su usuario y está en un directorio de su usuario que nadie
+más puede escribir (ver check_private).
+
+El cargador publica una versión nueva reemplazando el .seg con rename;
+el hilo vigilante de cada worker la detecta como cualquier otra recarga.
+"""
+import logging
+import mmap
+import os
+import pickle
+import stat
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.services.dataset_store import DatasetStore, Derivados, file_fingerprint, load_records
+from app.services.fechas import DateColumns
+from app.services.formato_binario import (
+    BinaryDataset,
+    BinaryRecords,
+    compile_dataset,
+    is_binary_dataset,
+    read_header,
+    write_sections,
+)
+from app.services.indices import SuggestIndex
+
+logger = logging.getLogger("uvicorn.error")
+
+BANNER = "🟣[SEGMENTO]"
+
+MAGIC = b"MAMUTSS1"
+FORMAT_VERSION = 4
+
+
+def check_private(path: Path, st: os.stat_result) -> None:
+    """ValueError si `path` es de otro usuario o lo pueden modificar otros."""
+    if st.st_uid != os.getuid():
+        raise ValueError(f"{path} no pertenece al usuario actual (uid {st.st_uid})")
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise ValueError(f"{path} tiene permiso de escritura para otros usuarios")
+
+
+def is_segment(path: Path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def segment_fingerprint(path: Path) -> Optional[str]:
+    """Huella del dataset publicado en el segmento (None si no hay uno válido)."""
+    if not is_segment(path):
+        return None
+    try:
+        return SharedSegment(path).fingerprint
+    except (OSError, ValueError):
+        return None
+
+
+# ───────────────────────── Escritura ─────────────────────────
+def write_segment(
+    derivados: Derivados, records_path: Path, fingerprint: str, out_path: Path,
+    suggest_by_volume: bool,
+) -> Dict[str, Any]:
+    buffers: List[pickle.PickleBuffer] = []
+    data = pickle.dumps(derivados, protocol=5, buffer_callback=buffers.append)
+    sections: List[Tuple[str, Any]] = [("pickle", data)]
+    sections += [(f"buffer.{k}", b.raw()) for k, b in enumerate(buffers)]
+    header: Dict[str, Any] = {
+        "format": FORMAT_VERSION,
+        "fingerprint": fingerprint,
+        # Relativo al .seg si está en el mismo directorio
+        "records": (
+            records_path.name if records_path.parent == out_path.parent else str(records_path)
+        ),
+        "suggest_by_volume": suggest_by_volume,
+        "buffers": len(buffers),
+    }
+    write_sections(out_path, MAGIC, header, sections)
+    return header
+
+
+def compile_segment(source: Path, out_path: Path, suggest_by_volume: bool = True) -> Dict[str, Any]:
+    """
+    Construye el segmento de `source` (JSON/NDJSON[.gz] o .bin) en
+    `out_path`. Si el origen no es binario, los registros se compilan a
+    un .bin junto al segmento, con la huella en el nombre para que los
+    workers que aún usan la versión anterior no lo vean cambiar.
+    """
+    source = Path(source).resolve()
+    out_path = Path(out_path).resolve()
+    out_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if is_binary_dataset(source):
+        records_path = source
+    else:
+        fingerprint = file_fingerprint(source)
+        stem = out_path.name.split(".", 1)[0]
+        records_path = out_path.with_name(f"{stem}-{fingerprint[:16]}.bin")
+        if not is_binary_dataset(records_path):
+            raw = load_records(source)
+            if not isinstance(raw, list):
+                raise ValueError(f"{source.name} no es una lista JSON")
+            compile_dataset(raw, records_path, fingerprint)
+            del raw
+
+    # El snapshot se arma igual que en un worker que abre el .bin
+    snap = DatasetStore(records_path, poll_interval=0, suggest_by_volume=suggest_by_volume).get()
+    derivados = Derivados(
+        columnas=snap.columnas,
+        name_index=snap.name_index,
+        suggest_index=snap.suggest_index,
+        vistas=snap.vistas,
+        crecimiento=snap.crecimiento,
+    )
+    return write_segment(derivados, records_path, snap.fingerprint, out_path, suggest_by_volume)
+
+
+# ───────────────────────── Lectura ─────────────────────────
+class SharedSegment:
+    """Segmento abierto con mmap (sólo lectura)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        check_private(self.path.parent, os.stat(self.path.parent))
+        with open(self.path, "rb") as f:
+            # Del archivo ya abierto: no puede cambiar entre la verificación y el mmap
+            check_private(self.path, os.fstat(f.fileno()))
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.header = read_header(self._mm, MAGIC, self.path)
+        if self.header.get("format") != FORMAT_VERSION:
+            raise ValueError(f"versión de segmento no soportada: {self.header.get('format')}")
+        self.fingerprint = str(self.header["fingerprint"])
+        self.records_path = self.path.parent / self.header["records"]
+
+    def _section(self, name: str) -> memoryview:
+        off, length = self.header["sections"][name]
+        return memoryview(self._mm)[off:off + length]
+
+    def derivados(self) -> Derivados:
+        """Deserializa las estructuras; los arreglos NumPy son vistas sobre el mmap."""
+        buffers = [self._section(f"buffer.{k}") for k in range(self.header["buffers"])]
+        return pickle.loads(self._section("pickle"), buffers=buffers)
+
+
+class SegmentStore(DatasetStore):
+    """DatasetStore que se adjunta a un segmento ya construido en lugar de calcularlo."""
+
+    BACKEND = "segmento"
+
+    def _load_source(
+        self,
+    ) -> Optional[Tuple[str, Sequence[Dict[str, Any]], DateColumns, Derivados]]:
+        seg = SharedSegment(self.path)
+        current = self._snapshot
+        if current is not None and seg.fingerprint == current.fingerprint:
+            return None
+
+        start = time.perf_counter()
+        ds = BinaryDataset(seg.records_path)
+        if ds.fingerprint != seg.fingerprint:
+            raise ValueError(f"{seg.records_path.name} no corresponde al segmento")
+        records = BinaryRecords(ds)
+        derivados = seg.derivados()
+        if seg.header["suggest_by_volume"] != self.suggest_by_volume:
+            # El segmento se construyó con otro orden de autocompletado
+            derivados = Derivados(
+                columnas=derivados.columnas,
+                name_index=derivados.name_index,
+                suggest_index=SuggestIndex.build(
+                    derivados.columnas, rank_by_volume=self.suggest_by_volume
+                ),
+                vistas=derivados.vistas,
+                crecimiento=derivados.crecimiento,
+            )
+        logger.info(
+            f"{BANNER} adjunto a {self.path.name} ({seg.records_path.name}), "
+            f"{seg.header['buffers']} arreglo(s) compartidos, "
+            f"t={(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return seg.fingerprint, records, ds.date_columns(), derivados
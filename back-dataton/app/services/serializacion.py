@@ -0,0 +1,204 @@
+# app/services/serializacion.py
+"""
+Serialización JSON rápida y caché de respuestas ya serializadas.
+
+Los handlers del timeline devuelven sus respuestas con FastJSONResponse:
+al recibir un Response, FastAPI no pasa el contenido por
+jsonable_encoder, que con listas grandes costaba más que el propio
+cálculo. Se usa orjson si está instalado y, si no, json de la biblioteca
+estándar con el mismo formato compacto; en ambos casos NaN e infinito se
+escriben como null (JSON no los admite).
+
+Las respuestas que sólo dependen de la versión del dataset (las listas
+paginadas, los atípicos) se guardan ya serializadas en ResponseCache y,
+bajo demanda, comprimidas con gzip o brotli según Accept-Encoding.
+"""
+import gzip
+import json
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse, Response
+
+from app.services import metricas
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+# Cuerpos más chicos no se comprimen: el encabezado de gzip no compensa
+MIN_COMPRESS_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _default(obj: Any) -> Any:
+    """Tipos que el encoder no conoce (escalares de numpy, fechas, modelos)."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return jsonable_encoder(obj)
+
+
+def _finite(obj: Any) -> Any:
+    """Copia de `obj` con NaN/infinito como None, lo mismo que escribe orjson."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return _finite(obj.tolist())
+    return obj
+
+
+def _default_finite(obj: Any) -> Any:
+    return _finite(_default(obj))
+
+
+def _std_dumps(obj: Any) -> bytes:
+    return json.dumps(
+        obj, default=_default_finite, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    try:
+        return _std_dumps(obj)
+    except ValueError:
+        # Hay NaN o infinito: se reemplazan sólo en este caso (el recorrido
+        # extra no se paga en las respuestas normales)
+        return _std_dumps(_finite(obj))
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# ───────────────────────── Respuestas serializadas ─────────────────────────
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    """True si Accept-Encoding incluye la codificación con q > 0."""
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() != coding:
+            continue
+        params = params.replace(" ", "").lower()
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+class SerializedBody:
+    """Cuerpo JSON ya serializado, con sus versiones comprimidas bajo demanda."""
+
+    __slots__ = ("raw", "_encoded", "_lock")
+
+    def __init__(self, raw: bytes):
+        self.raw = raw
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def _encode(self, coding: str) -> bytes:
+        body = self._encoded.get(coding)
+        if body is None:
+            with self._lock:
+                body = self._encoded.get(coding)
+                if body is None:
+                    if coding == "br":
+                        body = brotli.compress(self.raw, quality=BROTLI_QUALITY)
+                    else:
+                        body = gzip.compress(self.raw, compresslevel=GZIP_LEVEL, mtime=0)
+                    self._encoded[coding] = body
+        return body
+
+    def _coding(self, accept_encoding: Optional[str]) -> Optional[str]:
+        if not accept_encoding or len(self.raw) < MIN_COMPRESS_BYTES:
+            return None
+        if brotli is not None and _accepts(accept_encoding, "br"):
+            return "br"
+        if _accepts(accept_encoding, "gzip"):
+            return "gzip"
+        return None
+
+    def ready(self, accept_encoding: Optional[str]) -> bool:
+        """True si response() no tiene que comprimir nada."""
+        coding = self._coding(accept_encoding)
+        return coding is None or coding in self._encoded
+
+    def response(self, accept_encoding: Optional[str]) -> Response:
+        headers = {"Vary": "Accept-Encoding"}
+        body = self.raw
+        coding = self._coding(accept_encoding)
+        if coding is not None:
+            body = self._encode(coding)
+            headers["Content-Encoding"] = coding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """
+    LRU de cuerpos serializados, limitado en bytes, para una sola versión
+    del dataset (snapshot.version, creciente): al guardar el primer cuerpo
+    de una versión más nueva se descarta todo lo anterior. Los de una
+    versión más vieja (una petición que tomó el snapshot antes de la
+    recarga y terminó después) se devuelven sin guardarse: no pueden
+    vaciar la caché de la versión vigente.
+    """
+
+    def __init__(self, name: str, max_bytes: int):
+        self.name = name
+        self.max_bytes = max_bytes
+        self._version = -1
+        self._entries: "OrderedDict[Hashable, SerializedBody]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, version: int, key: Hashable) -> Optional[SerializedBody]:
+        with self._lock:
+            body = self._entries.get(key) if version == self._version else None
+            if body is not None:
+                self._entries.move_to_end(key)
+        metricas.cache_hit(self.name, body is not None)
+        return body
+
+    def store(self, version: int, key: Hashable, build: Callable[[], Any]) -> SerializedBody:
+        """Construye y guarda el cuerpo (fuera del lock: no bloquea otras claves)."""
+        body = SerializedBody(dumps(build()))
+        if self.max_bytes <= 0:
+            return body
+        with self._lock:
+            if version < self._version:
+                return body
+            if version > self._version:
+                self._version = version
+                self._entries.clear()
+                self._bytes = 0
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.raw)
+            self._entries[key] = body
+            # Se contabiliza el cuerpo sin comprimir; las versiones
+            # comprimidas son bastante más chicas
+            self._bytes += len(body.raw)
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.raw)
+            metricas.RESPONSE_CACHE_BYTES.set(self._bytes, self.name)
+        return body
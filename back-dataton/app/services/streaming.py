@@ -0,0 +1,76 @@
+# app/services/streaming.py
+"""
+Respuestas en streaming para listas grandes.
+
+Las filas se serializan conforme se consumen de un generador, por bloques,
+así que el primer byte sale de inmediato y la memoria pico no depende del
+tamaño del resultado.
+
+Formatos:
+  - ndjson:      una fila JSON por línea; los metadatos van en headers.
+  - json-stream: el mismo documento que la respuesta normal
+                 ({...metadatos, "items": [...]}) emitido por partes.
+"""
+from typing import Any, Dict, Iterable, Iterator
+
+from starlette.responses import StreamingResponse
+
+from app.services.serializacion import dumps
+
+STREAM_FORMATS = ("ndjson", "json-stream")
+
+# Filas por bloque enviado al socket
+_CHUNK_ROWS = 500
+
+
+def _chunks(parts: Iterable[bytes]) -> Iterator[bytes]:
+    buf = []
+    for part in parts:
+        buf.append(part)
+        if len(buf) >= _CHUNK_ROWS:
+            yield b"".join(buf)
+            buf.clear()
+    if buf:
+        yield b"".join(buf)
+
+
+def ndjson_body(rows: Iterable[Any]) -> Iterator[bytes]:
+    return _chunks(dumps(r) + b"\n" for r in rows)
+
+
+def json_array_body(meta: Dict[str, Any], rows: Iterable[Any]) -> Iterator[bytes]:
+    head = dumps(meta)[:-1]
+    head = head + (b"," if meta else b"") + b'"items":['
+
+    def parts() -> Iterator[bytes]:
+        yield head
+        first = True
+        for r in rows:
+            if first:
+                yield dumps(r)
+                first = False
+            else:
+                yield b"," + dumps(r)
+        yield b"]}"
+
+    return _chunks(parts())
+
+
+def _meta_headers(meta: Dict[str, Any]) -> Dict[str, str]:
+    headers = {}
+    if "total" in meta:
+        headers["X-Total-Count"] = str(meta["total"])
+    if meta.get("next_cursor"):
+        headers["X-Next-Cursor"] = meta["next_cursor"]
+    return headers
+
+
+def stream_rows(fmt: str, meta: Dict[str, Any], rows: Iterable[Any]) -> StreamingResponse:
+    headers = _meta_headers(meta)
+    if fmt == "ndjson":
+        return StreamingResponse(
+            ndjson_body(rows), media_type="application/x-ndjson", headers=headers
+        )
+    return StreamingResponse(
+        json_array_body(meta, rows), media_type="application/json", headers=headers
+    )
@@ -0,0 +1,31 @@
+# app/services/texto.py
+"""
+Normalización de texto compartida por el enriquecimiento del dataset y
+por la API (búsqueda por nombre, autocompletado, SQLite, crecimiento):
+ambos lados tienen que producir exactamente las mismas claves.
+"""
+import unicodedata
+from typing import Optional
+
+
+def normalize_text(s: Optional[str]) -> str:
+    if not isinstance(s, str):
+        return ""
+    # Mayúsculas, sin espacios dobles, strip
+    return " ".join(s.strip().upper().split())
+
+
+def fold_accents(s: str) -> str:
+    """Quita diacríticos: 'NÚÑEZ' -> 'NUNEZ'."""
+    if s.isascii():
+        return s
+    return "".join(
+        ch for ch in unicodedata.normalize("NFKD", s) if not unicodedata.combining(ch)
+    )
+
+
+def normalize_name(nombre: str, ap1: str, ap2: str) -> str:
+    parts = [normalize_text(nombre), normalize_text(ap1), normalize_text(ap2)]
+    # Filtra vacíos
+    parts = [p for p in parts if p]
+    return " ".join(parts)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Arranca la API con varios workers sobre un dataset en memoria compartida.
+
+  1. Un proceso cargador construye el segmento (app/services/segmento.py)
+     en TIMELINE_SHARED_DIR (por defecto /dev/shm/mamuts-timeline-<uid>,
+     con permisos 0700: los workers deserializan el segmento con pickle).
+  2. uvicorn arranca N workers con TIMELINE_DATA_PATH apuntando al
+     segmento: cada uno se adjunta a él en lugar de cargar el dataset. Los
+     registros (.bin) y los arreglos NumPy (columnas, permutaciones,
+     postings) se comparten; los dicts de búsqueda y las filas de las
+     vistas se deserializan en cada worker (ver segmento.py), así que cada
+     worker agrega esa parte, no otra copia del dataset.
+  3. Un hilo vigila el dataset de origen; si cambia, otro proceso cargador
+     publica un segmento nuevo y los workers lo recargan en caliente.
+
+Uso (desde back-dataton/):
+    python -m app.servir [app/dataset.json|.ndjson[.gz]|.bin] --workers 4 [--port 8000]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import uvicorn
+
+from app.services.dataset_store import file_fingerprint
+from app.services.formato_binario import BinaryDataset, is_binary_dataset
+from app.services.segmento import SharedSegment, compile_segment, segment_fingerprint
+
+SEGMENT_NAME = "dataset.seg"
+
+# Segundos que se conserva un .bin después de dejar de ser el vigente: un
+# worker que leyó el .seg anterior todavía puede estar por abrirlo
+RETIRE_GRACE = 30.0
+
+# .bin reemplazados -> momento (monotonic) en que dejaron de ser el vigente
+_retirados: Dict[Path, float] = {}
+
+
+def _shared_dir() -> Path:
+    env = os.getenv("TIMELINE_SHARED_DIR")
+    if env:
+        return Path(env)
+    base = Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+    return base / f"mamuts-timeline-{os.getuid()}"
+
+
+def preparar_dir(path: Path) -> None:
+    """
+    Crea el directorio del segmento sólo para el usuario actual. Si ya
+    existía debe ser suyo; se le quitan los permisos de grupo y otros.
+    """
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    st = path.stat()
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"{path} pertenece a otro usuario (uid {st.st_uid})")
+    if st.st_mode & 0o077:
+        path.chmod(0o700)
+
+
+def _source_fingerprint(source: Path) -> str:
+    if is_binary_dataset(source):
+        return BinaryDataset(source).fingerprint
+    return file_fingerprint(source)
+
+
+def _signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def construir(source: Path, seg_path: Path, suggest_by_volume: bool) -> Optional[Dict[str, Any]]:
+    """
+    Publica el segmento de `source` si el que hay es de otra versión.
+    La construcción corre en un proceso aparte: la memoria de los
+    registros y los índices intermedios se libera al terminar.
+    """
+    if segment_fingerprint(seg_path) == _source_fingerprint(source):
+        return None
+    anterior = _records_path(seg_path)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        header = pool.submit(compile_segment, source, seg_path, suggest_by_volume).result()
+    print(
+        f"Segmento publicado: {seg_path} ({header['records']}, "
+        f"{header['buffers']} arreglos) en {time.perf_counter() - start:.1f}s",
+        flush=True,
+    )
+    if anterior is not None and anterior != _records_path(seg_path):
+        _retirados.setdefault(anterior, time.monotonic())
+    limpiar(seg_path)
+    return header
+
+
+def _records_path(seg_path: Path) -> Optional[Path]:
+    try:
+        return SharedSegment(seg_path).records_path.resolve()
+    except (OSError, ValueError):
+        return None
+
+
+def limpiar(seg_path: Path, grace: float = RETIRE_GRACE) -> None:
+    """
+    Borra los .bin de versiones anteriores que dejaron de ser el vigente
+    hace más de `grace` segundos (los de un arranque anterior cuentan desde
+    que se ven por primera vez). Los workers que ya los tienen mapeados no
+    se afectan.
+    """
+    vigente = _records_path(seg_path)
+    if vigente is None:
+        return
+    now = time.monotonic()
+    stem = seg_path.name.split(".", 1)[0]
+    for old in seg_path.parent.glob(f"{stem}-*.bin"):
+        old = old.resolve()
+        if old == vigente:
+            _retirados.pop(old, None)
+            continue
+        if now - _retirados.setdefault(old, now) >= grace:
+            old.unlink(missing_ok=True)
+            del _retirados[old]
+
+
+def vigilar(
+    source: Path, seg_path: Path, suggest_by_volume: bool, interval: float, stop: threading.Event
+) -> None:
+    signature = _signature(source)
+    while not stop.wait(interval):
+        limpiar(seg_path)
+        current = _signature(source)
+        if current is None or current == signature:
+            continue
+        try:
+            construir(source, seg_path, suggest_by_volume)
+            signature = current
+        except Exception as e:
+            # Archivo a medio escribir: se reintenta en el siguiente ciclo
+            print(f"[ADVERTENCIA] no se pudo reconstruir el segmento: {e}", flush=True)
+
+
+def main():
+    base_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(description="API con varios workers y dataset compartido.")
+    parser.add_argument(
+        "dataset",
+        nargs="?",
+        type=Path,
+        default=Path(os.getenv("TIMELINE_DATA_PATH", base_dir / "dataset.json")),
+        help="Dataset de origen (JSON, NDJSON[.gz] o .bin compilado).",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--dir", type=Path, default=_shared_dir(), help="Directorio del segmento.")
+    args = parser.parse_args()
+
+    source = args.dataset.resolve()
+    if not source.exists():
+        print(f"[ERROR] No se encontró el dataset en {source}")
+        return
+    suggest_by_volume = os.getenv("TIMELINE_SUGGEST_BY_VOLUME", "1") in ("1", "true", "TRUE")
+    interval = float(os.getenv("TIMELINE_RELOAD_INTERVAL", "2"))
+    try:
+        preparar_dir(args.dir)
+    except OSError as e:
+        print(f"[ERROR] Directorio del segmento inválido: {e}")
+        return
+    seg_path = (args.dir / SEGMENT_NAME).resolve()
+
+    print(f"Usando dataset: {source}", flush=True)
+    if construir(source, seg_path, suggest_by_volume) is None:
+        print(f"Segmento vigente: {seg_path}", flush=True)
+
+    stop = threading.Event()
+    if interval > 0:
+        threading.Thread(
+            target=vigilar,
+            args=(source, seg_path, suggest_by_volume, interval, stop),
+            name="segment-loader",
+            daemon=True,
+        ).start()
+
+    # Los workers heredan el entorno
+    os.environ["TIMELINE_DATA_PATH"] = str(seg_path)
+    try:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        stop.set()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de extremo a extremo de app.main:app.
+
+Usuarios virtuales concurrentes imitan a TimelinePage.tsx:
+
+  - carga:    al abrir la página, padrón completo (/declarantes) y los
+              paneles de riesgo (/declarantes-cruce-toma y
+              /declarantes-conflicto) en paralelo;
+  - busqueda: se teclea un nombre; /suggest sólo sale cuando el usuario
+              deja de teclear 250 ms (debounce del front) y el texto
+              tiene al menos 2 caracteres; después se abre la ficha con
+              /by-nombre;
+  - panel:    se reordena el panel de cruce (sort_by) y se recarga el de
+              conflicto.
+
+La mezcla de acciones es configurable (--mezcla busqueda=8,panel=1,carga=1).
+La app se puede probar en proceso (ASGI, sin red), contra una URL o
+levantando uvicorn local con N workers. Al final se imprimen, por ruta,
+throughput, p50/p95/p99 e histograma de latencias, y se guardan en JSON.
+
+Uso (desde back-dataton/):
+    python -m bench.carga --usuarios 50 --duracion 30
+    python -m bench.carga --uvicorn 4 --datos bench/datos/dataset-100k-s7.bin
+    python -m bench.carga --url http://127.0.0.1:8000 --sin-pausas
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+RESULTADOS_DIR = Path(__file__).resolve().parent / "resultados"
+
+ACCIONES = ("busqueda", "panel", "carga")
+MEZCLA_DEFAULT = "busqueda=8,panel=1,carga=1"
+
+# Debounce del input de búsqueda en el front (useDebounced(nombre, 250))
+DEBOUNCE_S = 0.25
+# Pausa media entre teclas y tiempo de lectura tras cada acción
+_TECLA_S = 0.18
+_LECTURA_S = 2.0
+
+# Límites superiores (ms) de las cubetas del histograma
+CUBETAS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+@dataclass
+class Registro:
+    """Latencias y estados por ruta (sin query string)."""
+
+    latencias: Dict[str, List[float]] = field(default_factory=dict)
+    estados: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    bytes: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, ruta: str, ms: float, estado: str, size: int) -> None:
+        self.latencias.setdefault(ruta, []).append(ms)
+        por_estado = self.estados.setdefault(ruta, {})
+        por_estado[estado] = por_estado.get(estado, 0) + 1
+        self.bytes[ruta] = self.bytes.get(ruta, 0) + size
+
+
+class Cliente:
+    """Hace peticiones y las registra sólo dentro de la ventana de medición."""
+
+    def __init__(self, http: httpx.AsyncClient, registro: Registro, inicio: float):
+        self.http = http
+        self.registro = registro
+        self.inicio = inicio
+
+    async def get(self, ruta: str, params: Optional[Dict[str, Any]] = None) -> None:
+        # El cuerpo se lee completo pero no se parsea: el costo del cliente
+        # no debe inflar las latencias medidas
+        t0 = time.perf_counter()
+        try:
+            resp = await self.http.get(ruta, params=params)
+            estado, size = str(resp.status_code), len(resp.content)
+        except httpx.HTTPError as e:
+            estado, size = type(e).__name__, 0
+        if t0 >= self.inicio:
+            self.registro.add(ruta, (time.perf_counter() - t0) * 1000, estado, size)
+
+
+# ───────────────────────── Comportamiento ─────────────────────────
+class Usuario:
+    def __init__(self, cliente: Cliente, nombres: List[str], rng: random.Random, pausas: float):
+        self.c = cliente
+        self.nombres = nombres
+        self.rng = rng
+        self.pausas = pausas
+
+    async def pausa(self, media: float) -> None:
+        if self.pausas > 0:
+            await asyncio.sleep(self.rng.expovariate(1 / (media * self.pausas)))
+
+    async def carga(self) -> None:
+        await asyncio.gather(
+            self.c.get("/timeline/declarantes"),
+            self.c.get("/timeline/declarantes-cruce-toma", {"sort_by": "monto", "sort_dir": "desc"}),
+            self.c.get("/timeline/declarantes-conflicto", {"sort_by": "monto", "sort_dir": "desc"}),
+        )
+
+    async def busqueda(self) -> None:
+        nombre = self.rng.choice(self.nombres)
+        texto = nombre[: self.rng.randint(3, min(len(nombre), 14))]
+        escrito = ""
+        for ch in texto:
+            escrito += ch
+            espera = self.rng.expovariate(1 / _TECLA_S)
+            # El debounce dispara /suggest sólo si el usuario se detiene
+            if espera >= DEBOUNCE_S and len(escrito.strip()) >= 2:
+                await self.c.get("/timeline/suggest", {"query": escrito})
+            if self.pausas > 0:
+                await asyncio.sleep(espera * self.pausas)
+        if len(escrito.strip()) >= 2:
+            await self.c.get("/timeline/suggest", {"query": escrito})
+        await self.pausa(0.5)
+        await self.c.get("/timeline/by-nombre", {"nombre": nombre})
+
+    async def panel(self) -> None:
+        sort_by = self.rng.choice(["monto", "contratos", "nombre"])
+        await self.c.get("/timeline/declarantes-cruce-toma", {"sort_by": sort_by, "sort_dir": "desc"})
+        await self.c.get("/timeline/declarantes-conflicto", {"sort_by": "monto", "sort_dir": "desc"})
+
+    async def correr(self, fin: float, mezcla: List[Tuple[str, float]]) -> None:
+        acciones, pesos = zip(*mezcla)
+        await self.carga()
+        while time.perf_counter() < fin:
+            accion = self.rng.choices(acciones, pesos)[0]
+            await getattr(self, accion)()
+            await self.pausa(_LECTURA_S)
+
+
+# ───────────────────────── Reporte ─────────────────────────
+def resumen(registro: Registro, segundos: float) -> Dict[str, Any]:
+    rutas = {}
+    for ruta, lat in sorted(registro.latencias.items()):
+        ms = np.array(lat)
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99]).tolist()
+        conteo = np.histogram(ms, bins=[0, *CUBETAS_MS, np.inf])[0].tolist()
+        rutas[ruta] = {
+            "peticiones": len(ms),
+            "rps": len(ms) / segundos,
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+            "max_ms": float(ms.max()),
+            "media_ms": float(ms.mean()),
+            "estados": registro.estados[ruta],
+            "bytes_medio": registro.bytes[ruta] / len(ms),
+            "histograma": {
+                "limites_ms": CUBETAS_MS + ["inf"],
+                "conteos": conteo,
+            },
+        }
+    total = sum(r["peticiones"] for r in rutas.values())
+    return {"segundos": segundos, "peticiones": total, "rps": total / segundos, "rutas": rutas}
+
+
+def imprimir(res: Dict[str, Any]) -> None:
+    print(f"\n{res['peticiones']} peticiones en {res['segundos']:.1f}s ({res['rps']:.1f} req/s)")
+    print(f"{'ruta':<36}{'n':>7}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  estados")
+    for ruta, r in res["rutas"].items():
+        print(
+            f"{ruta:<36}{r['peticiones']:>7}{r['rps']:>9.1f}{r['p50_ms']:>9.1f}"
+            f"{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}  {r['estados']}"
+        )
+    for ruta, r in res["rutas"].items():
+        print(f"\n{ruta} (ms)")
+        conteos = r["histograma"]["conteos"]
+        mayor = max(conteos) or 1
+        limites = ["≤" + str(x) for x in CUBETAS_MS] + [">" + str(CUBETAS_MS[-1])]
+        for lim, n in zip(limites, conteos):
+            if n:
+                print(f"  {lim:>7} {n:>7} {'#' * max(1, round(40 * n / mayor))}")
+
+
+# ───────────────────────── Ejecución ─────────────────────────
+def parse_mezcla(s: str) -> List[Tuple[str, float]]:
+    mezcla = []
+    for parte in s.split(","):
+        accion, _, peso = parte.partition("=")
+        accion = accion.strip()
+        if accion not in ACCIONES:
+            raise SystemExit(f"acción desconocida en --mezcla: {accion} (usa {', '.join(ACCIONES)})")
+        mezcla.append((accion, float(peso or 1)))
+    return mezcla
+
+
+async def _nombres(http: httpx.AsyncClient, n: int, rng: random.Random) -> List[str]:
+    resp = await http.get("/timeline/declarantes", params={"with_toma": "true"})
+    resp.raise_for_status()
+    items = resp.json()["items"] or ["SIN NOMBRES"]
+    return rng.sample(items, min(n, len(items)))
+
+
+async def correr(args: argparse.Namespace, base_url: str, app: Any = None) -> Dict[str, Any]:
+    transport = httpx.ASGITransport(app=app) if app is not None else None
+    limits = httpx.Limits(max_connections=args.usuarios, max_keepalive_connections=args.usuarios)
+    rng = random.Random(args.semilla)
+    async with httpx.AsyncClient(
+        base_url=base_url, transport=transport, limits=limits, timeout=args.timeout
+    ) as http:
+        nombres = await _nombres(http, 500, rng)
+        registro = Registro()
+        ahora = time.perf_counter()
+        inicio = ahora + args.calentamiento
+        fin = inicio + args.duracion
+        cliente = Cliente(http, registro, inicio)
+        pausas = 0.0 if args.sin_pausas else args.escala_pausas
+        mezcla = parse_mezcla(args.mezcla)
+        usuarios = [
+            Usuario(cliente, nombres, random.Random(rng.random()), pausas)
+            for _ in range(args.usuarios)
+        ]
+        await asyncio.gather(*(u.correr(fin, mezcla) for u in usuarios))
+        segundos = time.perf_counter() - inicio
+    return resumen(registro, segundos)
+
+
+def _levantar_uvicorn(workers: int, port: int, datos: Optional[Path]) -> subprocess.Popen:
+    env = dict(os.environ)
+    if datos is not None:
+        env["TIMELINE_DATA_PATH"] = str(datos.resolve())
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+    ]
+    proc = subprocess.Popen(cmd, env=env)
+    url = f"http://127.0.0.1:{port}/"
+    limite = time.monotonic() + 600
+    while time.monotonic() < limite:
+        if proc.poll() is not None:
+            raise SystemExit(f"uvicorn terminó con código {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                # El dataset se carga al arrancar cada worker (lifespan)
+                httpx.get(url + "timeline/suggest", params={"query": "a"}, timeout=600)
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    proc.terminate()
+    raise SystemExit("uvicorn no respondió a tiempo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga con tráfico tipo TimelinePage.")
+    destino = parser.add_mutually_exclusive_group()
+    destino.add_argument("--url", help="Servidor ya levantado (p. ej. http://127.0.0.1:8000).")
+    destino.add_argument("--uvicorn", type=int, metavar="N", help="Levanta uvicorn local con N workers.")
+    parser.add_argument("--datos", type=Path, help="Dataset para la app (TIMELINE_DATA_PATH).")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--usuarios", type=int, default=20, help="Usuarios virtuales concurrentes.")
+    parser.add_argument("--duracion", type=float, default=30, help="Segundos medidos.")
+    parser.add_argument("--calentamiento", type=float, default=3, help="Segundos iniciales sin medir.")
+    parser.add_argument("--mezcla", default=MEZCLA_DEFAULT, help="Pesos por acción: busqueda, panel, carga.")
+    parser.add_argument("--escala-pausas", type=float, default=1.0, help="Multiplica tecleo y lectura.")
+    parser.add_argument("--sin-pausas", action="store_true", help="Sin tiempos de tecleo ni lectura.")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--salida", type=Path, help="JSON de resultados (por defecto en bench/resultados/).")
+    args = parser.parse_args()
+
+    proc = None
+    if args.uvicorn:
+        print(f"Levantando uvicorn con {args.uvicorn} worker(s) en el puerto {args.port}...", flush=True)
+        proc = _levantar_uvicorn(args.uvicorn, args.port, args.datos)
+        base_url, app, modo = f"http://127.0.0.1:{args.port}", None, f"uvicorn:{args.uvicorn}"
+    elif args.url:
+        base_url, app, modo = args.url.rstrip("/"), None, "url"
+    else:
+        if args.datos is not None:
+            os.environ["TIMELINE_DATA_PATH"] = str(args.datos.resolve())
+        from app.main import app
+        from app.routers import timeline
+
+        # ASGITransport no ejecuta el lifespan: se carga el dataset a mano
+        timeline.start()
+        base_url, modo = "http://app", "en-proceso"
+
+    try:
+        print(
+            f"{args.usuarios} usuario(s), {args.duracion:.0f}s (+{args.calentamiento:.0f}s de calentamiento), "
+            f"mezcla {args.mezcla}, modo {modo}",
+            flush=True,
+        )
+        res = asyncio.run(correr(args, base_url, app))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        elif app is not None:
+            timeline.stop()
+
+    res.update({
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "modo": modo,
+        "datos": str(args.datos) if args.datos else None,
+        "usuarios": args.usuarios,
+        "mezcla": args.mezcla,
+        "pausas": 0.0 if args.sin_pausas else args.escala_pausas,
+    })
+    imprimir(res)
+
+    salida = args.salida or RESULTADOS_DIR / f"carga-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    with salida.open("w", encoding="utf-8") as f:
+        json.dump(res, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados: {salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Generador reproducible de datasets sintéticos con la forma de dataset.json.
+
+Misma semilla y mismo tamaño producen el mismo archivo. Los registros
+imitan lo que encuentran los endpoints en los datos reales:
+
+  - nombres con distribución sesgada (pocos nombres y apellidos muy
+    frecuentes, cola larga) y variantes de captura del mismo declarante
+    (mayúsculas, espacios extra, sin acentos);
+  - número de contratos por declarante de cola pesada;
+  - fechas en todos los formatos de app.services.fechas, más vacías e
+    inválidas;
+  - ingresos con números, textos con comas, nulos o ausentes, y
+    historialIngresos (con saltos) en una parte de los declarantes;
+  - institución compradora igual al ente del declarante en una fracción
+    de los contratos (panel de conflicto).
+
+Uso (desde back-dataton/):
+    python -m bench.generar_dataset 100k [salida.json|.ndjson] [--semilla 7]
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import time
+import unicodedata
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from app.services.fechas import DATE_FORMATS
+from app.services.ingresos import INGRESOS_KEYS
+
+DATOS_DIR = Path(__file__).resolve().parent / "datos"
+
+TAMANOS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+NOMBRES = [
+    "José", "María", "Juan", "Guadalupe", "Francisco", "Juana", "Antonio", "Margarita",
+    "Jesús", "Josefina", "Miguel", "Verónica", "Pedro", "Leticia", "Alejandro", "Rosa",
+    "Manuel", "Teresa", "Ricardo", "Patricia", "Luis", "Elizabeth", "Jorge", "Alejandra",
+    "Roberto", "Gabriela", "Fernando", "Adriana", "Sergio", "Silvia", "Carlos", "Martha",
+    "Eduardo", "Claudia", "Raúl", "Laura", "Rafael", "Sofía", "Ángel", "Lucía",
+    "Óscar", "Mónica", "Héctor", "Araceli", "Víctor", "Yolanda", "Martín", "Ramón",
+]
+APELLIDOS = [
+    "Hernández", "García", "Martínez", "López", "González", "Pérez", "Rodríguez",
+    "Sánchez", "Ramírez", "Cruz", "Flores", "Gómez", "Morales", "Vázquez", "Reyes",
+    "Jiménez", "Torres", "Díaz", "Gutiérrez", "Ruiz", "Mendoza", "Aguilar", "Ortiz",
+    "Moreno", "Castillo", "Romero", "Álvarez", "Méndez", "Chávez", "Rivera", "Juárez",
+    "Ramos", "Domínguez", "Herrera", "Medina", "Castro", "Vargas", "Guzmán", "Velázquez",
+    "Muñoz", "Rojas", "Contreras", "Salazar", "Luna", "Ortega", "Núñez", "Peña", "Ibarra",
+]
+DEPENDENCIAS = [
+    "Secretaría de Salud", "Secretaría de Educación Pública", "Secretaría de Finanzas",
+    "Secretaría de Obras Públicas", "Secretaría de Seguridad", "Instituto del Deporte",
+    "Comisión del Agua", "Instituto de Vivienda", "Fiscalía General", "Tribunal Superior",
+    "Instituto Electoral", "Sistema DIF", "Secretaría de Movilidad", "Congreso",
+]
+LUGARES = [
+    "Federal", "Aguascalientes", "Baja California", "Campeche", "Chiapas", "Chihuahua",
+    "Coahuila", "Colima", "Durango", "Guanajuato", "Guerrero", "Hidalgo", "Jalisco",
+    "México", "Michoacán", "Morelos", "Nayarit", "Nuevo León", "Oaxaca", "Puebla",
+]
+NIVELES = ["FEDERAL", "ESTATAL", "MUNICIPAL"]
+SECTORES = ["Salud", "Educación", "Energía", "Construcción", "Servicios", "Tecnología"]
+PUESTOS = ["Director de área", "Subdirector", "Jefe de departamento", "Coordinador", "Analista"]
+PARTICIPACION = ["SOCIO", "ACCIONISTA", "ADMINISTRADOR", "REPRESENTANTE"]
+INVALIDAS = [None, "", "xx/yy", "2020-13-40", "sin fecha"]
+
+# Contratos promedio por declarante
+_CONTRATOS_POR_DECLARANTE = 3
+
+
+def _zipf_weights(n: int, s: float = 1.1) -> List[float]:
+    return [1.0 / (k + 1) ** s for k in range(n)]
+
+
+def _sin_acentos(s: str) -> str:
+    return "".join(
+        ch for ch in unicodedata.normalize("NFKD", s) if not unicodedata.combining(ch)
+    )
+
+
+class Generador:
+    """Registros sintéticos deterministas para (n, semilla)."""
+
+    def __init__(self, n: int, semilla: int = 7):
+        self.n = n
+        self.rng = random.Random(f"{semilla}:{n}")
+        self._pesos_nombre = _zipf_weights(len(NOMBRES))
+        self._pesos_apellido = _zipf_weights(len(APELLIDOS))
+        self.entes = [f"{d} de {l}" for l in LUGARES for d in DEPENDENCIAS]
+        self._pesos_ente = _zipf_weights(len(self.entes), 0.8)
+        self._pesos_formato = [4, 1, 2, 1, 2, 1][: len(DATE_FORMATS)]
+        self.declarantes = [
+            self._declarante() for _ in range(max(1, n // _CONTRATOS_POR_DECLARANTE))
+        ]
+
+    # ───── Piezas ─────
+    def _nombre(self) -> str:
+        rng = self.rng
+        nombre = rng.choices(NOMBRES, self._pesos_nombre)[0]
+        if rng.random() < 0.2:
+            nombre += " " + rng.choices(NOMBRES, self._pesos_nombre)[0]
+        ap1, ap2 = rng.choices(APELLIDOS, self._pesos_apellido, k=2)
+        return f"{nombre} {ap1} {ap2}"
+
+    def _fecha(self, inicio: date, dias: int) -> Any:
+        rng = self.rng
+        if rng.random() < 0.03:
+            return rng.choice(INVALIDAS)
+        d = inicio + timedelta(days=rng.randrange(max(dias, 1)))
+        fmt = rng.choices(DATE_FORMATS, self._pesos_formato)[0][0]
+        return d.strftime(fmt)
+
+    def _numero(self, base: float) -> Any:
+        rng = self.rng
+        v = round(base * rng.uniform(0.5, 1.5), 2)
+        r = rng.random()
+        if r < 0.1:
+            return None
+        if r < 0.25:
+            return f"{v:,.2f}"
+        if r < 0.35:
+            return str(int(v))
+        return v
+
+    def _ingresos(self, base: float) -> Dict[str, Any]:
+        rng = self.rng
+        if rng.random() < 0.4:
+            return {}
+        claves = INGRESOS_KEYS if rng.random() < 0.5 else rng.sample(INGRESOS_KEYS, 3)
+        return {k: self._numero(base / 12 if "Mensual" in k else base) for k in claves}
+
+    def _historial(self, base: float) -> List[List[Any]]:
+        rng = self.rng
+        puntos = []
+        valor = base
+        for anio in range(2018 + rng.randrange(3), 2025):
+            if rng.random() < 0.25:
+                continue
+            # Saltos súbitos ocasionales
+            valor *= rng.uniform(5, 40) if rng.random() < 0.03 else rng.uniform(0.9, 1.2)
+            fecha = date(anio, rng.randint(1, 12), rng.randint(1, 28)).isoformat()
+            puntos.append([fecha, round(valor, 2)])
+        return puntos
+
+    def _declarante(self) -> Dict[str, Any]:
+        rng = self.rng
+        nombre = self._nombre()
+        ente = rng.choices(self.entes, self._pesos_ente)[0]
+        base = rng.lognormvariate(13, 0.6)
+        return {
+            "nombre": nombre,
+            "ente": ente,
+            "nivel": rng.choice(NIVELES),
+            "puesto": rng.choice(PUESTOS),
+            "toma": self._fecha(date(2012, 1, 1), 4000) if rng.random() < 0.8 else None,
+            "base": base,
+            "historial": self._historial(base) if rng.random() < 0.2 else None,
+        }
+
+    def _variante(self, nombre: str) -> str:
+        """Otra captura del mismo nombre."""
+        r = self.rng.random()
+        if r < 0.08:
+            return nombre.upper()
+        if r < 0.11:
+            return f"  {nombre} "
+        if r < 0.13:
+            return _sin_acentos(nombre)
+        return nombre
+
+    # ───── Registros ─────
+    def _elegir_declarante(self) -> Dict[str, Any]:
+        # Cola pesada: pocos declarantes concentran muchos contratos
+        k = int(len(self.declarantes) * self.rng.random() ** 2.5)
+        return self.declarantes[k]
+
+    def registros(self) -> Iterator[Dict[str, Any]]:
+        rng = self.rng
+        for _ in range(self.n):
+            p = self._elegir_declarante()
+            if rng.random() < 0.15:
+                compradora = p["ente"] if rng.random() < 0.5 else p["ente"].upper()
+            else:
+                compradora = rng.choices(self.entes, self._pesos_ente)[0]
+            ente = p["ente"] if rng.random() < 0.9 else f"  {p['ente'].lower()}"
+            monto = self._numero(rng.lognormvariate(13, 1.5)) if rng.random() > 0.03 else "N/D"
+            rec: Dict[str, Any] = {
+                "nombreDeclarante": self._variante(p["nombre"]) if rng.random() > 0.005 else "",
+                "correoInstitucional": "declarante@gob.mx",
+                "institucionDeclarante": p["ente"],
+                "nombreEntePublico": ente,
+                "nivelOrdenGobierno": p["nivel"],
+                "puesto": p["puesto"],
+                "funcionPrincipal": "Supervisión",
+                "empresaRelacionada": f"Empresa {rng.randrange(5000)} SA de CV",
+                "tipoParticipacion": rng.choice(PARTICIPACION),
+                "porcentajeParticipacion": rng.choice([None, 5, 10, 25, 50]),
+                "remuneracion": rng.choice([None, True, False]),
+                "sectorS1": {"valor": rng.choice(SECTORES)},
+                "fechaTomaPosesion": p["toma"],
+                "contrato": {
+                    "fechaInicioContrato": self._fecha(date(2010, 1, 1), 5000),
+                    "fechaFinContrato": self._fecha(date(2012, 1, 1), 5000),
+                    "montoContrato": monto,
+                    "descripcionContrato": "Adquisición de bienes y servicios",
+                    "institucionCompradora": compradora,
+                },
+                "ingresos": self._ingresos(p["base"]),
+            }
+            if p["historial"]:
+                rec["historialIngresos"] = p["historial"]
+            yield rec
+
+
+def parse_tamano(s: str) -> int:
+    """'10k', '1m', '250000' -> número de registros."""
+    s = s.strip().lower()
+    if s in TAMANOS:
+        return TAMANOS[s]
+    mult = {"k": 1_000, "m": 1_000_000}.get(s[-1:], 1)
+    return int(float(s[:-1] if mult > 1 else s) * mult)
+
+
+def ruta_por_defecto(tamano: str, semilla: int) -> Path:
+    return DATOS_DIR / f"dataset-{tamano.lower()}-s{semilla}.json"
+
+
+def escribir(registros: Iterable[Dict[str, Any]], salida: Path) -> None:
+    """
+    Arreglo JSON compacto o NDJSON (por extensión, opcionalmente .gz),
+    registro por registro: la memoria no depende del tamaño.
+    """
+    ndjson = ".ndjson" in salida.name
+    tmp = salida.with_name(salida.name + ".tmp")
+    opener = gzip.open if salida.name.endswith(".gz") else open
+    with opener(tmp, "wt", encoding="utf-8") as f:
+        sep = "" if ndjson else "["
+        for rec in registros:
+            f.write(sep)
+            f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+            sep = "\n" if ndjson else ","
+        f.write("\n" if ndjson else ("]" if sep == "," else "[]"))
+    os.replace(tmp, salida)
+
+
+def generar(n: int, salida: Path, semilla: int = 7) -> Tuple[Path, float]:
+    """Escribe el dataset. Devuelve (ruta, segundos)."""
+    start = time.perf_counter()
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    escribir(Generador(n, semilla).registros(), salida)
+    return salida, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un dataset sintético reproducible.")
+    parser.add_argument("tamano", help="10k, 100k, 1m, 10m o un número de registros.")
+    parser.add_argument("salida", nargs="?", help="Ruta de salida (.json o .ndjson[.gz]).")
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    n = parse_tamano(args.tamano)
+    salida = Path(args.salida) if args.salida else ruta_por_defecto(args.tamano, args.semilla)
+    path, secs = generar(n, salida, args.semilla)
+    print(f"{n} registros en {secs:.1f}s: {path} ({path.stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks de los endpoints del timeline y sus helpers.
+
+Por cada tamaño (10k, 100k, 1m, 10m o un número) se genera, si no
+existe, el dataset sintético (bench/generar_dataset.py) y, en un proceso
+aparte para que la memoria de un tamaño no contamine al siguiente, se
+mide:
+
+  - la carga del dataset (tiempo y RSS pico del proceso);
+  - cada endpoint llamado directamente (sin HTTP): by-nombre, suggest,
+    declarantes-cruce-toma, declarantes, declarantes-conflicto,
+    ingresos-historial e ingresos-atipicos, con varios parámetros;
+  - los helpers _to_ts y _normalize_ingresos_dict sobre valores tomados
+    del mismo dataset.
+
+Cada caso reporta latencia (min/p50/p95/p99/max/media, en ms), memoria
+pico de Python durante una llamada (tracemalloc, en una pasada aparte
+para no distorsionar los tiempos) y tamaño de la respuesta serializada.
+El resultado se guarda en JSON; con --comparar se contrasta contra una
+corrida anterior y se marcan las regresiones.
+
+Uso (desde back-dataton/):
+    python -m bench.micro 10k 100k [--repeticiones 200] [--backend bin]
+    python -m bench.micro 10k --comparar bench/resultados/anterior.json
+
+Para 1m y 10m conviene --backend bin o sqlite: el dataset se compila una
+vez y la carga no requiere parsear JSON (10m en JSON necesita decenas de
+GB de RAM).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.services.filtros import Filtro
+from bench.generar_dataset import generar, parse_tamano, ruta_por_defecto
+
+RESULTADOS_DIR = Path(__file__).resolve().parent / "resultados"
+
+BACKENDS = ("json", "bin", "sqlite")
+
+# Llamadas de calentamiento antes de medir cada caso
+_CALENTAMIENTO = 3
+# Valores distintos que se prueban por caso (nombres, prefijos, fechas...)
+_MUESTRA = 200
+# Una regresión es un p50 mayor a este factor del anterior
+_UMBRAL_REGRESION = 1.2
+
+Caso = Tuple[str, Callable[[Any], Any], List[Any]]
+
+
+def _rss_mb() -> float:
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _stats(ns: List[int]) -> Dict[str, float]:
+    ms = np.array(ns, dtype=np.float64) / 1e6
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99]).tolist()
+    return {
+        "n": len(ms),
+        "min_ms": float(ms.min()),
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+        "max_ms": float(ms.max()),
+        "media_ms": float(ms.mean()),
+    }
+
+
+def _response_bytes(result: Any) -> Optional[int]:
+    if isinstance(result, Response):
+        return len(result.body)
+    try:
+        return len(json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    except TypeError:
+        return None
+
+
+def _sincrono(loop: asyncio.AbstractEventLoop, fn: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Los endpoints son async: cada llamada corre hasta terminar en `loop`."""
+
+    def llamar(a: Any) -> Any:
+        result = fn(a)
+        return loop.run_until_complete(result) if asyncio.iscoroutine(result) else result
+
+    return llamar
+
+
+def medir(fn: Callable[[Any], Any], args: List[Any], repeticiones: int) -> Dict[str, Any]:
+    """Tiempo por llamada (cicla sobre `args`) y memoria pico de una pasada."""
+    for a in args[:_CALENTAMIENTO]:
+        fn(a)
+
+    tiempos = []
+    for k in range(repeticiones):
+        a = args[k % len(args)]
+        t0 = time.perf_counter_ns()
+        fn(a)
+        tiempos.append(time.perf_counter_ns() - t0)
+
+    # Memoria: peor llamada sobre la muestra, en una pasada aparte
+    picos = []
+    tracemalloc.start()
+    for a in args[: min(len(args), 20)]:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn(a)
+        picos.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    out = _stats(tiempos)
+    out["memoria_pico_kb"] = max(picos) / 1024
+    out["respuesta_bytes"] = _response_bytes(fn(args[0]))
+    return out
+
+
+# ───────────────────────── Casos ─────────────────────────
+def _casos(tl: Any, snap: Any, rng: np.random.Generator) -> List[Caso]:
+    """Parámetros tomados del propio dataset (nombres reales, prefijos, fechas)."""
+    padron = snap.padron(False)
+    idx = rng.choice(len(padron), size=min(_MUESTRA, len(padron)), replace=False)
+    nombres = [padron.ordered(i, i + 1)[0] for i in sorted(idx.tolist())]
+    # Mezcla de capturas: como viene, en minúsculas y con espacios extra
+    consultas = [n if k % 3 else f"  {n.lower()} " for k, n in enumerate(nombres)]
+    prefijos = [n[: 1 + k % 6] for k, n in enumerate(nombres)]
+
+    registros = [r for n in nombres[:50] for r in snap.records_by_name(n)]
+    fechas = [
+        r.get(k) or (r.get("contrato") or {}).get(k)
+        for r in registros
+        for k in ("fechaTomaPosesion", "fechaInicioContrato", "fechaFinContrato")
+    ]
+    fechas = [f for f in fechas if f] or ["2020-01-01"]
+    ingresos = [r.get("ingresos", {}) for r in registros] or [{}]
+
+    # Petición sin Accept-Encoding: las listas se devuelven sin comprimir
+    req = Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": []})
+    lista = dict(request=req, snap=snap, limit=None, offset=0, cursor=None, formato="json")
+    pagina = dict(request=req, snap=snap, limit=100, offset=0, cursor=None, formato="json")
+    panel = dict(filtro=Filtro())
+    # Filtros de panel: nivel + sector de los propios registros, y un rango de monto
+    niveles = sorted({(r.get("nivelOrdenGobierno") or "") for r in registros} - {""}) or ["federal"]
+    sectores = sorted({(r.get("sectorS1") or {}).get("valor") or "" for r in registros} - {""})
+    filtros = [
+        Filtro.from_query(nivel=[n], sector=sectores[k % len(sectores):][:1] if sectores else None, monto_min=1e4 * k)
+        for k, n in enumerate(niveles * 3)
+    ]
+    ordenes = [(s, d) for s in ("monto", "contratos", "nombre") for d in ("desc", "asc")]
+
+    return [
+        ("by_nombre", lambda n: tl.timeline_by_nombre(nombre=n, snap=snap), consultas),
+        ("suggest", lambda q: tl.suggest(query=q, limit=20, snap=snap), prefijos),
+        (
+            "cruce_toma",
+            lambda o: tl.declarantes_con_contratos_antes_y_despues(
+                sort_by=o[0], sort_dir=o[1], **lista, **panel
+            ),
+            ordenes,
+        ),
+        (
+            "cruce_toma_pagina",
+            lambda o: tl.declarantes_con_contratos_antes_y_despues(
+                sort_by=o[0], sort_dir=o[1], **pagina, **panel
+            ),
+            ordenes,
+        ),
+        ("declarantes", lambda t: tl.list_declarantes(with_toma=t, **lista), [False, True]),
+        ("declarantes_pagina", lambda t: tl.list_declarantes(with_toma=t, **pagina), [False, True]),
+        (
+            "conflicto",
+            lambda o: tl.declarantes_conflicto(sort_by=o[0], sort_dir=o[1], **lista, **panel),
+            ordenes,
+        ),
+        (
+            "conflicto_pagina",
+            lambda o: tl.declarantes_conflicto(sort_by=o[0], sort_dir=o[1], **pagina, **panel),
+            ordenes,
+        ),
+        (
+            "conflicto_filtrado",
+            lambda f: tl.declarantes_conflicto(
+                sort_by="monto", sort_dir="desc", filtro=f, **pagina
+            ),
+            filtros,
+        ),
+        (
+            "ingresos_historial",
+            lambda n: tl.ingresos_historial(nombre=n, institucion=None, top_k=50, snap=snap),
+            consultas,
+        ),
+        ("ingresos_atipicos", lambda k: tl.ingresos_atipicos(request=req, top_k=k, snap=snap), [50, 500]),
+        ("_to_ts", tl._to_ts, fechas),
+        ("_normalize_ingresos_dict", tl._normalize_ingresos_dict, ingresos),
+    ]
+
+
+def _preparar(path: Path, backend: str) -> Path:
+    """Compila el dataset al backend pedido (una vez; se reutiliza)."""
+    if backend == "json":
+        return path
+    out = path.with_name(path.name.split(".", 1)[0] + f".{backend}")
+    if not out.exists() or out.stat().st_mtime < path.stat().st_mtime:
+        subprocess.run(
+            [sys.executable, "-m", "app.compilar_dataset", str(path), str(out)],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+    return out
+
+
+def correr_tamano(
+    path: str, repeticiones: int, semilla: int, cache_respuestas: bool = False
+) -> Dict[str, Any]:
+    """Se ejecuta en un proceso nuevo: importa la app apuntando a `path`."""
+    os.environ["TIMELINE_DATA_PATH"] = path
+    os.environ["TIMELINE_RELOAD_INTERVAL"] = "0"
+    os.environ["TIMELINE_DEBUG"] = "0"
+    # Sin la caché de respuestas serializadas se mide el cálculo completo
+    os.environ["TIMELINE_RESPONSE_CACHE_MB"] = "64" if cache_respuestas else "0"
+    from app.routers import timeline as tl
+
+    rss_inicial = _rss_mb()
+    t0 = time.perf_counter()
+    tl.start()
+    snap = tl._get_snapshot()
+    carga_ms = (time.perf_counter() - t0) * 1000
+    rss_carga = _rss_mb()
+
+    loop = asyncio.new_event_loop()
+    casos = {}
+    for nombre, fn, args in _casos(tl, snap, np.random.default_rng(semilla)):
+        casos[nombre] = medir(_sincrono(loop, fn), args, repeticiones)
+        print(
+            f"  {nombre:<26} p50={casos[nombre]['p50_ms']:9.3f}ms "
+            f"p99={casos[nombre]['p99_ms']:9.3f}ms "
+            f"mem={casos[nombre]['memoria_pico_kb']:9.1f}KB",
+            flush=True,
+        )
+
+    loop.close()
+    return {
+        "archivo": path,
+        "carga_ms": carga_ms,
+        "rss_inicial_mb": rss_inicial,
+        "rss_tras_carga_mb": rss_carga,
+        "rss_pico_mb": _rss_mb(),
+        "casos": casos,
+    }
+
+
+# ───────────────────────── Comparación ─────────────────────────
+def comparar(actual: Dict[str, Any], anterior: Dict[str, Any]) -> int:
+    """Imprime p50 actual/anterior por caso; devuelve el número de regresiones."""
+    for clave in ("backend", "semilla", "cache_respuestas"):
+        if actual.get(clave) != anterior.get(clave):
+            print(f"[ADVERTENCIA] {clave} distinto: {anterior.get(clave)} -> {actual.get(clave)}")
+    regresiones = 0
+    for tamano, res in actual["tamanos"].items():
+        prev = anterior.get("tamanos", {}).get(tamano)
+        if prev is None:
+            continue
+        print(f"\n[{tamano}] carga: {res['carga_ms']:.0f}ms (antes {prev['carga_ms']:.0f}ms)")
+        for caso, st in res["casos"].items():
+            old = prev["casos"].get(caso)
+            if not old or not old["p50_ms"]:
+                continue
+            ratio = st["p50_ms"] / old["p50_ms"]
+            marca = "  REGRESIÓN" if ratio > _UMBRAL_REGRESION else ""
+            regresiones += bool(marca)
+            print(
+                f"  {caso:<26} p50 {old['p50_ms']:9.3f} -> {st['p50_ms']:9.3f}ms "
+                f"(x{ratio:.2f}){marca}"
+            )
+    return regresiones
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de los endpoints del timeline.")
+    parser.add_argument("tamanos", nargs="+", help="10k, 100k, 1m, 10m o un número de registros.")
+    parser.add_argument("--repeticiones", type=int, default=200, help="Llamadas medidas por caso.")
+    parser.add_argument("--semilla", type=int, default=7)
+    parser.add_argument("--backend", choices=BACKENDS, default="json")
+    parser.add_argument("--salida", type=Path, help="JSON de resultados (por defecto en bench/resultados/).")
+    parser.add_argument("--comparar", type=Path, help="Resultados anteriores para detectar regresiones.")
+    parser.add_argument(
+        "--cache-respuestas",
+        action="store_true",
+        help="Mide con la caché de respuestas serializadas activa (por defecto desactivada).",
+    )
+    args = parser.parse_args()
+
+    resultado: Dict[str, Any] = {
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "backend": args.backend,
+        "semilla": args.semilla,
+        "repeticiones": args.repeticiones,
+        "cache_respuestas": args.cache_respuestas,
+        "tamanos": {},
+    }
+
+    for tamano in args.tamanos:
+        n = parse_tamano(tamano)
+        path = ruta_por_defecto(tamano, args.semilla)
+        if not path.exists():
+            print(f"Generando {n} registros en {path}...", flush=True)
+            generar(n, path, args.semilla)
+        data_path = _preparar(path, args.backend)
+        print(f"[{tamano}] {data_path}", flush=True)
+
+        # Un proceso por tamaño: RSS pico y cachés no se arrastran
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            res = pool.submit(
+                correr_tamano, str(data_path), args.repeticiones, args.semilla, args.cache_respuestas
+            ).result()
+        res["registros"] = n
+        resultado["tamanos"][tamano] = res
+        print(
+            f"  carga={res['carga_ms']:.0f}ms rss_pico={res['rss_pico_mb']:.0f}MB",
+            flush=True,
+        )
+
+    salida = args.salida or RESULTADOS_DIR / f"micro-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    with salida.open("w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados: {salida}")
+
+    if args.comparar:
+        with args.comparar.open("r", encoding="utf-8") as f:
+            regresiones = comparar(resultado, json.load(f))
+        print(f"\nRegresiones (p50 > x{_UMBRAL_REGRESION}): {regresiones}")
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
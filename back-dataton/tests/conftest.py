@@ -0,0 +1,137 @@
+# tests/conftest.py
+"""
+Datos y clientes compartidos por las pruebas (desde back-dataton/:
+python -m pytest).
+
+El dataset es sintético (bench.generar_dataset) y chico; se escribe una
+vez por sesión como JSON y se compila a SQLite. Cada prueba que usa la API
+apunta el router a su propio almacén, sin pasar por TIMELINE_DATA_PATH.
+"""
+import json
+import os
+import random
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# Antes de importar la app: sin hilo vigilante ni registros de depuración
+os.environ.setdefault("TIMELINE_RELOAD_INTERVAL", "0")
+os.environ.setdefault("TIMELINE_DEBUG", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.routers import timeline  # noqa: E402
+from app.services.almacen import open_store  # noqa: E402
+from app.services.almacen_sqlite import compile_sqlite  # noqa: E402
+from app.services.dataset_store import DatasetStore  # noqa: E402
+from app.services.serializacion import ResponseCache  # noqa: E402
+from bench.generar_dataset import Generador, escribir  # noqa: E402
+
+N_REGISTROS = 3000
+SEMILLA = 11
+
+
+@pytest.fixture(scope="session")
+def registros() -> List[Dict[str, Any]]:
+    return list(Generador(N_REGISTROS, SEMILLA).registros())
+
+
+@pytest.fixture(scope="session")
+def dataset_json(tmp_path_factory, registros) -> Path:
+    path = tmp_path_factory.mktemp("datos") / "dataset.json"
+    escribir(registros, path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def dataset_sqlite(dataset_json) -> Path:
+    path = dataset_json.with_name("dataset.sqlite")
+    compile_sqlite(DatasetStore(dataset_json, poll_interval=0).get(), path)
+    return path
+
+
+@pytest.fixture
+def cliente(monkeypatch) -> Callable[[Path], TestClient]:
+    """
+    cliente(path): TestClient con el router sobre un almacén nuevo de
+    `path` (cargado) y una caché de respuestas vacía. El almacén queda en
+    cliente.store para forzar recargas.
+    """
+
+    def hacer(path: Path) -> TestClient:
+        store = open_store(path, poll_interval=0)
+        store.reload(force=True)
+        monkeypatch.setattr(timeline, "_store", store)
+        # Las versiones empiezan en 1 en cada almacén: caché propia
+        monkeypatch.setattr(timeline, "_responses", ResponseCache("pruebas", 8 * 1024 * 1024))
+        client = TestClient(app)
+        client.store = store
+        return client
+
+    return hacer
+
+
+# ───────────────────────── Enriquecimiento S1 ─────────────────────────
+S1_NOMBRES = [
+    ("JUAN", "PÉREZ", "LÓPEZ"),
+    ("ANA", "GÓMEZ", "RUIZ"),
+    ("LUIS", "DÍAZ", "MORA"),
+    ("EVA", "SOTO", "VEGA"),
+    ("RAÚL", "LEÓN", "PAZ"),
+]
+S1_INSTITUCIONES = ["SECRETARÍA DE EDUCACIÓN PÚBLICA", "INSTITUTO MEXICANO DEL SEGURO SOCIAL"]
+
+
+def declaracion(nombre, institucion: str, fecha: str, **ingresos: float) -> Dict[str, Any]:
+    """Declaración S1 mínima con los campos que lee el enriquecimiento."""
+    return {
+        "metadata": {"actualizacion": fecha, "institucion": institucion},
+        "declaracion": {
+            "situacionPatrimonial": {
+                "datosGenerales": {
+                    "nombre": nombre[0],
+                    "primerApellido": nombre[1],
+                    "segundoApellido": nombre[2],
+                },
+                "ingresos": {k: {"valor": v} for k, v in ingresos.items()},
+            }
+        },
+    }
+
+
+@pytest.fixture
+def s1(tmp_path) -> Path:
+    """
+    Directorio con dataset.json y s1-declaraciones/ (8 archivos, algunos en
+    un subdirectorio) con declaraciones repetidas y fechas distintas.
+    """
+    rng = random.Random(3)
+    dataset = [
+        {"nombreDeclarante": " ".join(n), "institucionDeclarante": i}
+        for n in S1_NOMBRES
+        for i in S1_INSTITUCIONES
+    ]
+    (tmp_path / "dataset.json").write_text(json.dumps(dataset, ensure_ascii=False), encoding="utf-8")
+    for f in range(8):
+        decls = []
+        for _ in range(6):
+            ingresos = {
+                k: rng.randint(1, 100) * 1000.0
+                for k in ("remuneracionMensualCargoPublico", "ingresoAnualNetoDeclarante")
+                if rng.random() < 0.7
+            }
+            fecha = f"20{rng.randint(10, 23)}-0{rng.randint(1, 9)}-01T00:00:00"
+            decls.append(
+                declaracion(rng.choice(S1_NOMBRES), rng.choice(S1_INSTITUCIONES), fecha, **ingresos)
+            )
+        path = tmp_path / "s1-declaraciones" / ("sub" if f % 2 else "") / f"f{f}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(decls, ensure_ascii=False), encoding="utf-8")
+    return tmp_path
@@ -0,0 +1,75 @@
+# tests/test_backends.py
+"""El backend SQLite responde lo mismo que el dataset JSON en memoria."""
+import logging
+from typing import Any, Dict, List
+
+from app.services.almacen import open_store
+from app.services.almacen_sqlite import SqliteStore, compile_sqlite
+from app.services.dataset_store import DatasetStore
+
+LISTAS = [
+    "/timeline/declarantes?limit=50",
+    "/timeline/declarantes?with_toma=true&offset=20&limit=30",
+    "/timeline/declarantes-cruce-toma",
+    "/timeline/declarantes-cruce-toma?sort_by=nombre&sort_dir=asc&limit=25&offset=10",
+    "/timeline/declarantes-cruce-toma?nivel=federal&nivel=municipal&toma_desde=2010-01-01",
+    "/timeline/declarantes-cruce-toma?monto_min=100000&sort_by=contratos",
+    "/timeline/declarantes-conflicto",
+    "/timeline/declarantes-conflicto?sort_by=monto&sort_dir=asc&nivel=estatal",
+    "/timeline/declarantes-conflicto?toma_hasta=2018-06-30&monto_max=5000000",
+    "/timeline/ingresos-atipicos",
+    "/timeline/ingresos-atipicos?top_k=5",
+    "/timeline/suggest?query=ma",
+    "/timeline/suggest?query=GARC&limit=5",
+]
+
+
+def _nombres(registros: List[Dict[str, Any]]) -> List[str]:
+    """Algunos declarantes con historial de ingresos y otros sin él."""
+    con = [d["nombreDeclarante"] for d in registros if d.get("historialIngresos")][:4]
+    sin = [d["nombreDeclarante"] for d in registros if not d.get("historialIngresos")][:3]
+    return con + sin + ["NADIE CON ESTE NOMBRE"]
+
+
+def _respuestas(c, registros) -> Dict[str, Any]:
+    out = {}
+    for url in LISTAS:
+        r = c.get(url)
+        out[url] = (r.status_code, r.json())
+    for nombre in _nombres(registros):
+        for url in ("/timeline/by-nombre", "/timeline/ingresos-historial"):
+            r = c.get(url, params={"nombre": nombre})
+            out[f"{url}?nombre={nombre}"] = (r.status_code, r.json())
+    r = c.post("/timeline/by-nombre/batch", json={"nombres": _nombres(registros)})
+    out["batch"] = (r.status_code, r.json())
+    return out
+
+
+def test_json_y_sqlite_responden_igual(cliente, dataset_json, dataset_sqlite, registros):
+    esperado = _respuestas(cliente(dataset_json), registros)
+    c = cliente(dataset_sqlite)
+    assert isinstance(c.store, SqliteStore)
+    got = _respuestas(c, registros)
+    assert all(esperado[url][0] == 200 for url in LISTAS)
+    assert any(body["items"] for url, (_, body) in esperado.items() if "suggest" in url)
+    assert got.keys() == esperado.keys()
+    for key in esperado:
+        assert got[key] == esperado[key], key
+
+
+def test_sqlite_guarda_el_orden_de_sugerencias(dataset_json, tmp_path, caplog):
+    path = tmp_path / "alfabetico.sqlite"
+    snap = DatasetStore(dataset_json, poll_interval=0, suggest_by_volume=False).get()
+    compile_sqlite(snap, path)
+    esperado = snap.suggest("ma", 20)
+
+    with caplog.at_level(logging.WARNING, logger="uvicorn.error"):
+        store = open_store(path, poll_interval=0, suggest_by_volume=True)
+        assert store.reload(force=True)
+    assert "TIMELINE_SUGGEST_BY_VOLUME=0" in caplog.text
+    assert store.get().suggest("ma", 20) == esperado
+
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="uvicorn.error"):
+        assert open_store(path, poll_interval=0, suggest_by_volume=False).reload(force=True)
+    assert "TIMELINE_SUGGEST_BY_VOLUME" not in caplog.text
@@ -0,0 +1,55 @@
+# tests/test_batch.py
+"""POST /timeline/by-nombre/batch: deduplicación, orden y proyección de campos."""
+import pytest
+
+URL = "/timeline/by-nombre/batch"
+
+
+@pytest.fixture
+def nombres(registros):
+    vistos = []
+    for d in registros:
+        if d["nombreDeclarante"] not in vistos:
+            vistos.append(d["nombreDeclarante"])
+        if len(vistos) == 3:
+            return vistos
+
+
+def test_batch_igual_a_by_nombre(cliente, dataset_json, nombres):
+    c = cliente(dataset_json)
+    body = c.post(URL, json={"nombres": nombres}).json()
+    assert body["count"] == len(nombres)
+    assert [r["nombre"] for r in body["resultados"]] == nombres
+    for r in body["resultados"]:
+        uno = c.get("/timeline/by-nombre", params={"nombre": r["nombre"]}).json()
+        assert r["contratos"] == uno["contratos"]
+        assert r["count"] == uno["count"] > 0
+
+
+def test_batch_deduplica_en_orden(cliente, dataset_json, nombres):
+    c = cliente(dataset_json)
+    a, b, d = nombres
+    pedidos = [b, f"  {a.lower()} ", a, "nadie con este nombre", b.upper(), d]
+    body = c.post(URL, json={"nombres": pedidos}).json()
+    # Gana la primera grafía de cada nombre
+    assert [r["nombre"] for r in body["resultados"]] == [
+        b, f"  {a.lower()} ", "nadie con este nombre", d
+    ]
+    assert body["count"] == 4
+    vacio = body["resultados"][2]
+    assert vacio["count"] == 0 and vacio["contratos"] == []
+
+
+def test_batch_campos(cliente, dataset_json, nombres):
+    c = cliente(dataset_json)
+    completo = c.post(URL, json={"nombres": nombres}).json()
+    campos = sorted(completo["resultados"][0]["contratos"][0])[:2]
+    body = c.post(URL, json={"nombres": nombres, "campos": campos}).json()
+    for r, ref in zip(body["resultados"], completo["resultados"]):
+        assert r["contratos"] == [{k: f[k] for k in campos} for f in ref["contratos"]]
+
+
+def test_batch_errores(cliente, dataset_json, nombres):
+    c = cliente(dataset_json)
+    assert c.post(URL, json={"nombres": nombres, "campos": ["no_existe"]}).status_code == 400
+    assert c.post(URL, json={"nombres": []}).status_code == 422
@@ -0,0 +1,73 @@
+# tests/test_crecimiento.py
+"""Historial de ingresos: puntos del enriquecimiento y saltos por declarante."""
+import json
+
+import pytest
+
+from app.enriquecer_dataset_ingresos import historial_point
+from app.services.crecimiento import MIN_BASE
+from app.services.dataset_store import DatasetStore
+
+SEP = "SECRETARÍA DE EDUCACIÓN PÚBLICA"
+IMSS = "INSTITUTO MEXICANO DEL SEGURO SOCIAL"
+
+
+def test_historial_point():
+    assert historial_point("2020-05-01T10:00:00", {"ingresoAnualNetoDeclarante": 5.0}) == ("2020-05-01", 5.0)
+    # Prefiere ingresoAnualNetoDeclarante; si falta, el total anual
+    vals = {"ingresoAnualNetoDeclarante": None, "totalIngresosAnualesNetos": 7.0}
+    assert historial_point("2020-05-01", vals) == ("2020-05-01", 7.0)
+    assert historial_point("2020-05-01", {"remuneracionMensualCargoPublico": 1.0}) is None
+    assert historial_point("sin fecha", {"ingresoAnualNetoDeclarante": 5.0}) is None
+
+
+def _registro(nombre, institucion, serie):
+    return {
+        "nombreDeclarante": nombre,
+        "institucionDeclarante": institucion,
+        "historialIngresos": serie,
+    }
+
+
+@pytest.fixture
+def crecimiento(tmp_path):
+    base = MIN_BASE * 10
+    registros = [
+        # Dos declaraciones el mismo año: cuenta la más reciente
+        _registro("Ana Ruiz", SEP, [["2018-01-01", base], ["2019-02-01", base * 9], ["2019-12-01", base * 2]]),
+        # Homónimo en otra institución con un salto mayor (dos años: anualizado)
+        _registro("ANA RUIZ ", IMSS, [["2018-06-01", base], ["2020-06-01", base * 16]]),
+        # Base menor que MIN_BASE: no entra al ranking
+        _registro("Luis Mora", SEP, [["2018-01-01", MIN_BASE / 2], ["2019-01-01", MIN_BASE * 50]]),
+        # Caída a cero: no es un salto
+        _registro("Eva Soto", SEP, [["2018-01-01", base], ["2019-01-01", 0.0]]),
+    ]
+    path = tmp_path / "dataset.json"
+    path.write_text(json.dumps(registros, ensure_ascii=False), encoding="utf-8")
+    return DatasetStore(path, poll_interval=0).get().crecimiento
+
+
+def test_un_punto_por_anio(crecimiento):
+    serie = crecimiento.by_name("ana ruiz", SEP)["serie"]
+    assert [(p["anio"], p["fecha"]) for p in serie] == [(2018, "2018-01-01"), (2019, "2019-12-01")]
+    assert serie[1]["crecimiento"] == pytest.approx(1.0)
+
+
+def test_homonimos_por_institucion(crecimiento):
+    imss = crecimiento.by_name("Ana Ruiz", IMSS)
+    assert imss["maxCrecimiento"] == pytest.approx(3.0)  # 16x en dos años = 4x por año
+    assert imss["serie"][1]["aniosDesdeAnterior"] == 2
+    # Sin institución gana el homónimo con mejor rank
+    assert crecimiento.by_name("ana ruiz")["institucionDeclarante"] == imss["institucionDeclarante"]
+    assert crecimiento.by_name("ana ruiz", "otra") is None
+
+
+def test_ranking(crecimiento):
+    top = crecimiento.top(10)
+    assert [(r["nombreDeclarante"].strip().upper(), r["rank"]) for r in top] == [
+        ("ANA RUIZ", 1), ("ANA RUIZ", 2)
+    ]
+    for nombre in ("Luis Mora", "Eva Soto"):
+        detalle = crecimiento.by_name(nombre)
+        assert detalle["rank"] is None and detalle["maxCrecimiento"] is None
+        assert len(detalle["serie"]) == 2
@@ -0,0 +1,84 @@
+# tests/test_enriquecer_fuzzy.py
+"""Coincidencia difusa de declarantes (FuzzyIndex y match_declaraciones)."""
+from collections import Counter
+
+import pytest
+
+from app.enriquecer_dataset_ingresos import FuzzyIndex, match_declaraciones
+from conftest import declaracion
+
+SEP = "SECRETARÍA DE EDUCACIÓN PÚBLICA"
+IMSS = "INSTITUTO MEXICANO DEL SEGURO SOCIAL"
+KEYS = [
+    ("JOSÉ PÉREZ LÓPEZ", SEP),
+    ("ANA GÓMEZ RUIZ", SEP),
+    ("ANA GÓMEZ RUIZ", IMSS),
+    ("MARÍA FERNANDA DÍAZ MORA", IMSS),
+]
+
+
+@pytest.fixture
+def fuzzy() -> FuzzyIndex:
+    return FuzzyIndex(KEYS, threshold=0.9)
+
+
+@pytest.mark.parametrize(
+    "key, esperado",
+    [
+        # Sólo acentos u orden de palabras
+        (("JOSE PEREZ LOPEZ", SEP), KEYS[0]),
+        (("PÉREZ LÓPEZ JOSÉ", SEP), KEYS[0]),
+        (("ANA GOMEZ RUIZ", "SECRETARIA DE EDUCACION PUBLICA"), KEYS[1]),
+        # Variantes de escritura por encima del umbral
+        (("JOSÉ PÉREZ LÓPES", SEP), KEYS[0]),
+        (("MARIA FERNANDA DIAS MORA", IMSS), KEYS[3]),
+        # El mismo nombre en otra dependencia no cuenta
+        (("JOSÉ PÉREZ LÓPEZ", IMSS), None),
+        # Nombres distintos
+        (("JOSÉ RAMÍREZ LÓPEZ", SEP), None),
+        (("PEDRO PÁRAMO", SEP), None),
+    ],
+)
+def test_match(fuzzy, key, esperado):
+    assert fuzzy.match(key, Counter()) == esperado
+
+
+def test_ambiguas():
+    stats: Counter = Counter()
+    # Dos claves que sólo difieren en acentos
+    fuzzy = FuzzyIndex([("JOSÉ PÉREZ", SEP), ("JOSE PEREZ", SEP)])
+    assert fuzzy.match(("JOSÉ PEREZ", SEP), stats) is None
+    # Empate de puntaje entre dos candidatos
+    fuzzy = FuzzyIndex([("ANA GÓMEZ RUIZA", SEP), ("ANA GÓMEZ RUIZO", SEP)], threshold=0.8)
+    assert fuzzy.match(("ANA GÓMEZ RUIZ", SEP), stats) is None
+    assert stats["ambiguas"] == 2
+
+
+def test_bloques_grandes(monkeypatch):
+    monkeypatch.setattr(FuzzyIndex, "MAX_BLOCK", 3)
+    keys = [(f"ANA GÓMEZ {c}", SEP) for c in ("RUIZ", "SOTO", "VEGA")]
+    keys += [(f"ANA GÓMEZ {c}", IMSS) for c in ("RUIZ", "SOTO")]
+    fuzzy = FuzzyIndex(keys)
+    # El par (ana, gómez) tiene 5 claves: se usa el sub-bloque por institución
+    stats: Counter = Counter()
+    assert fuzzy.match(("ANA GÓMEZ RUIS", IMSS), stats) == ("ANA GÓMEZ RUIZ", IMSS)
+    assert stats["bloques_omitidos"] == 0
+    # Si el sub-bloque también es grande se omite (sin comparar todo)
+    keys += [(f"ANA GÓMEZ {c}", IMSS) for c in ("PAZ", "LEÓN")]
+    stats = Counter()
+    assert FuzzyIndex(keys).match(("ANA GOMEZ PAS", IMSS), stats) is None
+    assert stats["bloques_omitidos"] >= 1
+
+
+def test_match_declaraciones_cuenta_difusas(fuzzy):
+    decls = [
+        declaracion(("JOSÉ", "PÉREZ", "LÓPEZ"), SEP, "2020-01-01", ingresoAnualNetoDeclarante=1.0),
+        declaracion(("JOSE", "PEREZ", "LOPES"), SEP, "2021-01-01", ingresoAnualNetoDeclarante=2.0),
+        declaracion(("PEDRO", "PÁRAMO", ""), SEP, "2021-01-01", ingresoAnualNetoDeclarante=3.0),
+    ]
+    stats: Counter = Counter()
+    matches = match_declaraciones(decls, frozenset(KEYS), fuzzy, stats)
+    assert [(k, fecha) for k, fecha, _ in matches] == [(KEYS[0], "2020-01-01"), (KEYS[0], "2021-01-01")]
+    assert (stats["exactas"], stats["difusas"], stats["sin_coincidencia"]) == (1, 1, 1)
+    # Sin índice difuso sólo cuenta la exacta
+    assert len(match_declaraciones(decls, frozenset(KEYS))) == 1
@@ -0,0 +1,107 @@
+# tests/test_enriquecer_incremental.py
+"""Ejecuciones incrementales del enriquecimiento guiadas por el manifiesto."""
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import List
+
+import pytest
+
+import app.enriquecer_dataset_ingresos as enr
+from conftest import S1_INSTITUCIONES, S1_NOMBRES, declaracion
+
+
+def _args(**kw) -> argparse.Namespace:
+    base = dict(
+        workers=1, full=False, fuzzy=False, fuzzy_threshold=0.9,
+        format="json", shards=1, compress=False,
+    )
+    return argparse.Namespace(**dict(base, **kw))
+
+
+@pytest.fixture
+def leidos(monkeypatch) -> List[str]:
+    """Nombres de los archivos S1 que se parsean en cada ejecución."""
+    out: List[str] = []
+    original = enr.process_file
+
+    def contar(filepath, keys, fuzzy=None):
+        out.append(Path(filepath).name)
+        return original(filepath, keys, fuzzy)
+
+    monkeypatch.setattr(enr, "process_file", contar)
+    return out
+
+
+def _correr(s1: Path, **kw) -> bytes:
+    out = enr.enriquecer(
+        _args(**kw),
+        dataset_path=s1 / "dataset.json",
+        decls_root=s1 / "s1-declaraciones",
+        output_base=s1 / ("completo" if kw.get("full") else "salida"),
+        manifest_path=s1 / "manifest.json",
+    )
+    return out.read_bytes()
+
+
+def test_sin_cambios_no_se_relee_nada(s1, leidos):
+    primera = _correr(s1)
+    assert len(leidos) == 8
+    leidos.clear()
+    assert _correr(s1) == primera
+    assert leidos == []
+
+
+def test_archivo_nuevo_sin_aportes(s1, leidos):
+    primera = _correr(s1)
+    (s1 / "s1-declaraciones" / "vacio.json").write_text("[]", encoding="utf-8")
+    leidos.clear()
+    assert _correr(s1) == primera
+    assert leidos == ["vacio.json"]
+
+
+def test_incremental_igual_a_completo(s1, leidos):
+    _correr(s1)
+    decls = s1 / "s1-declaraciones"
+    # Un archivo modificado con una declaración más reciente y uno nuevo
+    (decls / "f2.json").write_text(
+        json.dumps([declaracion(S1_NOMBRES[0], S1_INSTITUCIONES[0], "2024-01-01T00:00:00",
+                                ingresoAnualNetoDeclarante=1.5e6)]),
+        encoding="utf-8",
+    )
+    (decls / "sub" / "nuevo.json").write_text(
+        json.dumps([declaracion(S1_NOMBRES[1], S1_INSTITUCIONES[1], "2009-05-01T00:00:00",
+                                remuneracionMensualCargoPublico=7.0)]),
+        encoding="utf-8",
+    )
+    leidos.clear()
+    incremental = _correr(s1)
+    assert sorted(leidos) == ["f2.json", "nuevo.json"]
+    assert incremental == _correr(s1, full=True)
+
+
+def test_solo_cambia_el_mtime(s1, leidos):
+    primera = _correr(s1)
+    path = s1 / "s1-declaraciones" / "f4.json"
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    leidos.clear()
+    assert _correr(s1) == primera
+    assert leidos == []
+
+
+def test_manifiesto_guarda_solo_ganadoras(s1):
+    _correr(s1)
+    manifest = json.loads((s1 / "manifest.json").read_text(encoding="utf-8"))
+    assert manifest["version"] == enr.MANIFEST_VERSION
+    for entry in manifest["files"].values():
+        result = enr.entry_result(entry)
+        assert result.matches == enr.winning_candidates(result.matches)
+        for _, _, vals in result.matches:
+            assert tuple(vals) == enr.INGRESOS_CAMPOS
+
+
+def test_ingresos_campos_en_orden_de_extraccion():
+    dec = declaracion(S1_NOMBRES[0], S1_INSTITUCIONES[0], "2020-01-01", ingresoAnualNetoDeclarante=1.0)
+    assert tuple(enr.extract_ingresos_from_declaracion(dec)) == enr.INGRESOS_CAMPOS
@@ -0,0 +1,80 @@
+# tests/test_enriquecer_salida.py
+"""Escritura atómica (un archivo o varios con índice) del dataset enriquecido."""
+import json
+import os
+
+import pytest
+
+import app.enriquecer_dataset_ingresos as enr
+from app.services.dataset_store import SHARDS_SUFFIX, load_records
+
+DATASET = [{"nombreDeclarante": f"DECLARANTE {i}", "ingresos": {"v": i * 1.5}} for i in range(23)]
+
+
+@pytest.mark.parametrize("fmt", enr.OUTPUT_FORMATS)
+@pytest.mark.parametrize("compress", [False, True])
+def test_un_archivo(tmp_path, fmt, compress):
+    out = enr.write_output(DATASET, tmp_path / "salida", fmt, 1, compress)
+    assert out.name == "salida." + fmt + (".gz" if compress else "")
+    assert load_records(out) == DATASET
+    assert [p.name for p in tmp_path.iterdir()] == [out.name]
+
+
+@pytest.mark.parametrize("shards", [2, 5, 40])
+@pytest.mark.parametrize("compress", [False, True])
+def test_varios_archivos(tmp_path, shards, compress):
+    out = enr.write_output(DATASET, tmp_path / "salida", "ndjson", shards, compress)
+    assert out.name == "salida" + SHARDS_SUFFIX
+    assert load_records(out) == DATASET
+    index = json.loads(out.read_text(encoding="utf-8"))
+    assert index["records"] == len(DATASET) and len(index["shards"]) == shards
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_conserva_las_ultimas_versiones(tmp_path):
+    for n in range(4):
+        out = enr.write_output(DATASET[: 10 + n], tmp_path / "salida", "ndjson", 3, False)
+    versiones = sorted((tmp_path / "salida.d").iterdir())
+    assert len(versiones) == enr.KEEP_VERSIONS
+    assert load_records(out) == DATASET[:13]
+    # El índice apunta a la versión más nueva
+    shards = json.loads(out.read_text(encoding="utf-8"))["shards"]
+    assert {rel.split("/")[1] for rel in shards} == {versiones[-1].name}
+
+
+def test_error_al_escribir_conserva_la_version_anterior(tmp_path):
+    out = enr.write_output(DATASET, tmp_path / "salida", "ndjson", 3, False)
+    antes = out.read_bytes()
+
+    def registros():
+        yield DATASET[0]
+        raise RuntimeError("se interrumpió")
+
+    class Roto(list):
+        def __iter__(self):
+            return registros()
+
+    with pytest.raises(RuntimeError):
+        enr.write_output(Roto(DATASET), tmp_path / "salida", "ndjson", 3, False)
+    # La versión a medias se borra
+    assert len(list((tmp_path / "salida.d").iterdir())) == 1
+    with pytest.raises(RuntimeError):
+        enr.write_records(registros(), tmp_path / "salida.json", "json")
+    assert out.read_bytes() == antes
+    assert not (tmp_path / "salida.json").exists()
+    assert load_records(out) == DATASET
+
+
+def test_fsync_antes_del_rename(tmp_path, monkeypatch):
+    eventos = []
+    fsync, replace = os.fsync, os.replace
+    monkeypatch.setattr(enr.os, "fsync", lambda fd: (eventos.append("fsync"), fsync(fd))[1])
+    monkeypatch.setattr(
+        enr.os, "replace", lambda a, b: (eventos.append(("replace", os.path.basename(b))), replace(a, b))[1]
+    )
+    enr.write_output(DATASET, tmp_path / "salida", "ndjson", 2, False)
+    renames = [i for i, e in enumerate(eventos) if e != "fsync"]
+    assert [eventos[i][1] for i in renames][-1] == "salida" + SHARDS_SUFFIX
+    # Cada archivo llega a disco antes de publicarse y el directorio después
+    for i in renames:
+        assert eventos[i - 1] == "fsync" and eventos[i + 1] == "fsync"
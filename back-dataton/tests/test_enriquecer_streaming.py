@@ -0,0 +1,69 @@
+# tests/test_enriquecer_streaming.py
+"""Lectura en streaming de archivos S1 (iter_json_elements / iter_declaraciones)."""
+import hashlib
+import io
+import json
+
+import pytest
+
+import app.enriquecer_dataset_ingresos as enr
+from app.services.dataset_store import file_fingerprint
+
+ELEMENTOS = [
+    {"a": 1, "texto": "ñandú — 東京", "lista": [1.5, -2e-07, None, True]},
+    1e-07,
+    -12345678901234567890,
+    "cadena con \"comillas\" y ]corchetes[",
+    [],
+    {},
+    {"anidado": {"x": [{"y": "z" * 50}]}},
+    0,
+    3.25e+10,
+]
+
+
+@pytest.mark.parametrize("chunk", [1, 2, 3, 5, 7, 16, 1 << 20])
+@pytest.mark.parametrize("sep", [",", " ,\n  ", "\n,\t"])
+def test_arreglo_en_bloques(monkeypatch, chunk, sep):
+    monkeypatch.setattr(enr, "_READ_CHUNK", chunk)
+    raw = " \n[" + sep.join(json.dumps(e, ensure_ascii=False) for e in ELEMENTOS) + "] \n"
+    assert list(enr.iter_json_elements(io.StringIO(raw))) == ELEMENTOS
+
+
+@pytest.mark.parametrize("chunk", [1, 4, 1 << 20])
+def test_numero_al_final_del_bloque(monkeypatch, chunk):
+    monkeypatch.setattr(enr, "_READ_CHUNK", chunk)
+    raw = "[1e-07,123456,-0.5e+3,7]"
+    assert list(enr.iter_json_elements(io.StringIO(raw))) == [1e-07, 123456, -0.5e3, 7]
+
+
+def test_objeto_unico_y_escalares(monkeypatch):
+    monkeypatch.setattr(enr, "_READ_CHUNK", 2)
+    assert list(enr.iter_json_elements(io.StringIO(' {"a": [1, 2]} '))) == [{"a": [1, 2]}]
+    assert list(enr.iter_json_elements(io.StringIO("42"))) == []
+    assert list(enr.iter_json_elements(io.StringIO("[]"))) == []
+
+
+@pytest.mark.parametrize("raw", ['[{"a": 1} {"b": 2}]', '[{"a": 1}, {"b": ]', '[1, 2] 3', '[1, 2'])
+def test_mal_formado(monkeypatch, raw):
+    monkeypatch.setattr(enr, "_READ_CHUNK", 3)
+    with pytest.raises(json.JSONDecodeError):
+        list(enr.iter_json_elements(io.StringIO(raw)))
+
+
+@pytest.mark.parametrize("chunk", [1, 5, 1 << 20])
+def test_hash_en_la_misma_lectura(monkeypatch, tmp_path, chunk):
+    monkeypatch.setattr(enr, "_READ_CHUNK", chunk)
+    path = tmp_path / "s1.json"
+    decls = [{"metadata": {"institucion": "ÁÉÍ"}, "n": i} for i in range(20)]
+    path.write_text(json.dumps(decls, ensure_ascii=False) + "\n\n", encoding="utf-8")
+    sha1 = hashlib.sha1()
+    assert list(enr.iter_declaraciones(path, sha1)) == decls
+    assert sha1.hexdigest() == file_fingerprint(path)
+
+
+def test_archivo_mal_formado_no_aporta(tmp_path):
+    path = tmp_path / "roto.json"
+    path.write_text('[{"a": 1}, {"b": ', encoding="utf-8")
+    result = enr.process_file(path, frozenset())
+    assert result.error and result.matches == [] and result.counts == {}
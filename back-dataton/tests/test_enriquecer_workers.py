@@ -0,0 +1,34 @@
+# tests/test_enriquecer_workers.py
+"""El pool de procesos da el mismo resultado que el recorrido secuencial."""
+import argparse
+import json
+
+from app.enriquecer_dataset_ingresos import (
+    build_dataset_index,
+    enriquecer,
+    iter_file_results,
+    process_file,
+)
+
+
+def test_pool_en_el_orden_de_los_archivos(s1):
+    index, _ = build_dataset_index(json.loads((s1 / "dataset.json").read_text(encoding="utf-8")))
+    keys = frozenset(index)
+    files = sorted((s1 / "s1-declaraciones").rglob("*.json"))
+    esperado = [process_file(f, keys) for f in files]
+    assert list(iter_file_results(files, keys, workers=3)) == esperado
+
+
+def test_salida_igual_con_workers(s1):
+    salidas = []
+    for workers in (1, 3):
+        args = argparse.Namespace(
+            workers=workers, full=True, fuzzy=False, fuzzy_threshold=0.9,
+            format="json", shards=1, compress=False,
+        )
+        out = enriquecer(
+            args, s1 / "dataset.json", s1 / "s1-declaraciones",
+            s1 / f"salida-{workers}", s1 / "manifest.json",
+        )
+        salidas.append(out.read_bytes())
+    assert salidas[0] == salidas[1]
@@ -0,0 +1,84 @@
+# tests/test_etag.py
+"""GET condicional (ETag / If-None-Match) y respuesta sin dataset publicado."""
+import pytest
+
+from app.routers import timeline
+from bench.generar_dataset import escribir
+
+URLS = (
+    "/timeline/declarantes-conflicto?limit=10",
+    "/timeline/declarantes-cruce-toma?sort_by=nombre&nivel=federal",
+    "/timeline/declarantes?limit=20",
+    "/timeline/ingresos-atipicos",
+)
+
+
+@pytest.mark.parametrize("url", URLS)
+def test_etag_y_304(cliente, dataset_json, url):
+    c = cliente(dataset_json)
+    r = c.get(url)
+    assert r.status_code == 200
+    etag = r.headers["etag"]
+    assert "cache-control" in r.headers
+
+    r = c.get(url, headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.headers["etag"] == etag
+    assert r.content == b""
+
+    assert c.get(url, headers={"If-None-Match": '"otro"'}).status_code == 200
+
+
+def test_etag_distingue_la_consulta(cliente, dataset_json):
+    c = cliente(dataset_json)
+    a = c.get("/timeline/declarantes-conflicto?limit=10").headers["etag"]
+    b = c.get("/timeline/declarantes-conflicto?limit=11").headers["etag"]
+    assert a != b
+
+
+def test_etag_cambia_con_el_dataset(cliente, dataset_json, registros, tmp_path):
+    path = tmp_path / "dataset.json"
+    path.write_bytes(dataset_json.read_bytes())
+    c = cliente(path)
+    url = "/timeline/declarantes-conflicto?limit=10"
+    etag = c.get(url).headers["etag"]
+
+    escribir(registros[:-50], path)
+    assert c.store.reload()
+    r = c.get(url, headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+
+def test_recarga_a_mitad_de_la_peticion(cliente, dataset_json, registros, tmp_path, monkeypatch):
+    """El cuerpo es de la misma versión con la que se calculó el ETag."""
+    path = tmp_path / "dataset.json"
+    path.write_bytes(dataset_json.read_bytes())
+    c = cliente(path)
+    url = "/timeline/declarantes-conflicto?limit=10"
+    antes = c.get(url)
+
+    escribir(registros[:-50], path)
+    original = timeline.compute_etag
+
+    def etag_y_recarga(*args, **kwargs):
+        etag = original(*args, **kwargs)
+        assert c.store.reload()
+        return etag
+
+    monkeypatch.setattr(timeline, "compute_etag", etag_y_recarga)
+    r = c.get(url)
+    assert r.headers["etag"] == antes.headers["etag"]
+    assert r.json() == antes.json()
+
+    monkeypatch.setattr(timeline, "compute_etag", original)
+    despues = c.get(url)
+    assert despues.headers["etag"] != antes.headers["etag"]
+    assert despues.json()["total"] != antes.json()["total"]
+
+
+def test_sin_dataset_es_503(cliente, tmp_path):
+    c = cliente(tmp_path / "no-existe.json")
+    r = c.get("/timeline/declarantes-conflicto")
+    assert r.status_code == 503
+    assert int(r.headers["retry-after"]) >= 1
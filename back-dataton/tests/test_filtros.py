@@ -0,0 +1,231 @@
+# tests/test_filtros.py
+"""Filtros de los paneles: fechas, normalización y semántica de select."""
+import random
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+import pytest
+
+from app.services.fechas import parse_datetime, to_epoch
+from app.services.filtros import CAMPOS, Filtro, _fecha
+
+VISTAS = ("cruce-toma", "conflicto")
+
+
+# ───────────────────────── _fecha ─────────────────────────
+def test_fecha_sin_hora_cubre_el_dia():
+    inicio, fin = _fecha("2020-03-15")
+    assert inicio == to_epoch(datetime(2020, 3, 15))
+    assert fin == to_epoch(datetime(2020, 3, 16))
+
+
+@pytest.mark.parametrize("raw", ["2020/03/15", "15/03/2020", "15-03-2020", " 2020-03-15 "])
+def test_fecha_formatos_equivalentes(raw):
+    assert _fecha(raw) == _fecha("2020-03-15")
+
+
+def test_fecha_fin_de_mes_y_anio():
+    assert _fecha("2020-02-29")[1] == _fecha("2020-03-01")[0]
+    assert _fecha("2019-12-31")[1] == _fecha("2020-01-01")[0]
+
+
+def test_fecha_con_hora_cubre_un_segundo():
+    inicio, fin = _fecha("2020-03-15T10:20:30")
+    assert inicio == to_epoch(datetime(2020, 3, 15, 10, 20, 30))
+    assert fin == inicio + 1
+
+
+@pytest.mark.parametrize("raw", ["", "xx", "2020-13-01", "32/01/2020"])
+def test_fecha_invalida(raw):
+    with pytest.raises(ValueError):
+        _fecha(raw)
+
+
+def test_toma_hasta_incluye_el_dia():
+    f = Filtro.from_query(toma_desde="2020-03-15", toma_hasta="2020-03-15")
+    assert f.toma_desde == to_epoch(datetime(2020, 3, 15))
+    assert f.toma_hasta == to_epoch(datetime(2020, 3, 16))
+
+
+# ───────────────────────── Filtro ─────────────────────────
+def test_filtro_normaliza_valores():
+    f = Filtro.from_query(nivel=[" Federal", "federal", "", "  ", "ESTATAL"])
+    assert f.nivel == ("estatal", "federal")
+    assert f.key() == Filtro.from_query(nivel=["estatal", "FEDERAL "]).key()
+    assert f.huella() == Filtro.from_query(nivel=["estatal", "FEDERAL "]).huella()
+    assert f.huella() != Filtro.from_query(nivel=["estatal"]).huella()
+
+
+def test_filtro_vacio():
+    assert not Filtro()
+    assert not Filtro.from_query(nivel=[" "], sector=[])
+    assert Filtro(monto_min=0.0)
+
+
+# ───────────────────────── FilterIndex.select ─────────────────────────
+@pytest.fixture(scope="module")
+def vistas(dataset_json):
+    from app.services.dataset_store import DatasetStore
+
+    snap = DatasetStore(dataset_json, poll_interval=0).get()
+    return {nombre: snap.vistas.by_name(nombre) for nombre in VISTAS}
+
+
+def _miembros(index, campo: str) -> Dict[str, Set[int]]:
+    return {v: set(pos.tolist()) for v, pos in index.postings[campo].values()}
+
+
+@pytest.mark.parametrize("vista", VISTAS)
+def test_select_sin_filtro_devuelve_todo(vistas, vista):
+    index = vistas[vista].filtros
+    assert index.select(Filtro()).tolist() == list(range(len(index.monto)))
+
+
+@pytest.mark.parametrize("vista", VISTAS)
+def test_select_union_dentro_de_un_campo(vistas, vista):
+    index = vistas[vista].filtros
+    for campo in CAMPOS:
+        miembros = _miembros(index, campo)
+        if len(miembros) < 2:
+            continue
+        a, b = sorted(miembros)[:2]
+        got = index.select(Filtro(**{campo: (a, b)}))
+        assert got.tolist() == sorted(miembros[a] | miembros[b])
+        # Un valor inexistente no aporta nada a la unión
+        assert index.select(Filtro(**{campo: (a, "no-existe")})).tolist() == sorted(miembros[a])
+        assert index.select(Filtro(**{campo: ("no-existe",)})).size == 0
+
+
+@pytest.mark.parametrize("vista", VISTAS)
+def test_select_interseccion_entre_campos(vistas, vista):
+    index = vistas[vista].filtros
+    niveles, sectores = _miembros(index, "nivel"), _miembros(index, "sector")
+    for nivel, pos_nivel in niveles.items():
+        for sector, pos_sector in sectores.items():
+            got = index.select(Filtro(nivel=(nivel,), sector=(sector,)))
+            assert got.tolist() == sorted(pos_nivel & pos_sector)
+
+
+@pytest.mark.parametrize("vista", VISTAS)
+def test_select_rangos(vistas, vista):
+    index = vistas[vista].filtros
+    monto = np.empty(len(index.monto))
+    monto[index.monto_orden] = index.monto
+    toma = np.full(len(index.monto), np.nan)
+    toma[index.toma_orden] = index.toma
+    rng = random.Random(3)
+    for _ in range(50):
+        lo, hi = sorted(rng.sample(index.monto.tolist(), 2))
+        got = index.select(Filtro(monto_min=lo, monto_max=hi))
+        assert got.tolist() == np.flatnonzero((monto >= lo) & (monto <= hi)).tolist()
+        if len(index.toma) < 2:
+            continue
+        desde, hasta = sorted(rng.sample(index.toma.tolist(), 2))
+        got = index.select(Filtro(toma_desde=desde, toma_hasta=hasta))
+        # Sin toma (NaN) nunca pasa un filtro de fecha
+        assert got.tolist() == np.flatnonzero((toma >= desde) & (toma < hasta)).tolist()
+
+
+# ───────────────────────── Por la API ─────────────────────────
+def _low(v: Any) -> str:
+    return v.strip().lower() if isinstance(v, str) else ""
+
+
+def _epoch(raw: Optional[str]) -> Optional[float]:
+    if not raw:
+        return None
+    _, dt = parse_datetime(raw)
+    return None if dt is None else to_epoch(dt)
+
+
+def _aporta(vista: str, d: Dict[str, Any]) -> bool:
+    if vista == "cruce-toma":
+        return _epoch(d.get("fechaTomaPosesion")) is not None
+    ente = _low(d.get("nombreEntePublico"))
+    return ente != "" and ente == _low((d.get("contrato") or {}).get("institucionCompradora"))
+
+
+def _valores(d: Dict[str, Any]) -> Dict[str, str]:
+    return {
+        "nivel": _low(d.get("nivelOrdenGobierno")),
+        "sector": _low((d.get("sectorS1") or {}).get("valor")),
+        "ente": _low(d.get("nombreEntePublico")),
+        "institucion": _low((d.get("contrato") or {}).get("institucionCompradora")),
+    }
+
+
+@pytest.mark.parametrize("vista", VISTAS)
+def test_filtros_api_contra_fuerza_bruta(cliente, dataset_json, registros, vista):
+    """Cada item pasa un campo si alguno de sus registros en la vista tiene el valor."""
+    c = cliente(dataset_json)
+    url = f"/timeline/declarantes-{vista}"
+    por_nombre: Dict[str, List[Dict[str, Any]]] = {}
+    for d in registros:
+        nombre = (d.get("nombreDeclarante") or "").strip()
+        if nombre:
+            por_nombre.setdefault(nombre, []).append(d)
+
+    completos = c.get(url, params={"sort_by": "monto", "sort_dir": "desc"}).json()["items"]
+    assert completos
+    pool: Dict[str, Set[str]] = {k: set() for k in CAMPOS}
+    info: Dict[str, Dict[str, Set[str]]] = {}
+    for it in completos:
+        filas = [d for d in por_nombre[it["nombreDeclarante"]] if _aporta(vista, d)]
+        vs = {k: {_valores(d)[k] for d in filas} - {""} for k in CAMPOS}
+        for k in CAMPOS:
+            pool[k] |= vs[k]
+        info[it["nombreDeclarante"]] = vs
+    montos = sorted(it["montoTotal"] for it in completos)
+
+    rng = random.Random(5)
+    for _ in range(60):
+        params: Dict[str, Any] = {}
+        for k in CAMPOS:
+            if pool[k] and rng.random() < 0.35:
+                params[k] = rng.sample(sorted(pool[k]), min(len(pool[k]), rng.randint(1, 3)))
+        if rng.random() < 0.3:
+            params["monto_min"] = rng.choice(montos)
+        if rng.random() < 0.3:
+            params["monto_max"] = rng.choice(montos)
+        if rng.random() < 0.3:
+            params["toma_desde"] = f"{rng.randint(2005, 2022)}-{rng.randint(1, 12):02d}-01"
+        if rng.random() < 0.3:
+            params["toma_hasta"] = f"{rng.randint(2010, 2025)}-{rng.randint(1, 12):02d}-15"
+        orden = {"sort_by": rng.choice(["monto", "contratos", "nombre"]),
+                 "sort_dir": rng.choice(["asc", "desc"])}
+
+        desde = _fecha(params["toma_desde"])[0] if "toma_desde" in params else None
+        hasta = _fecha(params["toma_hasta"])[1] if "toma_hasta" in params else None
+
+        def pasa(it: Dict[str, Any]) -> bool:
+            vs = info[it["nombreDeclarante"]]
+            if any(k in params and not vs[k] & set(params[k]) for k in CAMPOS):
+                return False
+            if "monto_min" in params and it["montoTotal"] < params["monto_min"]:
+                return False
+            if "monto_max" in params and it["montoTotal"] > params["monto_max"]:
+                return False
+            t = _epoch(it["fechaTomaPosesion"])
+            if desde is not None and (t is None or t < desde):
+                return False
+            if hasta is not None and (t is None or t >= hasta):
+                return False
+            return True
+
+        base = c.get(url, params=orden).json()["items"]
+        esperado = [it for it in base if pasa(it)]
+        # Mayúsculas y espacios en los valores no cambian el resultado
+        query = dict(params, **orden)
+        for k in CAMPOS:
+            if k in query:
+                query[k] = [f" {v.upper()} " for v in query[k]]
+        got = c.get(url, params=query).json()
+        assert got["items"] == esperado, params
+        assert got["total"] == len(esperado)
+
+
+def test_fecha_invalida_en_la_api(cliente, dataset_json):
+    c = cliente(dataset_json)
+    r = c.get("/timeline/declarantes-conflicto", params={"toma_desde": "xx"})
+    assert r.status_code == 400
@@ -0,0 +1,69 @@
+# tests/test_paginacion.py
+"""Cursores de los paneles: recorrido completo, versión y consulta del cursor."""
+from typing import Any, Dict, List
+
+import pytest
+
+from bench.generar_dataset import escribir
+
+PANELES = ("/timeline/declarantes-cruce-toma", "/timeline/declarantes-conflicto")
+
+
+def _recorrer(c, url: str, params: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
+    page = c.get(url, params=dict(params, limit=limit)).json()
+    items = page["items"]
+    cursor = page["next_cursor"]
+    while cursor:
+        page = c.get(url, params=dict(params, limit=limit, cursor=cursor)).json()
+        assert len(page["items"]) <= limit
+        items += page["items"]
+        cursor = page["next_cursor"]
+    return items
+
+
+@pytest.mark.parametrize("url", PANELES)
+@pytest.mark.parametrize(
+    "params",
+    [
+        {},
+        {"sort_by": "nombre", "sort_dir": "asc"},
+        {"sort_by": "contratos", "sort_dir": "desc", "nivel": ["federal", "estatal"]},
+    ],
+)
+def test_cursor_recorre_la_lista_completa(cliente, dataset_json, url, params):
+    c = cliente(dataset_json)
+    completa = c.get(url, params=params).json()["items"]
+    assert _recorrer(c, url, params, limit=7) == completa
+
+
+@pytest.mark.parametrize("url", PANELES)
+def test_cursor_de_otra_version_es_409(cliente, dataset_json, registros, tmp_path, url):
+    path = tmp_path / "dataset.json"
+    path.write_bytes(dataset_json.read_bytes())
+    c = cliente(path)
+    cursor = c.get(url, params={"limit": 5}).json()["next_cursor"]
+    assert cursor
+    assert c.get(url, params={"limit": 5, "cursor": cursor}).status_code == 200
+
+    escribir(registros[:-50], path)
+    assert c.store.reload()
+    r = c.get(url, params={"limit": 5, "cursor": cursor})
+    assert r.status_code == 409
+    # La primera página de la versión nueva sigue funcionando
+    assert c.get(url, params={"limit": 5}).status_code == 200
+
+
+@pytest.mark.parametrize("url", PANELES)
+def test_cursor_invalido_es_400(cliente, dataset_json, url):
+    c = cliente(dataset_json)
+    assert c.get(url, params={"cursor": "no-es-un-cursor"}).status_code == 400
+
+
+@pytest.mark.parametrize("url", PANELES)
+@pytest.mark.parametrize(
+    "otra", [{"sort_by": "nombre"}, {"sort_dir": "asc"}, {"nivel": "federal"}]
+)
+def test_cursor_de_otra_consulta_es_400(cliente, dataset_json, url, otra):
+    c = cliente(dataset_json)
+    cursor = c.get(url, params={"limit": 5}).json()["next_cursor"]
+    assert c.get(url, params=dict(otra, limit=5, cursor=cursor)).status_code == 400
@@ -0,0 +1,39 @@
+# tests/test_servir.py
+"""Directorio del segmento y limpieza de los .bin de versiones anteriores."""
+import os
+
+from app import servir
+from app.services.segmento import SharedSegment
+from bench.generar_dataset import escribir
+
+
+def test_preparar_dir(tmp_path):
+    d = tmp_path / "seg"
+    d.mkdir(mode=0o777)
+    os.chmod(d, 0o777)
+    servir.preparar_dir(d)
+    assert d.stat().st_mode & 0o777 == 0o700
+
+
+def test_limpiar_respeta_el_periodo_de_gracia(tmp_path, registros, monkeypatch):
+    monkeypatch.setattr(servir, "_retirados", {})
+    seg_dir = tmp_path / "seg"
+    servir.preparar_dir(seg_dir)
+    seg = seg_dir / servir.SEGMENT_NAME
+    source = tmp_path / "dataset.json"
+
+    escribir(registros[:500], source)
+    servir.construir(source, seg, True)
+    v1 = SharedSegment(seg).records_path
+    escribir(registros[:400], source)
+    servir.construir(source, seg, True)
+    v2 = SharedSegment(seg).records_path
+    assert v1 != v2
+
+    # Recién reemplazado: un worker que leyó el .seg anterior aún puede abrirlo
+    assert v1.exists()
+    servir.limpiar(seg)
+    assert v1.exists()
+    servir.limpiar(seg, grace=0)
+    assert not v1.exists() and v2.exists()
+    assert servir._retirados == {}
@@ -0,0 +1,44 @@
+# tests/test_sugerencias.py
+"""SuggestIndex: los tres niveles con textos cortos y largos."""
+import random
+from typing import List
+
+import pytest
+
+from app.services.indices import SuggestIndex, suggest_key
+
+
+def _esperado(keys: List[str], q: str, limit: int) -> List[int]:
+    """Recorrido completo con los mismos niveles que SuggestIndex.search."""
+    niveles = [
+        [i for i, k in enumerate(keys) if k.startswith(q)],
+        [i for i, k in enumerate(keys) if (" " + k).find(" " + q) >= 0],
+        [i for i, k in enumerate(keys) if q in k],
+    ]
+    out: List[int] = []
+    for ids in niveles:
+        for i in ids:
+            if i not in out and len(out) < limit:
+                out.append(i)
+    return out
+
+
+@pytest.fixture(scope="module")
+def indice(registros):
+    keys = sorted({suggest_key(d["nombreDeclarante"]) for d in registros} - {""})
+    return SuggestIndex(keys, keys)
+
+
+@pytest.mark.parametrize("limit", [5, 20, SuggestIndex.MAX_LIMIT])
+def test_igual_al_recorrido_completo(indice, limit):
+    keys = indice.keys
+    rng = random.Random(limit)
+    consultas = {"a", "z", "ez", "a ", "o m", "xq"}
+    for k in rng.sample(keys, 30):
+        j = rng.randrange(len(k))
+        consultas.update({k[j:j + 1], k[j:j + 2], k[j:j + 4]})
+    for q in sorted(consultas):
+        q = suggest_key(q)
+        if q:
+            esperado = [keys[i] for i in _esperado(keys, q, limit)]
+            assert indice.search(q, limit) == esperado, q